@@ -1,8 +1,25 @@
+import argparse
 import csv
 import logging
 import os
 import fnmatch
+import hashlib
+import json
+import math
 import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from typing import List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from liepa_ausys.lattice import LatFormatError, read_lat_words
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -26,8 +43,17 @@ def parse_env_file(file_path):
 
 
 
+# Larger inputs are aligned over a checkpointed table (a full DP table of boxed ints takes ~8 bytes per cell)
+FULL_TABLE_MAX_CELLS = 4_000_000
+# With NumPy the vectorized linear engine is faster than the pure Python table from this size
+NUMPY_MIN_CELLS = 250_000
+
+
 def smith_waterman(A, B, match_score=2, mismatch_penalty=-1, gap_penalty=-1):
     m, n = len(A), len(B)
+    cells = (m + 1) * (n + 1)
+    if cells > FULL_TABLE_MAX_CELLS or (np != None and cells > NUMPY_MIN_CELLS):
+        return smith_waterman_linear(A, B, match_score, mismatch_penalty, gap_penalty)
     
     # Initialize DP table and a table to store the traceback directions
     dp = [[0] * (n + 1) for _ in range(m + 1)]
@@ -71,6 +97,187 @@ def smith_waterman(A, B, match_score=2, mismatch_penalty=-1, gap_penalty=-1):
     
     return reversed(aligned_A), reversed(aligned_B), max_score
 
+
+def encode_tokens(A, B):
+    """ Intern both token lists through one shared vocabulary into int32 arrays """
+    vocabulary = {}
+    A_ids = np.fromiter((vocabulary.setdefault(token, len(vocabulary)) for token in A), dtype=np.int32, count=len(A))
+    B_ids = np.fromiter((vocabulary.setdefault(token, len(vocabulary)) for token in B), dtype=np.int32, count=len(B))
+    return A_ids, B_ids
+
+
+def next_score_row(prev, a, B, i, match_score, mismatch_penalty, gap_penalty, local):
+    """ Row i of the DP table computed from row i - 1, `a` is A[i - 1]; local (Smith-Waterman) rows are clipped at 0 """
+    if np != None and isinstance(B, np.ndarray):
+        return next_score_row_numpy(prev, a, B, i, match_score, mismatch_penalty, gap_penalty, local)
+    n = len(B)
+    cur = [0 if local else i * gap_penalty] + [0] * n
+    left = cur[0]
+    for j in range(1, n + 1):
+        score = prev[j - 1] + (match_score if a == B[j - 1] else mismatch_penalty)
+        up = prev[j] + gap_penalty
+        if up > score:
+            score = up
+        if left + gap_penalty > score:
+            score = left + gap_penalty
+        if local and score < 0:
+            score = 0
+        cur[j] = score
+        left = score
+    return cur
+
+
+def next_score_row_numpy(prev, a, B, i, match_score, mismatch_penalty, gap_penalty, local):
+    """
+    Vectorized `next_score_row`. Diagonal and vertical moves only depend on the previous
+    row; the horizontal chain H[j] = max(T[j], H[j-1] + gap) is unrolled into
+    H[j] = j*gap + max(T[k] - k*gap for k <= j), a cumulative max over the row.
+    """
+    n = len(B)
+    steps = np.arange(n + 1, dtype=np.int32) * np.int32(gap_penalty)
+    cur = np.empty(n + 1, dtype=np.int32)
+    np.add(prev[:-1], np.where(B == a, match_score, mismatch_penalty).astype(np.int32), out=cur[1:])
+    np.maximum(cur[1:], prev[1:] + gap_penalty, out=cur[1:])
+    if local:
+        np.maximum(cur, 0, out=cur)
+    cur[0] = 0 if local else i * gap_penalty
+    np.subtract(cur, steps, out=cur)
+    np.maximum.accumulate(cur, out=cur)
+    np.add(cur, steps, out=cur)
+    return cur
+
+
+def score_rows(A, B, match_score, mismatch_penalty, gap_penalty, local=False):
+    """ Rows of the DP table of A against B, yielded one by one (i = 0..len(A)) """
+    n = len(B)
+    if np != None and isinstance(B, np.ndarray):
+        prev = np.zeros(n + 1, dtype=np.int32) if local else np.arange(n + 1, dtype=np.int32) * np.int32(gap_penalty)
+    else:
+        prev = [0] * (n + 1) if local else [j * gap_penalty for j in range(n + 1)]
+    yield prev
+    for i in range(1, len(A) + 1):
+        prev = next_score_row(prev, A[i - 1], B, i, match_score, mismatch_penalty, gap_penalty, local)
+        yield prev
+
+
+def global_score_rows(A, B, match_score, mismatch_penalty, gap_penalty):
+    """ Needleman-Wunsch scores of A[:i] against every prefix of B, yielded row by row (i = 0..len(A)) """
+    return score_rows(A, B, match_score, mismatch_penalty, gap_penalty)
+
+
+class CheckpointedTable():
+    """
+    DP table indexed as `table[i][j]` like a full one, in O(len(B) * sqrt(len(A))) memory.
+    The forward pass keeps every k-th row (k = sqrt(len(A))); a traceback, which visits
+    rows from the last to the first, gets the rows of one block at a time recomputed from
+    its checkpoint. The table holds the same values as the full one, so a traceback over
+    it returns exactly the alignment of the full table for twice the computation.
+    For the local variant the best score and its first cell in row order are found on the way.
+    """
+
+    def __init__(self, A, B, match_score, mismatch_penalty, gap_penalty, local=False):
+        self.A, self.B = A, B
+        self.scores = (match_score, mismatch_penalty, gap_penalty)
+        self.local = local
+        self.block = max(1, math.isqrt(len(A)))
+        self.checkpoints = {}
+        self.max_score = 0
+        self.max_pos = (0, 0)
+        for i, row in enumerate(score_rows(A, B, match_score, mismatch_penalty, gap_penalty, local)):
+            if i % self.block == 0:
+                self.checkpoints[i] = row
+            if local and i > 0:
+                j = int(np.argmax(row)) if np != None and isinstance(row, np.ndarray) else row.index(max(row))
+                if row[j] > self.max_score:
+                    self.max_score = int(row[j])
+                    self.max_pos = (i, j)
+        self.block_start = None
+        self.block_rows = []
+
+    def __getitem__(self, i):
+        if i in self.checkpoints:
+            return self.checkpoints[i]
+        start = i - i % self.block
+        if start != self.block_start:
+            rows = [self.checkpoints[start]]
+            for k in range(start + 1, min(start + self.block, len(self.A) + 1)):
+                rows.append(next_score_row(rows[-1], self.A[k - 1], self.B, k, *self.scores, self.local))
+            self.block_start = start
+            self.block_rows = rows
+        return self.block_rows[i - start]
+
+
+def global_traceback(A, B, dp, match_score, gap_penalty):
+    """ Aligned index pairs (i, j) into A and B, None on the side of a gap, traced back from the last cell of `dp` """
+    pairs = []
+    i, j = len(A), len(B)
+    while i > 0 or j > 0:
+        if i > 0 and j > 0 and A[i - 1] == B[j - 1] and dp[i][j] == dp[i - 1][j - 1] + match_score:
+            i -= 1
+            j -= 1
+            pairs.append((i, j))
+        elif i > 0 and dp[i][j] == dp[i - 1][j] + gap_penalty:
+            i -= 1
+            pairs.append((i, None))
+        elif j > 0 and dp[i][j] == dp[i][j - 1] + gap_penalty:
+            j -= 1
+            pairs.append((None, j))
+        else:
+            i -= 1
+            j -= 1
+            pairs.append((i, j))
+    pairs.reverse()
+    return pairs
+
+
+def global_alignment_full(A, B, match_score, mismatch_penalty, gap_penalty):
+    """
+    Needleman-Wunsch with a full table, for small inputs. Returns aligned index pairs
+    (i, j) into A and B, None on the side of a gap.
+    """
+    dp = list(global_score_rows(A, B, match_score, mismatch_penalty, gap_penalty))
+    return global_traceback(A, B, dp, match_score, gap_penalty)
+
+
+def global_alignment_linear(A, B, match_score, mismatch_penalty, gap_penalty):
+    """ `global_alignment_full` over a `CheckpointedTable`: the same pairs in O(len(B) * sqrt(len(A))) memory """
+    dp = CheckpointedTable(A, B, match_score, mismatch_penalty, gap_penalty)
+    return global_traceback(A, B, dp, match_score, gap_penalty)
+
+
+def smith_waterman_linear(A, B, match_score=2, mismatch_penalty=-1, gap_penalty=-1, backend=None):
+    """
+    Smith-Waterman for hour long transcripts: the table is a `CheckpointedTable`, the
+    traceback is the one of `smith_waterman`, so the result is the same as with the full table.
+
+    `backend` is "numpy" (tokens interned to int32 arrays, rows vectorized) or "python";
+    by default NumPy is used when it is installed.
+    """
+    if backend == None:
+        backend = "numpy" if np != None else "python"
+    seq_A, seq_B = encode_tokens(A, B) if backend == "numpy" else (A, B)
+    dp = CheckpointedTable(seq_A, seq_B, match_score, mismatch_penalty, gap_penalty, local=True)
+    aligned_A, aligned_B = [], []
+    i, j = dp.max_pos
+    while i > 0 and j > 0 and dp[i][j] != 0:
+        if A[i - 1] == B[j - 1]:
+            aligned_A.append(A[i - 1])
+            aligned_B.append(B[j - 1])
+            i -= 1
+            j -= 1
+        elif dp[i][j] == dp[i - 1][j] + gap_penalty:
+            aligned_A.append(A[i - 1])
+            aligned_B.append('-')
+            i -= 1
+        else:
+            aligned_A.append('-')
+            aligned_B.append(B[j - 1])
+            j -= 1
+    aligned_A.reverse()
+    aligned_B.reverse()
+    return aligned_A, aligned_B, dp.max_score
+
+
 def transpose_arrays(array1, array2):
     # Get the length of the longer array
     max_len = max(len(array1), len(array2))
@@ -91,6 +298,148 @@ def transpose_arrays(array1, array2):
     return (aligned_pairs, wer)
 
 
+@dataclass
+class WerResult:
+    """Word error rate of a hypothesis against the whole reference"""
+    substitutions: int
+    deletions: int
+    insertions: int
+    reference_words: int
+    wer: float
+    aligned_pairs: List[Tuple[str,str,int]]
+    max_score: Optional[int] = None
+
+    @property
+    def errors(self) -> int:
+        return self.substitutions + self.deletions + self.insertions
+
+
+def count_errors(aligned_pairs):
+    """ (substitutions, deletions, insertions) of aligned (reference, hypothesis, mismatch) pairs """
+    substitutions = deletions = insertions = 0
+    for ref_word, hyp_word, mismatch in aligned_pairs:
+        if ref_word == '-':
+            insertions += 1
+        elif hyp_word == '-':
+            deletions += 1
+        elif mismatch:
+            substitutions += 1
+    return substitutions, deletions, insertions
+
+
+def bounded_edit_distance(reference, hypothesis, max_errors):
+    """
+    Compact row Levenshtein pass with early exit: the best cost of a row never decreases
+    from one row to the next, so the pass stops (returns None) as soon as it exceeds `max_errors`.
+    """
+    if abs(len(reference) - len(hypothesis)) > max_errors:
+        return None
+    row = None
+    for row in global_score_rows(reference, hypothesis, 0, -1, -1):
+        if -max(row) > max_errors:
+            return None
+    return -int(row[-1])
+
+
+def wer_alignment(reference, hypothesis, max_errors=None, backend=None) -> Optional[WerResult]:
+    """
+    Global (Levenshtein) alignment of the whole reference and hypothesis with
+    substitution, deletion and insertion counts. Returns None if the edit distance is
+    larger than `max_errors`, without computing the alignment.
+    """
+    if backend == None:
+        backend = "numpy" if np != None else "python"
+    seq_ref, seq_hyp = encode_tokens(reference, hypothesis) if backend == "numpy" else (reference, hypothesis)
+    if max_errors != None and bounded_edit_distance(seq_ref, seq_hyp, max_errors) == None:
+        return None
+    aligned_pairs = []
+    for i, j in global_alignment_linear(seq_ref, seq_hyp, 0, -1, -1):
+        ref_word = reference[i] if i != None else '-'
+        hyp_word = hypothesis[j] if j != None else '-'
+        aligned_pairs.append((ref_word, hyp_word, 0 if ref_word == hyp_word and i != None and j != None else 1))
+    substitutions, deletions, insertions = count_errors(aligned_pairs)
+    errors = substitutions + deletions + insertions
+    reference_words = len(reference)
+    wer = round(errors / reference_words * 100, 2) if reference_words else (0.0 if errors == 0 else 100.0)
+    return WerResult(substitutions, deletions, insertions, reference_words, wer, aligned_pairs)
+
+
+# (match_score, mismatch_penalty, gap_penalty) of the local (Smith-Waterman) and global (Levenshtein) engines
+LOCAL_SCORES = (2, -1, -1)
+GLOBAL_SCORES = (0, -1, -1)
+
+
+class AlignmentCache():
+    """
+    Alignment results on disk, one JSON file per content hash of the reference tokens,
+    hypothesis tokens and scoring parameters, so unchanged pairs are never aligned twice.
+    File mtime is the LRU clock: hits touch it and `prune` removes the least recently
+    used entries once the cache is larger than `max_bytes`. Entries are written to a temp
+    file and renamed, several processes can share one cache directory.
+    """
+    VERSION = 1
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(engine, reference, hypothesis, scores):
+        content = json.dumps([AlignmentCache.VERSION, engine, list(scores), reference, hypothesis], ensure_ascii=False)
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def get(self, key) -> Optional[WerResult]:
+        path = self.path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            os.utime(path)
+            data["aligned_pairs"] = [tuple(pair) for pair in data["aligned_pairs"]]
+            return WerResult(**data)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            logging.warning(f"Alignment cache entry {path} ignored: {e}")
+            return None
+
+    def put(self, key, result:WerResult):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(asdict(result), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def prune(self):
+        """ Remove least recently used entries until the cache fits in `max_bytes`, returns the number removed """
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        if removed:
+            logging.info(f"Alignment cache {self.cache_dir}: {removed} least recently used entries removed")
+        return removed
+
+
 def pairs_to_csv(pairs, filename="aligned_pairs.csv"):
   """
   Converts a list of aligned pairs into a CSV file.
@@ -114,56 +463,192 @@ def read_txt_to_array(file_path):
         return lines
     except FileNotFoundError:
         logging.error(f"Error: txt file '{file_path}' not found.")
+    return []
 
 def read_lat_to_array(file_path):
-    result_arr=[]
     try:
-        with open(file_path, 'r') as file:
-            for line in file:
-                parts = line.strip().split()
-                word_text:str=None
-                main_number:int=None
-                if len(parts) == 4:
-                    first_number, start_time, end_time, text = parts[0:]
-                    word_text=text
-                    main_number=first_number
-                if len(parts) == 5:
-                    first_number, start_time, end_time, text, punkt = parts[0:]
-                    word_text=text
-                    main_number=first_number
-                    #print(f"Start: {start_time}, End: {end_time}, Text: {text}")
-                if main_number == "1":
-                    if word_text != "<eps>":
-                        words=word_text.strip().lower().split("_")
-                        result_arr.extend(words)
+        return read_lat_words(file_path)
     except FileNotFoundError:
         logging.error(f"Error: lat file '{file_path}' not found.")
-    return result_arr
-    
+    except LatFormatError as e:
+        # one broken lattice must not stop the directory or corpus run
+        logging.error(f"Error: lat file skipped: {e}")
+    return []
 
 
-def align_transcribtions_in_directory(directory):
+def align_transcribtions_in_directory(directory, engine="local", max_wer=None, cache=None):
     try:
         for entry in os.listdir(directory):
             full_path = os.path.join(directory, entry)
             if os.path.isfile(full_path) and fnmatch.fnmatch(entry, "*.lat"):
                 target_file_path = re.sub('lat$', 'txt', full_path)
-                align_transcription_file(full_path, target_file_path)
+                align_transcription_file(full_path, target_file_path, engine, max_wer, cache)
     except FileNotFoundError:
         logging.error(f"Error: Directory '{directory}' not found.")
     except PermissionError:
         logging.error(f"Error: Permission denied for accessing '{directory}'.")
+    if cache != None:
+        cache.prune()
 
-def align_transcription_file(result_file_path, target_file_path):
+def align_transcription_file(result_file_path, target_file_path, engine="local", max_wer=None, cache:Optional[AlignmentCache]=None):
+    """
+    Score recognized lattice against the reference text and write aligned words to a csv
+    next to the lattice. `engine` "local" aligns the best matching region (Smith-Waterman),
+    "global" computes the real WER with S/D/I counts over the whole reference.
+    With `cache` alignments of already seen (reference, hypothesis) pairs are reused.
+    """
     target_array=read_txt_to_array(target_file_path)
     result_array=read_lat_to_array(result_file_path)
-    aligned_target, aligned_result, max_score = smith_waterman(target_array, result_array)
-    (aligned_pairs, wer) = transpose_arrays(list(aligned_target), list(aligned_result))
     output_file_path = re.sub('lat$', 'csv', result_file_path)
-    logging.info(f"WER: {wer}; Max Alignment Score: {max_score}")
-    pairs_to_csv(aligned_pairs,output_file_path)
+    cache_key = None
+    result = None
+    if cache != None:
+        cache_key = cache.key(engine, target_array, result_array, GLOBAL_SCORES if engine == "global" else LOCAL_SCORES)
+        result = cache.get(cache_key)
+        if result != None:
+            logging.debug(f"{result_file_path}: alignment found in cache")
+    if engine == "global":
+        max_errors = None if max_wer == None else int(max_wer * len(target_array) / 100)
+        if result == None:
+            result = wer_alignment(target_array, result_array, max_errors)
+            # files over the bound are not aligned, so there is nothing to cache for them
+            if result != None and cache != None:
+                cache.put(cache_key, result)
+        elif max_errors != None and result.errors > max_errors:
+            result = None
+        if result == None:
+            logging.info(f"{result_file_path}: WER above {max_wer}, alignment skipped")
+            return None
+        logging.info(f"WER: {result.wer}; S: {result.substitutions}; D: {result.deletions}; I: {result.insertions}; N: {result.reference_words}")
+        pairs_to_csv(result.aligned_pairs, output_file_path)
+        return result
+    if result == None:
+        aligned_target, aligned_result, max_score = smith_waterman(target_array, result_array, *LOCAL_SCORES)
+        aligned_target = list(aligned_target)
+        if not aligned_target:
+            logging.warning(f"{result_file_path}: no words in common with the reference, alignment skipped")
+            return None
+        (aligned_pairs, wer) = transpose_arrays(aligned_target, list(aligned_result))
+        substitutions, deletions, insertions = count_errors(aligned_pairs)
+        result = WerResult(substitutions, deletions, insertions, sum(1 for pair in aligned_pairs if pair[0] != '-'), wer, aligned_pairs, int(max_score))
+        if cache != None:
+            cache.put(cache_key, result)
+    logging.info(f"WER: {result.wer}; Max Alignment Score: {result.max_score}")
+    pairs_to_csv(result.aligned_pairs,output_file_path)
+    return result
+
+
+def find_transcription_pairs(directory):
+    """ (lattice, reference text) paths in `directory` and its subdirectories, lattices without a `.txt` are skipped """
+    pairs = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        for entry in sorted(files):
+            if fnmatch.fnmatch(entry, "*.lat"):
+                full_path = os.path.join(root, entry)
+                target_file_path = re.sub('lat$', 'txt', full_path)
+                if os.path.isfile(target_file_path):
+                    pairs.append((full_path, target_file_path))
+                else:
+                    logging.warning(f"{full_path}: reference {target_file_path} not found, skipped")
+    return pairs
+
+
+def score_transcription_file(task):
+    """ Process pool worker: align one (lattice, reference) pair and return its summary record """
+    result_file_path, target_file_path, engine, max_wer, cache = task
+    started = time.monotonic()
+    record = {"file": result_file_path}
+    try:
+        result = align_transcription_file(result_file_path, target_file_path, engine, max_wer, cache)
+    except (OSError, UnicodeDecodeError, ValueError, ZeroDivisionError) as e:
+        logging.error(f"{result_file_path}: {e}")
+        result = None
+        record["error"] = str(e)
+    record["seconds"] = round(time.monotonic() - started, 3)
+    if result == None:
+        record.setdefault("skipped", True)
+        return record
+    # the local engine scores the best matching region only, its WER is relative to the aligned length
+    words = result.reference_words if engine == "global" else len(result.aligned_pairs)
+    record.update(wer=result.wer, errors=result.errors, words=words, substitutions=result.substitutions,
+                  deletions=result.deletions, insertions=result.insertions)
+    return record
+
+
+def corpus_summary(records, seconds, worst=10):
+    """ Micro (all errors / all words) and macro (mean of per-file WER) averages over scored files """
+    scored = [r for r in records if "wer" in r]
+    errors = sum(r["errors"] for r in scored)
+    words = sum(r["words"] for r in scored)
+    return {
+        "files": len(records),
+        "scored": len(scored),
+        "skipped": sum(1 for r in records if r.get("skipped") and "error" not in r),
+        "failed": sum(1 for r in records if "error" in r),
+        "errors": errors,
+        "words": words,
+        "micro_wer": round(errors / words * 100, 2) if words else 0.0,
+        "macro_wer": round(sum(r["wer"] for r in scored) / len(scored), 2) if scored else 0.0,
+        "seconds": round(seconds, 3),
+        "cpu_seconds": round(sum(r["seconds"] for r in records), 3),
+        "worst": [{"file": r["file"], "wer": r["wer"]} for r in sorted(scored, key=lambda r: -r["wer"])[:worst]],
+    }
+
+
+def score_corpus(directory, summary_path, engine="local", max_wer=None, workers=None, worst=10, cache=None):
+    """
+    Score every (lattice, reference) pair below `directory` in a process pool. Per-file records
+    are streamed to the JSON lines `summary_path` as they finish, the last line holds the
+    corpus summary (`{"summary": {...}}`).
+    """
+    started = time.monotonic()
+    # largest lattices first, so a long file doesn't start last and keep one worker busy alone
+    tasks = sorted(((lat, txt, engine, max_wer, cache) for lat, txt in find_transcription_pairs(directory)),
+                   key=lambda task: -os.path.getsize(task[0]))
+    records = []
+    with open(summary_path, 'w', encoding='utf-8') as summary_file:
+        def write_record(record):
+            records.append(record)
+            summary_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            summary_file.flush()
+
+        if workers == 1 or len(tasks) <= 1:
+            for task in tasks:
+                write_record(score_transcription_file(task))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for future in as_completed([executor.submit(score_transcription_file, task) for task in tasks]):
+                    write_record(future.result())
+        summary = corpus_summary(records, time.monotonic() - started, worst)
+        summary_file.write(json.dumps({"summary": summary}, ensure_ascii=False) + "\n")
+    if cache != None:
+        cache.prune()
+    logging.info(f"Corpus: {summary['scored']} files; micro WER: {summary['micro_wer']}; macro WER: {summary['macro_wer']}; "
+                 f"{summary['seconds']}s; summary: {summary_path}")
+    return summary
 
 if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description='Aligns recognized lattices with reference texts')
+    argparser.add_argument('--engine', choices=["local", "global"], default="local",
+                        help='local: Smith-Waterman best matching region; global: Levenshtein WER with S/D/I counts')
+    argparser.add_argument('--max_wer', type=float,
+                        help='global engine only: skip alignment of files with WER above this value (%%)')
+    argparser.add_argument('--corpus', action='store_true',
+                        help='score all .lat/.txt pairs in the directory and its subdirectories in parallel')
+    argparser.add_argument('--summary',
+                        help='corpus mode: JSON lines summary file (default: wer_summary.jsonl in the directory)')
+    argparser.add_argument('--workers', type=int,
+                        help='corpus mode: number of worker processes (default: CPU count)')
+    argparser.add_argument('--worst', type=int, default=10,
+                        help='corpus mode: number of worst files listed in the summary')
+    argparser.add_argument('--cache_dir',
+                        help='alignment cache directory (default: .align_cache in the directory)')
+    argparser.add_argument('--cache_max_mb', type=float, default=512,
+                        help='alignment cache size, least recently used entries are removed above it')
+    argparser.add_argument('--no_cache', action='store_true',
+                        help='align every file again without using the cache')
+    args = argparser.parse_args()
     env_dict=parse_env_file("./liepa_ausys.env")
     #directory = "./wav"
     # print(env_dict)
@@ -172,7 +657,15 @@ if __name__ == "__main__":
         logging.info("liepa_ausys_wav_path is not set in liepa_ausys.env")
     directory = env_dict["liepa_ausys_wav_path"].replace("*.wav","")
 
-    align_transcribtions_in_directory(os.path.join(working_dir,directory))
+    corpus_dir = os.path.join(working_dir,directory)
+    cache = None
+    if not args.no_cache:
+        cache = AlignmentCache(args.cache_dir or os.path.join(corpus_dir, ".align_cache"), int(args.cache_max_mb * 1024 * 1024))
+    if args.corpus:
+        summary_path = args.summary or os.path.join(corpus_dir, "wer_summary.jsonl")
+        score_corpus(corpus_dir, summary_path, args.engine, args.max_wer, args.workers, args.worst, cache)
+    else:
+        align_transcribtions_in_directory(corpus_dir, args.engine, args.max_wer, cache)
 
     # A=read_txt_to_array("wav-etalonas/L_RA_F4_IS023_01.txt")
     # B=read_lat_to_array("wav-etalonas/L_RA_F4_IS023_01_P.lat")
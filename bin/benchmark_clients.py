@@ -0,0 +1,165 @@
+"""
+End-to-end throughput benchmark of the transcription clients against the local mock server.
+
+Generates test recordings, runs `run.files.py` and `run_files_whisper.py` serially and
+with `--jobs N`, then both engines in one `--backend liepa,whisper` run, and reports
+files/sec, upload MB/s, requests per job and the client's peak RSS for every mode:
+
+    python ./bin/benchmark_clients.py --files 50 --duration 60 --jobs 1,8,32
+"""
+import argparse
+import glob
+import json
+import logging
+import math
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from typing import List
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(ROOT_DIR)
+from liepa_ausys.mock_server import MockAsrServer, MockConfig
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+@dataclass
+class BenchmarkResult:
+    mode: str
+    files: int
+    completed: int
+    seconds: float
+    files_per_sec: float
+    upload_mb_per_sec: float
+    requests_per_job: float
+    max_rss_mb: float
+    exit_code: int
+
+
+def write_test_wav(path:str, duration_sec:float, sample_rate:int=16000):
+    """ 16-bit mono tone with a pause every 5 seconds """
+    frames = int(duration_sec * sample_rate)
+    period = [int(8000 * math.sin(2 * math.pi * 440 * i / sample_rate)) for i in range(sample_rate // 10)]
+    tone = struct.pack(f'<{len(period)}h', *period)
+    pause = b'\x00\x00' * len(period)
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + frames * 2, b'WAVE', b'fmt ', 16, 1, 1,
+                            sample_rate, sample_rate * 2, 2, 16, b'data', frames * 2))
+        written = 0
+        block = 0
+        while written < frames:
+            data = pause if block % 50 >= 45 else tone
+            data = data[:(frames - written) * 2]
+            f.write(data)
+            written += len(data) // 2
+            block += 1
+
+
+def clean_outputs(wav_dir:str):
+    """ Remove results, manifests and caches of the previous mode, every mode starts cold """
+    for pattern in ("*.lat", "*.latb", "*.eaf", ".liepa_ausys_*"):
+        for path in glob.glob(os.path.join(wav_dir, pattern)):
+            os.remove(path)
+
+
+def run_client(command:List[str]) -> tuple:
+    """ Run a client process, returns (exit code, wall seconds, peak RSS in MB) """
+    started = time.monotonic()
+    process = subprocess.Popen(command, cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    stderr = process.stderr.read()
+    _, status, rusage = os.wait4(process.pid, 0)
+    seconds = time.monotonic() - started
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        logging.warning(f"{' '.join(command)} exited with {process.returncode}: {stderr[-2000:].decode('utf-8', 'replace')}")
+    # ru_maxrss is in kilobytes on Linux
+    return process.returncode, seconds, rusage.ru_maxrss / 1024
+
+
+def benchmark_mode(mode:str, command:List[str], server:MockAsrServer, wav_dir:str, files:int) -> BenchmarkResult:
+    clean_outputs(wav_dir)
+    server.reset_stats()
+    exit_code, seconds, max_rss_mb = run_client(command)
+    stats = server.stats
+    completed = len(glob.glob(os.path.join(wav_dir, "*.lat")))
+    return BenchmarkResult(
+        mode=mode,
+        files=files,
+        completed=completed,
+        seconds=round(seconds, 2),
+        files_per_sec=round(completed / seconds, 3) if seconds > 0 else 0.0,
+        upload_mb_per_sec=round(stats.upload_bytes / 1024 / 1024 / stats.upload_sec, 1) if stats.upload_sec > 0 else 0.0,
+        requests_per_job=round(stats.total_requests / stats.jobs, 1) if stats.jobs else 0.0,
+        max_rss_mb=round(max_rss_mb, 1),
+        exit_code=exit_code,
+    )
+
+
+def write_env(env_path:str, server_url:str, wav_dir:str, poll_sec:float):
+    with open(env_path, 'w') as f:
+        f.write(f"liepa_ausys_url={server_url}\n")
+        f.write("liepa_ausys_auth=benchmark\n")
+        f.write(f"liepa_ausys_wav_path={wav_dir}/*.wav\n")
+        f.write("liepa_ausys_email=benchmark@localhost\n")
+        f.write(f"liepa_ausys_processing_poll_sec={poll_sec}\n")
+        f.write(f"whisper_url={server_url}\n")
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description='Benchmarks transcription clients against the mock server')
+    argparser.add_argument('--files', type=int, default=20, help='number of test recordings')
+    argparser.add_argument('--duration', type=float, default=30, help='length of each recording in seconds')
+    argparser.add_argument('--jobs', default="1,8", help='comma separated --jobs values of the clients')
+    argparser.add_argument('--clients', default="liepa,whisper", help='comma separated clients: liepa, whisper')
+    argparser.add_argument('--latency', type=float, default=0.02, help='mock server latency per request (sec)')
+    argparser.add_argument('--speed_ratio', type=float, default=0.05, help='mock server processing time per second of audio')
+    argparser.add_argument('--failure_rate', type=float, default=0.0, help='share of mock jobs which fail')
+    argparser.add_argument('--poll_sec', type=float, default=0.2, help='liepa_ausys_processing_poll_sec of the client')
+    argparser.add_argument('--json', help='write results to this JSON file')
+    args = argparser.parse_args()
+
+    clients = [c.strip() for c in args.clients.split(",")]
+    config = MockConfig(latency_sec=args.latency, speed_ratio=args.speed_ratio, failure_rate=args.failure_rate, seed=1)
+    server = MockAsrServer(("127.0.0.1", 0), config).start()
+    results:List[BenchmarkResult] = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="liepa_ausys_bench_") as work_dir:
+            wav_dir = os.path.join(work_dir, "wav")
+            os.mkdir(wav_dir)
+            for i in range(args.files):
+                write_test_wav(os.path.join(wav_dir, f"bench_{i:04d}.wav"), args.duration)
+            env_path = os.path.join(work_dir, "benchmark.env")
+            write_env(env_path, server.url, wav_dir, args.poll_sec)
+            if "liepa" in clients:
+                for jobs in [int(j) for j in args.jobs.split(",")]:
+                    command = [sys.executable, "run.files.py", "-e", env_path, "--force", "--jobs", str(jobs)]
+                    mode = "liepa serial" if jobs == 1 else f"liepa --jobs {jobs}"
+                    results.append(benchmark_mode(mode, command, server, wav_dir, args.files))
+                    logging.info(results[-1])
+            if "whisper" in clients:
+                for jobs in [int(j) for j in args.jobs.split(",")]:
+                    command = [sys.executable, "run_files_whisper.py", "-e", env_path, "--force", "--jobs", str(jobs)]
+                    mode = "whisper serial" if jobs == 1 else f"whisper --jobs {jobs}"
+                    results.append(benchmark_mode(mode, command, server, wav_dir, args.files))
+                    logging.info(results[-1])
+            if "liepa" in clients and "whisper" in clients:
+                # every file is transcribed on both engines, results are <name>.liepa.lat and <name>.whisper.lat
+                jobs = max(int(j) for j in args.jobs.split(","))
+                command = [sys.executable, "run.files.py", "-e", env_path, "--force", "--backend", "liepa,whisper", "--jobs", str(jobs)]
+                results.append(benchmark_mode(f"both --jobs {jobs}", command, server, wav_dir, 2 * args.files))
+                logging.info(results[-1])
+    finally:
+        server.stop()
+
+    print(f"{'mode':<20} {'done':>9} {'sec':>8} {'files/s':>8} {'upload MB/s':>12} {'req/job':>8} {'RSS MB':>7}")
+    for r in results:
+        print(f"{r.mode:<20} {r.completed:>4}/{r.files:<4} {r.seconds:>8} {r.files_per_sec:>8} {r.upload_mb_per_sec:>12} "
+              f"{r.requests_per_job:>8} {r.max_rss_mb:>7}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump([asdict(r) for r in results], f, indent=2)
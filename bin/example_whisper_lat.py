@@ -1,11 +1,16 @@
 import argparse
 import io
+import os
+import sys
 import urllib.request
 # import urllib.parse
 import json
 # import subprocess
 import uuid
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from liepa_ausys.multipart import MultipartFileBody
+
 import logging
 logging.basicConfig(
     level=logging.DEBUG,
@@ -25,32 +30,16 @@ def main(a_server_url:str, a_file:io.BufferedReader, a_server_auth:str, a_whispe
     url = f"{a_server_url}/upload?upload_id={request_guid}"
     file_path_to_upload = a_file
 
-    # We'll use a multipart/form-data request to simulate the curl -F
-    boundary = '----WebKitFormBoundary7MA4YWxkTrZu0gW'
-    crlf = b'\r\n'
-    data = []
-    data.append(b'--' + boundary.encode())
-    data.append(b'Content-Disposition: form-data; name="files"; filename="zinios.wav"')
-    data.append(b'Content-Type: audio/mpeg')
-    data.append(b'')
-
+    # We'll use a multipart/form-data request to simulate the curl -F, the file is streamed from disk
     with a_file as f:
-        data.append(f.read())
-    data.append(b'--' + boundary.encode() + b'--')
-    data.append(b'')
-    body = crlf.join(data)
-
-    headers_upload = {
-        'Content-Type': f'multipart/form-data; boundary={boundary}',
-        'Content-Length': str(len(body))
-    }
-    headers={**headers_upload, **headers_auth}
-    print("url", url)
-
-    req = urllib.request.Request(url, data=body, headers=headers, method='POST')
-    with urllib.request.urlopen(req) as response:
-        file_path_output = response.read().decode('utf-8')
-        file_path = json.loads(file_path_output)[0]
+        body = MultipartFileBody(f, "zinios.wav")
+        headers={**body.headers(), **headers_auth}
+        print("url", url)
+
+        req = urllib.request.Request(url, data=body, headers=headers, method='POST')
+        with urllib.request.urlopen(req) as response:
+            file_path_output = response.read().decode('utf-8')
+            file_path = json.loads(file_path_output)[0]
 
     # Prepare the data for the API call
     data_payload = {
@@ -1,4 +1,9 @@
+import json
+import os
+import random
+import tempfile
 import unittest
+from unittest import mock
 import sys
 
 sys.path.append('../')
@@ -38,5 +43,221 @@ class TestAlignText(unittest.TestCase):
         self.assertEqual(['AA', 'CC', '-', 'BB'], list(aligned_B), "aligned_B")
 
 
+BACKENDS = ["python", "numpy"] if align_text.np != None else ["python"]
+
+
+class TestAlignTextLinear(unittest.TestCase):
+    def test_same_results_as_full_table(self):
+        cases = [
+            (["AA", "CC", "BB"], ["AA","GG", "BB"]),
+            (["AA", "CC", "BB"], ["AA","CC", "MM","BB"]),
+            (["AA", "CC", "II" , "BB"], ["AA","CC","BB"]),
+        ]
+        for backend in BACKENDS:
+            for A, B in cases:
+                full_A, full_B, full_score = align_text.smith_waterman(A, B)
+                aligned_A, aligned_B, max_score = align_text.smith_waterman_linear(A, B, backend=backend)
+
+                self.assertEqual(full_score, max_score)
+                self.assertEqual(list(full_A), list(aligned_A), "aligned_A")
+                self.assertEqual(list(full_B), list(aligned_B), "aligned_B")
+
+    def random_pair(self, rnd):
+        """ Small vocabulary noise, or an ASR-like hypothesis: the reference with substitutions, deletions and insertions """
+        if rnd.random() < 0.5:
+            return ([rnd.choice("abcd") for _ in range(rnd.randint(0, 60))],
+                    [rnd.choice("abcd") for _ in range(rnd.randint(0, 60))])
+        vocabulary = [f"w{k}" for k in range(30)]
+        reference = [rnd.choice(vocabulary) for _ in range(rnd.randint(0, 80))]
+        hypothesis = []
+        for word in reference:
+            edit = rnd.random()
+            if edit < 0.1:
+                hypothesis.append(rnd.choice(vocabulary))
+            elif edit < 0.15:
+                continue
+            else:
+                hypothesis.append(word)
+            if rnd.random() < 0.05:
+                hypothesis.append(rnd.choice(vocabulary))
+        return rnd.choice([(reference, hypothesis), (hypothesis, reference)])
+
+    def test_randomized_same_alignment_as_full_table(self):
+        rnd = random.Random(7)
+        for _ in range(300):
+            A, B = self.random_pair(rnd)
+            with mock.patch.object(align_text, "NUMPY_MIN_CELLS", 10 ** 9):
+                full_A, full_B, full_score = align_text.smith_waterman(A, B)
+                full_A, full_B = list(full_A), list(full_B)
+            for backend in BACKENDS:
+                self.assertEqual((full_A, full_B, full_score), align_text.smith_waterman_linear(A, B, backend=backend))
+            # the engine smith_waterman picks for larger inputs
+            with mock.patch.object(align_text, "NUMPY_MIN_CELLS", 0), mock.patch.object(align_text, "FULL_TABLE_MAX_CELLS", 0):
+                aligned_A, aligned_B, max_score = align_text.smith_waterman(A, B)
+            self.assertEqual((full_A, full_B, full_score), (list(aligned_A), list(aligned_B), max_score))
+            if full_A:
+                # the aligned pairs CSV and WER of the local engine
+                self.assertEqual(align_text.transpose_arrays(full_A, full_B), align_text.transpose_arrays(list(aligned_A), list(aligned_B)))
+
+    def test_no_common_words(self):
+        self.assertEqual(([], [], 0), align_text.smith_waterman_linear(["AA"], ["BB"]))
+
+
+class TestWer(unittest.TestCase):
+    def test_substitution_deletion_insertion(self):
+        for backend in BACKENDS:
+            result = align_text.wer_alignment(["a", "b", "c", "d", "e"], ["a", "x", "c", "e", "f"], backend=backend)
+
+            self.assertEqual((1, 1, 1, 5), (result.substitutions, result.deletions, result.insertions, result.reference_words))
+            self.assertEqual(60.0, result.wer)
+            self.assertEqual([("a", "a", 0), ("b", "x", 1), ("c", "c", 0), ("d", "-", 1), ("e", "e", 0), ("-", "f", 1)], result.aligned_pairs)
+
+    def test_edit_distance_matches_full_table(self):
+        rnd = random.Random(11)
+        for _ in range(100):
+            A = [rnd.choice("abc") for _ in range(rnd.randint(0, 30))]
+            B = [rnd.choice("abc") for _ in range(rnd.randint(0, 30))]
+            full_errors = sum(1 for i, j in align_text.global_alignment_full(A, B, 0, -1, -1)
+                              if i == None or j == None or A[i] != B[j])
+            for backend in BACKENDS:
+                self.assertEqual(full_errors, align_text.wer_alignment(A, B, backend=backend).errors)
+
+    def test_randomized_same_alignment_as_full_table(self):
+        rnd = random.Random(13)
+        for _ in range(300):
+            reference, hypothesis = TestAlignTextLinear.random_pair(self, rnd)
+            full_pairs = [(reference[i] if i != None else '-', hypothesis[j] if j != None else '-')
+                          for i, j in align_text.global_alignment_full(reference, hypothesis, 0, -1, -1)]
+            full_errors = sum(1 for r, h in full_pairs if r != h or r == '-')
+            for backend in BACKENDS:
+                result = align_text.wer_alignment(reference, hypothesis, backend=backend)
+                self.assertEqual(full_pairs, [(r, h) for r, h, _ in result.aligned_pairs])
+                self.assertEqual(full_errors, result.errors)
+
+    def test_max_errors_early_exit(self):
+        self.assertIsNone(align_text.wer_alignment(["a", "b", "c", "d"], ["x", "y", "z", "w"], max_errors=3))
+        self.assertIsNone(align_text.wer_alignment(["a"] * 10, ["a"], max_errors=5))
+        self.assertEqual(4, align_text.wer_alignment(["a", "b", "c", "d"], ["x", "y", "z", "w"], max_errors=4).errors)
+
+    def test_empty_reference(self):
+        self.assertEqual(0.0, align_text.wer_alignment([], []).wer)
+        self.assertEqual(100.0, align_text.wer_alignment([], ["a"]).wer)
+
+
+def write_pair(directory, name, reference, recognized):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, name + ".txt"), 'w') as f:
+        f.write("\n".join(reference) + "\n")
+    with open(os.path.join(directory, name + ".lat"), 'w') as f:
+        f.write("# 1 S0000\n")
+        for i, word in enumerate(recognized):
+            f.write(f"1 {i}.00 {i}.50 {word}\n")
+
+
+class TestCorpus(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        write_pair(self.tmp_dir.name, "a", ["labas", "rytas", "visiems"], ["labas", "rytas", "visiems"])
+        write_pair(os.path.join(self.tmp_dir.name, "sub", "dir"), "b", ["labas", "vakaras"], ["labas", "vakare", "jums"])
+        write_pair(self.tmp_dir.name, "c", ["viena"], [])
+        os.remove(os.path.join(self.tmp_dir.name, "c.txt"))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_nested_pairs(self):
+        pairs = align_text.find_transcription_pairs(self.tmp_dir.name)
+
+        self.assertEqual([os.path.join(self.tmp_dir.name, "a.lat"), os.path.join(self.tmp_dir.name, "sub", "dir", "b.lat")],
+                         [lat for lat, _ in pairs])
+
+    def test_summary(self):
+        for workers in (1, 2):
+            summary_path = os.path.join(self.tmp_dir.name, "summary.jsonl")
+            summary = align_text.score_corpus(self.tmp_dir.name, summary_path, engine="global", workers=workers)
+
+            self.assertEqual((2, 2, 5, 2), (summary["files"], summary["scored"], summary["words"], summary["errors"]))
+            self.assertEqual(40.0, summary["micro_wer"])
+            self.assertEqual(50.0, summary["macro_wer"])
+            self.assertEqual(os.path.join(self.tmp_dir.name, "sub", "dir", "b.lat"), summary["worst"][0]["file"])
+            with open(summary_path) as f:
+                lines = [json.loads(line) for line in f]
+            self.assertEqual(3, len(lines))
+            self.assertEqual(summary, lines[-1]["summary"])
+            self.assertTrue(all("seconds" in line for line in lines[:-1]))
+
+    def test_malformed_lattice_is_skipped(self):
+        write_pair(self.tmp_dir.name, "d", ["labas"], [])
+        # word line without the end time
+        with open(os.path.join(self.tmp_dir.name, "d.lat"), 'w') as f:
+            f.write("# 1 S0000\n1 0.00 labas\n")
+
+        with self.assertLogs(level="ERROR"):
+            self.assertEqual([], align_text.read_lat_to_array(os.path.join(self.tmp_dir.name, "d.lat")))
+        os.remove(os.path.join(self.tmp_dir.name, "c.lat"))
+        align_text.align_transcribtions_in_directory(self.tmp_dir.name)
+
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir.name, "a.csv")))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir.name, "d.csv")))
+
+    def test_missing_reference(self):
+        # c.txt was removed in setUp
+        task = (os.path.join(self.tmp_dir.name, "c.lat"), os.path.join(self.tmp_dir.name, "c.txt"), "local", None, None)
+
+        with self.assertLogs(level="ERROR"):
+            record = align_text.score_transcription_file(task)
+
+        self.assertTrue(record["skipped"])
+        self.assertNotIn("error", record)
+        align_text.align_transcribtions_in_directory(self.tmp_dir.name)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir.name, "a.csv")))
+
+
+class TestAlignmentCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        write_pair(self.tmp_dir.name, "a", ["labas", "rytas", "visiems"], ["labas", "ryts"])
+        self.lat_path = os.path.join(self.tmp_dir.name, "a.lat")
+        self.txt_path = os.path.join(self.tmp_dir.name, "a.txt")
+        self.cache = align_text.AlignmentCache(os.path.join(self.tmp_dir.name, ".align_cache"))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_cached_result_is_reused(self):
+        for engine in ("local", "global"):
+            first = align_text.align_transcription_file(self.lat_path, self.txt_path, engine, cache=self.cache)
+            with mock.patch.object(align_text, "smith_waterman", side_effect=AssertionError), \
+                 mock.patch.object(align_text, "wer_alignment", side_effect=AssertionError):
+                second = align_text.align_transcription_file(self.lat_path, self.txt_path, engine, cache=self.cache)
+
+            self.assertEqual(first, second)
+
+    def test_key_depends_on_tokens_and_scores(self):
+        key = align_text.AlignmentCache.key("local", ["a", "b"], ["a"], (2, -1, -1))
+
+        self.assertEqual(key, align_text.AlignmentCache.key("local", ["a", "b"], ["a"], (2, -1, -1)))
+        self.assertNotEqual(key, align_text.AlignmentCache.key("local", ["a", "b"], ["a"], (1, -1, -1)))
+        self.assertNotEqual(key, align_text.AlignmentCache.key("local", ["a", "b"], ["b"], (2, -1, -1)))
+        self.assertNotEqual(key, align_text.AlignmentCache.key("local", ["ab"], ["a"], (2, -1, -1)))
+
+    def test_max_wer_applies_to_cached_result(self):
+        align_text.align_transcription_file(self.lat_path, self.txt_path, "global", cache=self.cache)
+
+        self.assertIsNone(align_text.align_transcription_file(self.lat_path, self.txt_path, "global", 50, self.cache))
+
+    def test_prune_least_recently_used(self):
+        result = align_text.WerResult(0, 0, 0, 1, 0.0, [("a", "a", 0)])
+        for i, key in enumerate(["aa01", "bb02", "cc03"]):
+            self.cache.put(key, result)
+            os.utime(self.cache.path(key), (1000 + i, 1000 + i))
+        self.cache.get("aa01")
+        self.cache.max_bytes = 2 * os.path.getsize(self.cache.path("aa01"))
+
+        self.assertEqual(1, self.cache.prune())
+        self.assertIsNone(self.cache.get("bb02"))
+        self.assertEqual(result, self.cache.get("aa01"))
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1 @@
+"""Shared client code of the Liepa ASR service runners"""
@@ -0,0 +1,30 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import IO, Iterator, Optional
+
+
+@contextmanager
+def atomic_open(path:str, mode:str='w', encoding:Optional[str]=None) -> Iterator[IO]:
+    """
+    Write `path` through a temporary file in the same directory, renamed into place when
+    the block ends without an error. Readers (a watcher of the output directory, another
+    runner) see either the previous file or the complete new one, never a partial write.
+    """
+    directory = os.path.dirname(path) or "."
+    f = tempfile.NamedTemporaryFile(mode, encoding=encoding, dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp",
+                                    delete=False)
+    try:
+        with f:
+            yield f
+        os.replace(f.name, path)
+    except BaseException:
+        os.remove(f.name)
+        raise
+
+
+def write_text_atomic(path:str, text:str) -> int:
+    """ Write UTF-8 text atomically, returns the size of the file """
+    with atomic_open(path, 'w', encoding="utf-8") as f:
+        f.write(text)
+    return os.path.getsize(path)
@@ -0,0 +1,119 @@
+import logging
+from contextlib import ExitStack
+from typing import Optional
+
+import aiohttp
+
+from .atomic_file import atomic_open
+from .retry import ServiceError, parse_retry_after
+
+DOWNLOAD_BLOCK_SIZE = 256 * 1024
+
+
+class AusisError(ServiceError):
+    """Non OK response of the Liepa transcription service"""
+
+
+class AusisClient():
+    """
+    Asyncio client of the Liepa transcription service.
+
+    All requests share one keep-alive connection pool, so status polls of thousands of
+    jobs awaited from one event loop reuse already opened TCP/TLS connections.
+    """
+
+    def __init__(self, ausis_url:str, auth:Optional[str]=None, max_connections:int=16):
+        self.ausis_url = ausis_url.rstrip("/")
+        self.auth = auth
+        self.max_connections = max_connections
+        self.session:Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+        # uploads and result downloads of long recordings are slow, only stalled sockets are treated as errors
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=300)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=timeout, headers=self.get_headers())
+
+    async def close(self):
+        if self.session != None:
+            await self.session.close()
+            self.session = None
+
+    def get_headers(self) -> dict:
+        if self.auth:
+            return {'Authorization': f'Basic {self.auth}'}
+        return {}
+
+    async def check(self, response:aiohttp.ClientResponse):
+        """ Raise on a non OK response, the status code tells the retry layer if it is worth repeating """
+        if not response.ok:
+            text = await response.text()
+            logging.error(f"Error: Server response: {response.status}, {text}")
+            raise AusisError("Error from server!", response.status, parse_retry_after(response.headers.get("Retry-After")))
+
+    async def upload(self, file_path:str, recognizer:str, email:Optional[str]=None) -> str:
+        """ Send wav file to server, returns transcription id """
+        logging.debug("------------------- upload -------------------")
+        send_url = f"{self.ausis_url}/transcriber/upload"
+        with open(file_path, 'rb') as file:
+            data = aiohttp.FormData()
+            data.add_field('file', file, filename=file_path, content_type='multipart/form-data')
+            data.add_field('recognizer', recognizer)
+            if email != None:
+                data.add_field('email', email)
+            async with self.session.post(send_url, data=data) as response:
+                await self.check(response)
+                response_json = await response.json(content_type=None)
+        transcription_id = response_json["id"]
+        logging.info(f'transcription id:{transcription_id}')
+        return transcription_id
+
+    async def status(self, transcription_id:str) -> str:
+        """ Ping server to get status """
+        logging.debug("------------------- status -------------------")
+        status_url = f"{self.ausis_url}/status.service/status/{transcription_id}"
+        async with self.session.get(status_url) as response:
+            await self.check(response)
+            response_json = await response.json(content_type=None)
+        error = response_json["error"]
+        status = response_json["status"]
+        if error != "":
+            logging.error(f"Error: {error} during {status}")
+            raise AusisError("Error from server!")
+        return status
+
+    async def result(self, transcription_id:str, result_name:str) -> str:
+        """ Retrieve result file content """
+        logging.debug("------------------- result -------------------")
+        result_url = f"{self.ausis_url}/result.service/result/{transcription_id}/{result_name}"
+        async with self.session.get(result_url) as response:
+            await self.check(response)
+            text = await response.text(encoding="utf-8")
+        return text
+
+    async def download(self, transcription_id:str, result_name:str, out_path:str) -> int:
+        """
+        Stream a result file to `out_path` block by block, returns its size. The file is only
+        replaced when the download completes; an empty result leaves it untouched and returns 0.
+        The body is requested compressed and decoded while it arrives.
+        """
+        logging.debug("------------------- download -------------------")
+        result_url = f"{self.ausis_url}/result.service/result/{transcription_id}/{result_name}"
+        size = 0
+        async with self.session.get(result_url, headers={'Accept-Encoding': 'gzip, deflate'}) as response:
+            await self.check(response)
+            with ExitStack() as stack:
+                f = None
+                async for block in response.content.iter_chunked(DOWNLOAD_BLOCK_SIZE):
+                    if f == None:
+                        f = stack.enter_context(atomic_open(out_path, 'wb'))
+                    f.write(block)
+                    size += len(block)
+        return size
@@ -0,0 +1,247 @@
+import logging
+import os
+import time
+from contextlib import aclosing
+from typing import Callable, Dict, List, Optional
+
+from .atomic_file import write_text_atomic
+from .ausis_client import AusisClient, AusisError
+from .gradio_client import GradioClient, GradioError, parse_complete_event
+from .poll_scheduler import PollScheduler
+from .retry import Retrier
+from .run_metrics import FileMetrics
+
+liepa_ausys_processing_timeout_sec:int=86400 #1day
+liepa_ausys_processing_poll_sec:float=1 # shortest delay between status polls
+liepa_ausys_processing_poll_max_sec:float=60 # longest delay between status polls
+liepa_ausys_status_requests_per_sec:float=20 # status polls of all jobs are spread to this rate
+liepa_ausys_stream_read_timeout_sec:int=300 # longest silence between events of the result stream
+
+StatusCallback = Callable[[str], None]
+
+
+class Backend():
+    """
+    A transcription engine as seen by the runner: `submit` sends a recording and starts a
+    job, `wait` returns once the job is done (reporting every status it passes through) and
+    `fetch` downloads one of its artifacts. Jobs of a backend share its connection pool
+    and its `Retrier`, so a server outage seen by one job pauses submissions of all.
+    """
+    name = ""
+    # result file extension -> artifact name on the server
+    artifacts:Dict[str,str] = {}
+    required_env:List[str] = []
+
+    def __init__(self, url:str, model:str, timeout_sec:float=liepa_ausys_processing_timeout_sec, retrier:Optional[Retrier]=None):
+        self.url = url.rstrip("/")
+        self.model = model
+        self.timeout_sec = timeout_sec
+        self.retrier = retrier if retrier != None else Retrier()
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def save_history(self):
+        pass
+
+    def deadline(self) -> float:
+        return time.monotonic() + self.timeout_sec
+
+    def check_deadline(self, deadline:float):
+        if time.monotonic() > deadline:
+            logging.error(f"Error. Timeout it took more than {self.timeout_sec} sec to complete the task. adjust `liepa_ausys_processing_timeout_sec` variable per your needs.")
+            raise Exception("Error: Server timeout")
+
+    async def submit(self, wav_path:str, metrics:Optional[FileMetrics]=None) -> str:
+        """ Send the recording and start its transcription, returns the job id """
+        raise NotImplementedError
+
+    async def reattach(self, job_id:str) -> Optional[str]:
+        """ Status of a job submitted by an earlier run, None if it cannot be followed anymore """
+        return None
+
+    async def wait(self, job_id:str, audio_sec:float, on_status:StatusCallback, status:str="",
+                   on_progress:Optional[StatusCallback]=None) -> dict:
+        """
+        Return when the job is completed, `status` is set for jobs re-attached from an earlier
+        run. `on_progress` gets signs of life which are not status changes (e.g. heartbeats),
+        for the progress display only. Returns processing seconds per stage if the server reports them.
+        """
+        raise NotImplementedError
+
+    async def fetch(self, job_id:str, result_ext:str) -> str:
+        """ Content of a completed job's result, `result_ext` is a key of `artifacts` """
+        raise NotImplementedError
+
+    async def download(self, job_id:str, result_ext:str, out_path:str) -> int:
+        """ Write a completed job's result to `out_path` atomically, returns its size; 0 if the result is empty and nothing was written """
+        text = await self.fetch(job_id, result_ext)
+        if text == "":
+            return 0
+        return write_text_atomic(out_path, text)
+
+
+class LiepaBackend(Backend):
+    """ Liepa transcription service: upload, then status polls placed by the `PollScheduler` """
+    name = "liepa"
+    artifacts = {'lat': "lat.restored.txt", 'eaf': "result.eaf"}
+    required_env = ["liepa_ausys_url"]
+
+    def __init__(self, ausis_url:str, auth:Optional[str]=None, email:Optional[str]=None, model:str="ben",
+                 max_connections:int=16, scheduler:Optional[PollScheduler]=None, timeout_sec:float=liepa_ausys_processing_timeout_sec,
+                 retrier:Optional[Retrier]=None):
+        super().__init__(ausis_url, model, timeout_sec, retrier)
+        self.email = email
+        self.client = AusisClient(ausis_url, auth, max_connections=max_connections)
+        self.scheduler = scheduler if scheduler != None else PollScheduler(model=model)
+
+    @classmethod
+    def from_env(cls, env_dict:Dict[str,str], directory:str, connections:int=16, jobs:int=1, url:Optional[str]=None) -> "LiepaBackend":
+        model = "ben"
+        scheduler = PollScheduler(min_delay=float(env_dict.get("liepa_ausys_processing_poll_sec", liepa_ausys_processing_poll_sec)),
+                                  max_delay=float(env_dict.get("liepa_ausys_processing_poll_max_sec", liepa_ausys_processing_poll_max_sec)),
+                                  max_polls_per_sec=float(env_dict.get("liepa_ausys_status_requests_per_sec", liepa_ausys_status_requests_per_sec)),
+                                  history_path=os.path.join(directory, ".liepa_ausys_rtf.json"), model=model)
+        return cls(url or env_dict["liepa_ausys_url"], env_dict.get("liepa_ausys_auth"), env_dict.get("liepa_ausys_email"), model,
+                   max_connections=connections, scheduler=scheduler,
+                   timeout_sec=int(env_dict.get("liepa_ausys_processing_timeout_sec", liepa_ausys_processing_timeout_sec)),
+                   retrier=Retrier.from_env(env_dict))
+
+    async def open(self):
+        await self.client.open()
+
+    async def close(self):
+        await self.client.close()
+
+    def save_history(self):
+        self.scheduler.save_history()
+
+    async def submit(self, wav_path:str, metrics:Optional[FileMetrics]=None) -> str:
+        metrics = metrics if metrics != None else FileMetrics(wav_path, 0.0)
+        with metrics.stage("upload"):
+            return await self.retrier.call("upload", self.client.upload, wav_path, self.model, self.email, submission=True)
+
+    async def reattach(self, job_id:str) -> Optional[str]:
+        try:
+            status = await self.retrier.call("status", self.client.status, job_id)
+        except AusisError:
+            return None
+        return status
+
+    async def wait(self, job_id:str, audio_sec:float, on_status:StatusCallback, status:str="",
+                   on_progress:Optional[StatusCallback]=None) -> dict:
+        reattached = status != ""
+        deadline = self.deadline()
+        submitted_at = time.monotonic()
+        polled_at = submitted_at
+        delay = self.scheduler.min_delay if reattached else self.scheduler.first_delay(audio_sec)
+        poll_count = 0
+        while status != "COMPLETED":
+            await self.scheduler.wait(delay)
+            poll_count += 1
+            delay = self.scheduler.next_delay(poll_count)
+            status = await self.retrier.call("status", self.client.status, job_id)
+            polled_at = time.monotonic()
+            on_status(status)
+            self.check_deadline(deadline)
+        if not reattached:
+            processing_sec = polled_at - submitted_at
+            # completed at the first poll: the job took at most this long
+            self.scheduler.observe(audio_sec, processing_sec, upper_bound=poll_count == 1)
+            logging.info(f"Processing  took seconds: {processing_sec:.2f} (Ratio {processing_sec/audio_sec:.2f}). Status polls: {poll_count}")
+        return {}
+
+    async def fetch(self, job_id:str, result_ext:str) -> str:
+        return await self.retrier.call("result", self.client.result, job_id, self.artifacts[result_ext])
+
+    async def download(self, job_id:str, result_ext:str, out_path:str) -> int:
+        return await self.retrier.call("result", self.client.download, job_id, self.artifacts[result_ext], out_path)
+
+
+class WhisperBackend(Backend):
+    """
+    Gradio Whisper space: upload, `/call/predict`, then the result arrives at the end of
+    the job's event stream. Streams cannot be re-attached, a rerun submits the file again.
+    """
+    name = "whisper"
+    artifacts = {'lat': "lat.restored.txt"}
+    required_env = ["whisper_url"]
+
+    def __init__(self, whisper_url:str, auth:Optional[str]=None, model:str="whisper-medium-l2c_e4", max_connections:int=16,
+                 timeout_sec:float=liepa_ausys_processing_timeout_sec, stream_read_timeout_sec:float=liepa_ausys_stream_read_timeout_sec,
+                 retrier:Optional[Retrier]=None):
+        super().__init__(whisper_url, model, timeout_sec, retrier)
+        self.client = GradioClient(whisper_url, auth, max_connections=max_connections, stream_read_timeout_sec=stream_read_timeout_sec)
+        self.results:Dict[str,Dict[str,str]] = {}
+
+    @classmethod
+    def from_env(cls, env_dict:Dict[str,str], directory:str, connections:int=16, jobs:int=1, url:Optional[str]=None) -> "WhisperBackend":
+        # every job in flight keeps its result stream open for the whole processing time
+        return cls(url or env_dict["whisper_url"], env_dict.get("liepa_ausys_auth"), env_dict.get("whisper_model") or "whisper-medium-l2c_e4",
+                   max_connections=connections + jobs,
+                   timeout_sec=int(env_dict.get("liepa_ausys_processing_timeout_sec", liepa_ausys_processing_timeout_sec)),
+                   stream_read_timeout_sec=int(env_dict.get("liepa_ausys_stream_read_timeout_sec", liepa_ausys_stream_read_timeout_sec)),
+                   retrier=Retrier.from_env(env_dict))
+
+    async def open(self):
+        await self.client.open()
+
+    async def close(self):
+        await self.client.close()
+
+    async def submit(self, wav_path:str, metrics:Optional[FileMetrics]=None) -> str:
+        metrics = metrics if metrics != None else FileMetrics(wav_path, 0.0)
+        # an upload only stores the file under a new name, the job is created by predict
+        with metrics.stage("upload"):
+            remote_file = await self.retrier.call("upload", self.client.upload, wav_path)
+        with metrics.stage("submit"):
+            return await self.retrier.call("predict", self.client.predict, remote_file, self.model, submission=True)
+
+    async def wait(self, job_id:str, audio_sec:float, on_status:StatusCallback, status:str="",
+                   on_progress:Optional[StatusCallback]=None) -> dict:
+        # a stream broken by the network is opened again
+        return await self.retrier.call("result stream", self.read_events, job_id, on_status, self.deadline(), on_progress)
+
+    async def read_events(self, job_id:str, on_status:StatusCallback, deadline:float, on_progress:Optional[StatusCallback]=None) -> dict:
+        # the stream is dropped as soon as the result is there
+        async with aclosing(self.client.events(job_id)) as events:
+            async for sse_event in events:
+                logging.debug("[wait]event: %s data: %.200s", sse_event.event, sse_event.data)
+                # heartbeat events only report that the job is still in progress, for a predict
+                # which doesn't stream partial results they are the only events before `complete`
+                if sse_event.event == "heartbeat":
+                    if on_progress != None:
+                        on_progress("Processing")
+                else:
+                    on_status(sse_event.event)
+                if sse_event.event == "error":
+                    logging.error(f"Error: {sse_event.data}")
+                    raise GradioError("Error from server!")
+                if sse_event.event == "complete" and sse_event.data != "null":
+                    lat_text, procesing_time_breakdown = parse_complete_event(sse_event.data)
+                    self.results[job_id] = {'lat': lat_text}
+                    formatted_strings = [f"{name.title()}: {sec:.2f}" for name, sec in procesing_time_breakdown.items()]
+                    logging.info(f"\tServer processing time:{formatted_strings}")
+                    return procesing_time_breakdown
+                self.check_deadline(deadline)
+        # the connection was cut, the retry layer opens the stream again
+        raise ConnectionError("Error: result stream closed before the result")
+
+    async def fetch(self, job_id:str, result_ext:str) -> str:
+        result = self.results.pop(job_id, {}).get(result_ext)
+        if result == None:
+            raise GradioError(f"Error: no '{result_ext}' result of {job_id}")
+        return result
+
+
+BACKENDS = {backend.name: backend for backend in (LiepaBackend, WhisperBackend)}
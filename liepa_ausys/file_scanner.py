@@ -0,0 +1,152 @@
+import fnmatch
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from .atomic_file import atomic_open
+from .wav_probe import WavFormatError, WavInfo, probe_wav
+
+GLOB_CHARS = re.compile(r'[*?\[]')
+
+
+class ScannedFile(NamedTuple):
+    path: str
+    size: int
+    mtime: float
+    info: Optional[WavInfo]
+    # time spent reading the header, 0 if it came from the index
+    probe_sec: float = 0.0
+
+    @property
+    def duration(self) -> float:
+        return self.info.duration if self.info != None else 0.0
+
+
+def split_pattern(wav_path_pattern:str) -> Tuple[str,List[str]]:
+    """
+    Split `liepa_ausys_wav_path` into the directory to scan and glob segments below it,
+    e.g. `wav/**/*.wav` -> (`wav`, [`**`, `*.wav`]). A plain directory means `*.wav` in it.
+    """
+    parts = wav_path_pattern.replace(os.sep, '/').split('/')
+    for i, part in enumerate(parts):
+        if GLOB_CHARS.search(part):
+            root = '/'.join(parts[:i])
+            return (root if root or wav_path_pattern.startswith('/') else '.') or '/', parts[i:]
+    return wav_path_pattern.rstrip('/') or '.', ['*.wav']
+
+
+def iter_matching_files(directory:str, segments:Sequence[str]) -> Iterator[os.DirEntry]:
+    """ Walk `directory` with os.scandir descending only where the glob segments can still match """
+    try:
+        entries = list(os.scandir(directory))
+    except (FileNotFoundError, NotADirectoryError, PermissionError) as e:
+        logging.warning(f"Can't scan '{directory}': {e}")
+        return
+    if segments[0] == '**':
+        if len(segments) > 1:
+            yield from iter_matching_files(directory, segments[1:])
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False) and not entry.name.startswith('.'):
+                yield from iter_matching_files(entry.path, segments)
+        return
+    for entry in entries:
+        if not fnmatch.fnmatchcase(entry.name, segments[0]):
+            continue
+        if len(segments) == 1:
+            if entry.is_file():
+                yield entry
+        elif entry.is_dir():
+            yield from iter_matching_files(entry.path, segments[1:])
+
+
+def outputs_are_fresh(wav_path:str, mtime:float, output_exts:Sequence[str]) -> bool:
+    """ True if every output (`.lat`, `.eaf`, ...) exists and is not older than the audio """
+    if not output_exts:
+        return False
+    for output_ext in output_exts:
+        try:
+            if os.stat(re.sub('wav$', output_ext, wav_path)).st_mtime < mtime:
+                return False
+        except FileNotFoundError:
+            return False
+    return True
+
+
+class FileIndex():
+    """ Probed headers cached on disk, an entry is valid while (path, size, mtime) is unchanged """
+
+    def __init__(self, index_path:Optional[str]):
+        self.index_path = index_path
+        self.entries:Dict[str,list] = {}
+        if index_path != None and os.path.exists(index_path):
+            try:
+                with open(index_path, 'r') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"File index {index_path} ignored: {e}")
+
+    def get(self, path:str, size:int, mtime:float) -> Tuple[bool,Optional[WavInfo]]:
+        entry = self.entries.get(path)
+        if entry == None or entry[0] != size or entry[1] != mtime:
+            return False, None
+        return True, WavInfo(*entry[2]) if entry[2] != None else None
+
+    def put(self, path:str, size:int, mtime:float, info:Optional[WavInfo]):
+        self.entries[path] = [size, mtime, list(info) if info != None else None]
+
+    def save(self, paths:Sequence[str]):
+        """ Store entries of `paths` only, files which disappeared are dropped """
+        if self.index_path == None:
+            return
+        # a unique temporary file: runners on other nodes may save the index at the same time
+        with atomic_open(self.index_path, 'w') as f:
+            json.dump({path: self.entries[path] for path in paths if path in self.entries}, f)
+
+
+def probe_or_none(path:str) -> Optional[WavInfo]:
+    try:
+        return probe_wav(path)
+    except (OSError, WavFormatError) as e:
+        logging.warning(f"Skipping {path}: {e}")
+        return None
+
+
+def timed_probe(path:str) -> Tuple[Optional[WavInfo],float]:
+    started = time.monotonic()
+    info = probe_or_none(path)
+    return info, time.monotonic() - started
+
+
+def scan_audio_files(wav_path_pattern:str, output_exts:Sequence[str]=('lat',), index_path:Optional[str]=None,
+                     skip_fresh:bool=True, workers:int=16) -> List[ScannedFile]:
+    """
+    Pre-flight scan: find audio files matching `wav_path_pattern` (recursive with `**`),
+    skip those whose outputs are already newer than the input and probe headers of the rest
+    in a thread pool. Probed headers are cached in the index file keyed by (path, size, mtime).
+    """
+    root, segments = split_pattern(wav_path_pattern)
+    index = FileIndex(index_path)
+    candidates = []
+    for entry in iter_matching_files(root, segments):
+        stat = entry.stat()
+        if skip_fresh and outputs_are_fresh(entry.path, stat.st_mtime, output_exts):
+            logging.debug(f"Skipping {entry.path}: outputs are up to date")
+            continue
+        candidates.append((entry.path, stat.st_size, stat.st_mtime))
+    candidates.sort()
+
+    to_probe = [c for c in candidates if not index.get(*c)[0]]
+    probe_secs:Dict[str,float] = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for (path, size, mtime), (info, probe_sec) in zip(to_probe, executor.map(timed_probe, [c[0] for c in to_probe])):
+            index.put(path, size, mtime, info)
+            probe_secs[path] = probe_sec
+    logging.info(f"Scanned {wav_path_pattern}: {len(candidates)} files to process, {len(to_probe)} headers probed")
+
+    scanned = [ScannedFile(path, size, mtime, index.get(path, size, mtime)[1], probe_secs.get(path, 0.0)) for path, size, mtime in candidates]
+    index.save([f.path for f in scanned])
+    return [f for f in scanned if f.info != None]
@@ -0,0 +1,130 @@
+import json
+import logging
+import os
+import uuid
+from typing import AsyncIterator, Optional
+
+import aiohttp
+
+from .retry import ServiceError, parse_retry_after
+from .sse import SseEvent, SseParser
+
+
+class GradioError(ServiceError):
+    """Non OK response or error event of the Gradio Whisper space"""
+
+
+async def iter_lines(content:aiohttp.StreamReader) -> AsyncIterator[bytes]:
+    """
+    Lines of a response body as they arrive. Unlike `StreamReader.readline` a line is not
+    limited in length: the `complete` event carries the whole lattice on one data line.
+    """
+    pending = bytearray()
+    async for data in content.iter_any():
+        search_from = len(pending)
+        pending += data
+        start = 0
+        while True:
+            end = pending.find(b'\n', max(start, search_from))
+            if end < 0:
+                break
+            yield bytes(pending[start:end + 1])
+            start = end + 1
+        del pending[:start]
+    if pending:
+        yield bytes(pending)
+
+
+class GradioClient():
+    """
+    Asyncio client of the Gradio Whisper space: file upload, `/call/predict` and the
+    server-sent event stream with the result. All requests share one connection pool.
+    """
+
+    def __init__(self, whisper_url:str, auth:Optional[str]=None, max_connections:int=16, stream_read_timeout_sec:float=300):
+        self.whisper_url = whisper_url.rstrip("/")
+        self.auth = auth
+        self.max_connections = max_connections
+        self.stream_read_timeout_sec = stream_read_timeout_sec
+        self.session:Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+        # the result stream is silent between heartbeats, only a longer silence is an error
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=self.stream_read_timeout_sec)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=timeout, headers=self.get_headers())
+
+    async def close(self):
+        if self.session != None:
+            await self.session.close()
+            self.session = None
+
+    def get_headers(self) -> dict:
+        if self.auth:
+            return {'Authorization': f'Basic {self.auth}'}
+        return {}
+
+    async def check(self, response:aiohttp.ClientResponse):
+        if not response.ok:
+            text = await response.text()
+            logging.error(f"Error: {response.status}, {text}")
+            raise GradioError("Error from server!", response.status, parse_retry_after(response.headers.get("Retry-After")))
+
+    async def upload(self, file_path:str) -> str:
+        """ Send audio file to the space, returns its path on the server """
+        logging.debug("------------------- upload -------------------")
+        url = f"{self.whisper_url}/upload?upload_id={uuid.uuid4()}"
+        with open(file_path, 'rb') as file:
+            data = aiohttp.FormData()
+            # the file is streamed from disk block by block
+            data.add_field('files', file, filename=os.path.basename(file_path), content_type='audio/mpeg')
+            async with self.session.post(url, data=data) as response:
+                await self.check(response)
+                remote_paths = await response.json(content_type=None)
+        if not remote_paths:
+            raise GradioError("Error: Server path not found")
+        logging.debug("[upload] remote_file_path: %s", remote_paths[0])
+        return remote_paths[0]
+
+    async def predict(self, remote_file_path:str, model:str) -> str:
+        """ Start transcription of an uploaded file, returns the event id of its result stream """
+        data_payload = {
+            "data": [
+                {"path": remote_file_path, "meta": {"_type": "gradio.FileData"}},
+                model,
+                False
+            ]
+        }
+        async with self.session.post(f"{self.whisper_url}/call/predict", json=data_payload) as response:
+            await self.check(response)
+            event_id_json = await response.json(content_type=None)
+        logging.debug("[predict]event_id_json %s", event_id_json)
+        return event_id_json.get('event_id')
+
+    async def events(self, event_id:str) -> AsyncIterator[SseEvent]:
+        """ Events of the result stream, parsed while they arrive """
+        async with self.session.get(f"{self.whisper_url}/call/predict/{event_id}") as response:
+            await self.check(response)
+            parser = SseParser()
+            async for line in iter_lines(response.content):
+                sse_event = parser.feed_line(line)
+                if sse_event != None:
+                    yield sse_event
+            sse_event = parser.close()
+            if sse_event != None:
+                yield sse_event
+
+
+def parse_complete_event(data:str) -> tuple:
+    """ (lattice text, server processing seconds per stage) of a `complete` event """
+    result_json = json.loads(data)
+    lat_text = result_json[0]
+    data_list = result_json[1]["data"]
+    return lat_text, {item[0]: item[1] for item in data_list}
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+
+@dataclass
+class ManifestEntry:
+    path: str
+    size: int
+    mtime: float
+    sha256: str
+    recognizer: str = ""
+    upload_id: Optional[str] = None
+    status: Optional[str] = None
+    outputs: List[str] = field(default_factory=list)
+
+
+def file_sha256(file_path:str, block_size:int=1024*1024) -> str:
+    """ Content hash of a file, read in blocks """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class JobManifest():
+    """
+    On-disk record of every file sent to the server: its content hash, upload id, last
+    known status and written outputs. Each change is committed immediately, so after a
+    crash a rerun can skip finished files and re-attach to jobs still running on the server.
+    `current_entry` hashes files and is meant to run in a worker thread, the connection is
+    shared by the threads under a lock.
+    """
+
+    def __init__(self, manifest_path:str):
+        self.manifest_path = manifest_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(manifest_path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            sha256 TEXT NOT NULL,
+            recognizer TEXT NOT NULL DEFAULT '',
+            upload_id TEXT,
+            status TEXT,
+            outputs TEXT NOT NULL DEFAULT '[]',
+            updated REAL NOT NULL)""")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def get(self, path:str) -> Optional[ManifestEntry]:
+        with self.lock:
+            row = self.conn.execute("SELECT path, size, mtime, sha256, recognizer, upload_id, status, outputs FROM jobs WHERE path = ?",
+                                    (path,)).fetchone()
+        if row == None:
+            return None
+        return ManifestEntry(*row[:7], outputs=json.loads(row[7]))
+
+    def current_entry(self, path:str) -> ManifestEntry:
+        """
+        Entry describing the file as it is on disk now. The stored record is returned if the
+        content hash still matches, the hash is only recomputed when size or mtime changed.
+        """
+        stat = os.stat(path)
+        entry = self.get(path)
+        if entry != None and entry.size == stat.st_size and entry.mtime == stat.st_mtime:
+            return entry
+        sha256 = file_sha256(path)
+        if entry != None and entry.sha256 == sha256:
+            entry.size, entry.mtime = stat.st_size, stat.st_mtime
+            self.save(entry)
+            return entry
+        return ManifestEntry(path=path, size=stat.st_size, mtime=stat.st_mtime, sha256=sha256)
+
+    def save(self, entry:ManifestEntry):
+        with self.lock:
+            self.conn.execute("""INSERT OR REPLACE INTO jobs (path, size, mtime, sha256, recognizer, upload_id, status, outputs, updated)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (entry.path, entry.size, entry.mtime, entry.sha256, entry.recognizer, entry.upload_id, entry.status,
+                 json.dumps(entry.outputs), time.time()))
+
+    def record_upload(self, entry:ManifestEntry, upload_id:str, recognizer:str):
+        entry.upload_id = upload_id
+        entry.recognizer = recognizer
+        entry.status = "Uploaded"
+        entry.outputs = []
+        self.save(entry)
+
+    def record_status(self, entry:ManifestEntry, status:str):
+        if entry.status != status:
+            entry.status = status
+            self.save(entry)
+
+    def record_outputs(self, entry:ManifestEntry, outputs:List[str]):
+        entry.outputs = outputs
+        self.save(entry)
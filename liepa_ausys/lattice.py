@@ -0,0 +1,290 @@
+import logging
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+
+class LatFormatError(ValueError):
+    """Line of a `.lat` file which is neither a part header, a word nor a blank line"""
+
+
+class WordData():
+    """ One word line of a lattice: `<main> <from> <to> <words> [<punkt>]` """
+    __slots__ = ('main', 'from_time', 'to_time', 'words', 'punkt')
+
+    def __init__(self, main:int, from_time:float, to_time:float, words:str, punkt:Optional[str]=None):
+        self.main = main
+        self.from_time = from_time
+        self.to_time = to_time
+        self.words = words
+        self.punkt = punkt
+
+    def __eq__(self, other):
+        return isinstance(other, WordData) and all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return f"WordData(main={self.main}, from_time={self.from_time}, to_time={self.to_time}, words={self.words!r}, punkt={self.punkt!r})"
+
+
+class PartData():
+    """ Part header `# <part_num> <speaker_id>` and, when read with `iter_lat_parts`, its words """
+    __slots__ = ('speaker_id', 'part_num', 'words')
+
+    def __init__(self, speaker_id:str, part_num:int, words:Optional[List[WordData]]=None):
+        self.speaker_id = speaker_id
+        self.part_num = part_num
+        self.words = words if words != None else []
+
+    def __eq__(self, other):
+        return isinstance(other, PartData) and all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return f"PartData(speaker_id={self.speaker_id!r}, part_num={self.part_num}, words={self.words!r})"
+
+
+def parse_lat_lines(lines:Iterable[str], source:str="") -> Iterator[Union[PartData,WordData]]:
+    """
+    Streaming lattice parser: yields a `PartData` (without words) when a part starts and then a
+    `WordData` per word line, nothing is kept after it is yielded. Word strings are interned,
+    the same few thousand words repeat through a long session.
+    """
+    intern = sys.intern
+    for line_num, line in enumerate(lines, 1):
+        parts = line.split()
+        if not parts:
+            continue
+        if line.startswith('#'):
+            if len(parts) < 3:
+                raise LatFormatError(f"{source}:{line_num}: wrong part start: {line.strip()}")
+            yield PartData(intern(parts[2]), int(parts[1]), None)
+        else:
+            if len(parts) < 4:
+                raise LatFormatError(f"{source}:{line_num}: wrong word line: {line.strip()}")
+            try:
+                yield WordData(int(parts[0]), float(parts[1]), float(parts[2]), intern(parts[3]),
+                               parts[4] if len(parts) > 4 else None)
+            except ValueError as e:
+                raise LatFormatError(f"{source}:{line_num}: {e}") from None
+
+
+def iter_text_lat_parts(file_path:str) -> Iterator[PartData]:
+    part = None
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for item in parse_lat_lines(f, file_path):
+            if isinstance(item, PartData):
+                if part != None:
+                    yield part
+                part = item
+            else:
+                if part == None:
+                    # words before the first header belong to an unnamed part
+                    part = PartData("", 0, None)
+                part.words.append(item)
+    if part != None:
+        yield part
+
+
+# Binary sidecar `.latb`: header, string table and little-endian column arrays, each section 8-byte aligned
+#   string offsets u32[strings + 1], utf-8 string blob,
+#   part_num i32[parts], part speaker u32[parts], part first word u32[parts + 1],
+#   word main i32[words], from f64[words], to f64[words], word string u32[words], punkt string i32[words] (-1: none)
+LATB_MAGIC = b'LATB'
+LATB_VERSION = 1
+LATB_HEADER = struct.Struct('<4sHHIIII')
+
+
+def latb_path_of(lat_path:str) -> str:
+    return lat_path + "b" if lat_path.endswith(".lat") else lat_path + ".latb"
+
+
+def pad8(size:int) -> int:
+    return (size + 7) & ~7
+
+
+def write_latb(lat_path:str, latb_path:Optional[str]=None) -> str:
+    """ Parse `lat_path` once and store it as a `.latb` sidecar (temp file + rename) """
+    latb_path = latb_path or latb_path_of(lat_path)
+    string_ids:Dict[str,int] = {}
+    def string_id(text:str) -> int:
+        return string_ids.setdefault(text, len(string_ids))
+    part_num, part_speaker, part_first_word = array('i'), array('I'), array('I')
+    word_main, word_from, word_to, word_text, word_punkt = array('i'), array('d'), array('d'), array('I'), array('i')
+    for part in iter_text_lat_parts(lat_path):
+        part_num.append(part.part_num)
+        part_speaker.append(string_id(part.speaker_id))
+        part_first_word.append(len(word_main))
+        for word in part.words:
+            word_main.append(word.main)
+            word_from.append(word.from_time)
+            word_to.append(word.to_time)
+            word_text.append(string_id(word.words))
+            word_punkt.append(string_id(word.punkt) if word.punkt != None else -1)
+    part_first_word.append(len(word_main))
+
+    blob = bytearray()
+    string_offsets = array('I', [0])
+    for text in string_ids:
+        blob += text.encode('utf-8')
+        string_offsets.append(len(blob))
+    sections = [string_offsets, blob, part_num, part_speaker, part_first_word, word_main, word_from, word_to, word_text, word_punkt]
+    tmp_path = f"{latb_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(LATB_HEADER.pack(LATB_MAGIC, LATB_VERSION, 0, len(part_num), len(word_main), len(string_ids), len(blob)))
+        f.write(b'\0' * (pad8(LATB_HEADER.size) - LATB_HEADER.size))
+        for section in sections:
+            if isinstance(section, array) and sys.byteorder != 'little':
+                section = array(section.typecode, section)
+                section.byteswap()
+            data = section.tobytes() if isinstance(section, array) else bytes(section)
+            f.write(data)
+            f.write(b'\0' * (pad8(len(data)) - len(data)))
+    os.replace(tmp_path, latb_path)
+    return latb_path
+
+
+def save_latb_sidecar(lat_path:str):
+    """ Write the `.latb` sidecar of a freshly saved lattice, failures are only logged: the `.lat` stays the source """
+    try:
+        write_latb(lat_path)
+    except (OSError, LatFormatError) as e:
+        logging.warning(f"Binary lattice for {lat_path} not written: {e}")
+
+
+class LatticeColumns():
+    """
+    Memory-mapped `.latb` file. Columns (`part_num`, `from_time`, `word_text`, ...) are
+    memoryviews into the mapping, nothing is copied except the decoded string table.
+    Use as a context manager, the views are invalid after `close`.
+    """
+    COLUMNS = ('string_offsets', None, 'part_num', 'part_speaker', 'part_first_word',
+               'word_main', 'word_from', 'word_to', 'word_text', 'word_punkt')
+    TYPECODES = ('I', None, 'i', 'I', 'I', 'i', 'd', 'd', 'I', 'i')
+
+    def __init__(self, latb_path:str):
+        if sys.byteorder != 'little':
+            raise ValueError("binary lattices are read on little-endian hosts only")
+        self.latb_path = latb_path
+        self._file = open(latb_path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{latb_path} is empty")
+        self._views = []
+        try:
+            self._map_columns()
+        except (ValueError, TypeError, struct.error) as e:
+            self.close()
+            raise ValueError(f"{latb_path}: {e}")
+
+    def _map_columns(self):
+        magic, version, _, parts, words, strings, blob_size = LATB_HEADER.unpack_from(self._mm, 0)
+        if magic != LATB_MAGIC or version != LATB_VERSION:
+            raise ValueError("not a binary lattice of a supported version")
+        counts = (strings + 1, blob_size, parts, parts, parts + 1, words, words, words, words, words)
+        view = memoryview(self._mm)
+        self._views.append(view)
+        offset = pad8(LATB_HEADER.size)
+        for name, typecode, count in zip(self.COLUMNS, self.TYPECODES, counts):
+            size = count * (struct.calcsize(typecode) if typecode else 1)
+            if offset + size > len(self._mm):
+                raise ValueError("file is truncated")
+            column = view[offset:offset + size]
+            self._views.append(column)
+            if typecode:
+                column = column.cast(typecode)
+                self._views.append(column)
+                setattr(self, name, column)
+            else:
+                blob = column
+            offset += pad8(size)
+        offsets = self.string_offsets
+        self.strings = [str(blob[offsets[i]:offsets[i + 1]], 'utf-8') for i in range(strings)]
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def iter_parts(self) -> Iterator[PartData]:
+        strings = self.strings
+        first_word = self.part_first_word
+        for p in range(len(self.part_num)):
+            words = [WordData(self.word_main[w], self.word_from[w], self.word_to[w], strings[self.word_text[w]],
+                              strings[self.word_punkt[w]] if self.word_punkt[w] >= 0 else None)
+                     for w in range(first_word[p], first_word[p + 1])]
+            yield PartData(strings[self.part_speaker[p]], self.part_num[p], words)
+
+    def main_words(self) -> List[str]:
+        """ Same tokens as `read_lat_words`, each distinct word string is normalized once """
+        normalized:Dict[int,List[str]] = {}
+        strings = self.strings
+        result_arr = []
+        for main, text_id in zip(self.word_main, self.word_text):
+            if main != 1:
+                continue
+            tokens = normalized.get(text_id)
+            if tokens == None:
+                text = strings[text_id]
+                tokens = normalized[text_id] = [] if text == "<eps>" else text.lower().split("_")
+            result_arr.extend(tokens)
+        return result_arr
+
+
+def open_fresh_latb(lat_path:str) -> Optional[LatticeColumns]:
+    """ Mapped `.latb` sidecar if it exists and is not older than the `.lat`, None otherwise """
+    latb_path = latb_path_of(lat_path)
+    try:
+        if os.stat(latb_path).st_mtime_ns < os.stat(lat_path).st_mtime_ns:
+            return None
+        return LatticeColumns(latb_path)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logging.warning(f"Binary lattice {latb_path} ignored: {e}")
+        return None
+
+
+def iter_lat_parts(file_path:str) -> Iterator[PartData]:
+    """
+    Parts of a `.lat` file with their words, only one part is held in memory at a time.
+    A fresh `.latb` sidecar is read instead of the text when there is one.
+    """
+    columns = open_fresh_latb(file_path)
+    if columns == None:
+        yield from iter_text_lat_parts(file_path)
+        return
+    with columns:
+        yield from columns.iter_parts()
+
+
+def iter_lat_words(file_path:str, main_only:bool=False) -> Iterator[Tuple[Optional[PartData],WordData]]:
+    """ (part, word) pairs of a `.lat` file, `main_only` keeps the best path (`main` == 1) only """
+    for part in iter_lat_parts(file_path):
+        for word in part.words:
+            if not main_only or word.main == 1:
+                yield part, word
+
+
+def read_lat_words(file_path:str) -> List[str]:
+    """ Recognized words of the best path, lower cased, `<eps>` dropped and `a_b` split into `a`, `b` """
+    columns = open_fresh_latb(file_path)
+    if columns != None:
+        with columns:
+            return columns.main_words()
+    result_arr = []
+    for _, word in iter_lat_words(file_path, main_only=True):
+        if word.words != "<eps>":
+            result_arr.extend(word.words.lower().split("_"))
+    return result_arr
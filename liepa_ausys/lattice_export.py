@@ -0,0 +1,191 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, TextIO, Type
+
+from .lattice import LatFormatError, PartData, WordData, iter_lat_parts
+
+# subtitle cues are closed when any of these limits is reached
+CUE_MAX_CHARS = 84
+CUE_MAX_SEC = 7.0
+CUE_MAX_PAUSE_SEC = 1.0
+
+
+def word_text(word:WordData) -> str:
+    text = word.words.replace("_", " ")
+    return text + word.punkt if word.punkt != None else text
+
+
+def format_timestamp(seconds:float, separator:str) -> str:
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+
+class LatWriter():
+    """ Streaming exporter: gets parts one by one and writes them to `out` right away """
+    extension = ""
+
+    def __init__(self, out:TextIO, speakers:bool=False):
+        self.out = out
+        self.speakers = speakers
+
+    def write_part(self, part:PartData):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class AudacityLabelWriter(LatWriter):
+    """ Audacity label track: `<start>\\t<end>\\t<label>` per word of the best path """
+    extension = "audacity.txt"
+
+    def write_part(self, part:PartData):
+        prefix = f"{part.speaker_id}: " if self.speakers else ""
+        for word in part.words:
+            if word.main == 1:
+                self.out.write(f"{word.from_time}\t{word.to_time}\t{prefix}{word.words}\n")
+
+
+class TsvWriter(LatWriter):
+    """ All words with their part, speaker and alternative number, for analytics """
+    extension = "tsv"
+
+    def __init__(self, out:TextIO, speakers:bool=False):
+        super().__init__(out, speakers)
+        self.out.write("part\tspeaker\tmain\tstart\tend\tword\tpunkt\n")
+
+    def write_part(self, part:PartData):
+        for word in part.words:
+            self.out.write(f"{part.part_num}\t{part.speaker_id}\t{word.main}\t{word.from_time}\t{word.to_time}\t"
+                           f"{word.words}\t{word.punkt or ''}\n")
+
+
+class SubtitleWriter(LatWriter):
+    """ Best path words grouped into cues, a cue never spans two parts (speaker turns) """
+    time_separator = ","
+
+    def __init__(self, out:TextIO, speakers:bool=False):
+        super().__init__(out, speakers)
+        self.cue_num = 0
+
+    def write_cue(self, start:float, end:float, text:str):
+        raise NotImplementedError
+
+    def write_part(self, part:PartData):
+        cue:List[WordData] = []
+        length = 0
+        for word in part.words:
+            if word.main != 1 or word.words == "<eps>":
+                continue
+            text = word_text(word)
+            if cue and (length + 1 + len(text) > CUE_MAX_CHARS or word.to_time - cue[0].from_time > CUE_MAX_SEC
+                        or word.from_time - cue[-1].to_time > CUE_MAX_PAUSE_SEC):
+                self.flush_cue(part, cue)
+                cue, length = [], 0
+            cue.append(word)
+            length += len(text) + (1 if length else 0)
+        if cue:
+            self.flush_cue(part, cue)
+
+    def flush_cue(self, part:PartData, cue:List[WordData]):
+        text = " ".join(word_text(word) for word in cue)
+        if self.speakers:
+            text = f"{part.speaker_id}: {text}"
+        self.cue_num += 1
+        self.write_cue(cue[0].from_time, cue[-1].to_time, text)
+
+
+class SrtWriter(SubtitleWriter):
+    extension = "srt"
+
+    def write_cue(self, start:float, end:float, text:str):
+        self.out.write(f"{self.cue_num}\n{format_timestamp(start, ',')} --> {format_timestamp(end, ',')}\n{text}\n\n")
+
+
+class VttWriter(SubtitleWriter):
+    extension = "vtt"
+
+    def __init__(self, out:TextIO, speakers:bool=False):
+        super().__init__(out, speakers)
+        self.out.write("WEBVTT\n\n")
+
+    def write_cue(self, start:float, end:float, text:str):
+        self.out.write(f"{format_timestamp(start, '.')} --> {format_timestamp(end, '.')}\n{text}\n\n")
+
+
+EXPORTERS:Dict[str,Type[LatWriter]] = {
+    "audacity": AudacityLabelWriter,
+    "srt": SrtWriter,
+    "vtt": VttWriter,
+    "tsv": TsvWriter,
+}
+
+
+def output_path(lat_path:str, export_format:str) -> str:
+    base = lat_path[:-len(".lat")] if lat_path.endswith(".lat") else lat_path
+    return f"{base}.{EXPORTERS[export_format].extension}"
+
+
+def export_lattice(lat_path:str, formats:Sequence[str]=("audacity",), speakers:bool=False) -> List[str]:
+    """
+    Convert one lattice to every format in `formats` in a single pass, outputs are written
+    next to the input through temp files, so a failed export never leaves a partial file.
+    """
+    paths = [output_path(lat_path, export_format) for export_format in formats]
+    files:List[TextIO] = []
+    try:
+        # opened inside the try, so the files opened before a failing one are removed too
+        for path in paths:
+            files.append(open(f"{path}.{os.getpid()}.tmp", 'w', encoding='utf-8', newline='\n'))
+        writers = [EXPORTERS[export_format](f, speakers) for export_format, f in zip(formats, files)]
+        for part in iter_lat_parts(lat_path):
+            for writer in writers:
+                writer.write_part(part)
+        for writer in writers:
+            writer.close()
+    except BaseException:
+        for f in files:
+            f.close()
+            os.remove(f.name)
+        raise
+    for path, f in zip(paths, files):
+        f.close()
+        os.replace(f.name, path)
+    return paths
+
+
+def find_lattices(paths:Iterable[str]) -> List[str]:
+    """ `.lat` files given directly or found in the given directories and their subdirectories """
+    lat_paths = []
+    for path in paths:
+        if not os.path.isdir(path):
+            lat_paths.append(path)
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+            lat_paths.extend(os.path.join(root, name) for name in sorted(files) if name.endswith(".lat"))
+    return lat_paths
+
+
+def export_or_none(lat_path:str, formats:Sequence[str], speakers:bool) -> Optional[List[str]]:
+    try:
+        return export_lattice(lat_path, formats, speakers)
+    except (OSError, LatFormatError) as e:
+        logging.error(f"{lat_path}: {e}")
+        return None
+
+
+def export_lattices(paths:Iterable[str], formats:Sequence[str]=("audacity",), speakers:bool=False,
+                    workers:Optional[int]=None) -> Dict[str,Optional[List[str]]]:
+    """ Export every lattice of `paths` in a process pool, returns outputs per input (None if it failed) """
+    lat_paths = find_lattices(paths)
+    if workers == 1 or len(lat_paths) <= 1:
+        return {lat_path: export_or_none(lat_path, formats, speakers) for lat_path in lat_paths}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(export_or_none, lat_paths, [formats] * len(lat_paths), [speakers] * len(lat_paths),
+                               chunksize=max(1, len(lat_paths) // (4 * (workers or os.cpu_count() or 1))))
+        return dict(zip(lat_paths, results))
@@ -0,0 +1,341 @@
+"""
+Local stand-in of the Liepa transcription service and of the Gradio Whisper space, for
+tests and client benchmarks without a live server:
+
+    python -m liepa_ausys.mock_server --port 8765 --latency 0.05 --speed_ratio 0.1 --failure_rate 0.02
+"""
+import argparse
+import gzip
+import json
+import logging
+import random
+import re
+import struct
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+# statuses reported by the Liepa service before COMPLETED, each takes an equal share of the processing time
+LIEPA_STATUSES = ("Upload", "Diarization", "Transcription", "ResultMake")
+
+
+@dataclass
+class MockConfig:
+    latency_sec: float = 0.0
+    # processing takes audio duration * speed_ratio (the real-time factor of the server)
+    speed_ratio: float = 0.1
+    # share of jobs which fail during processing
+    failure_rate: float = 0.0
+    # share of requests answered with 503 before they are handled
+    http_error_rate: float = 0.0
+    # Retry-After header (seconds) of the injected 503 responses
+    retry_after_sec: Optional[int] = None
+    # interval of Gradio heartbeat events while a job is processed
+    sse_interval_sec: float = 0.5
+    seed: Optional[int] = None
+
+
+@dataclass
+class MockJob:
+    duration_sec: float
+    created: float
+    fails: bool
+
+
+@dataclass
+class MockStats:
+    requests: Counter = field(default_factory=Counter)
+    jobs: int = 0
+    upload_bytes: int = 0
+    upload_sec: float = 0.0
+    http_errors: int = 0
+    compressed_results: int = 0
+
+    @property
+    def total_requests(self) -> int:
+        return sum(self.requests.values())
+
+
+def wav_duration_from_bytes(head:bytes, total_size:int) -> float:
+    """ Duration of a WAV file whose first bytes are `head`, 16 kHz 16-bit mono is assumed if there is no header """
+    riff = head.find(b'RIFF')
+    byte_rate = 32000
+    if riff >= 0:
+        position = riff + 12
+        while position + 8 <= len(head):
+            chunk_id, chunk_size = struct.unpack_from('<4sI', head, position)
+            if chunk_id == b'fmt ' and position + 16 <= len(head):
+                byte_rate = struct.unpack_from('<I', head, position + 16)[0] or byte_rate
+            elif chunk_id == b'data':
+                data_size = chunk_size if chunk_size not in (0, 0xFFFFFFFF) else total_size - position - 8
+                return min(data_size, total_size - position - 8) / byte_rate
+            position += 8 + chunk_size + (chunk_size & 1)
+    return total_size / byte_rate
+
+
+def mock_lattice(duration_sec:float) -> str:
+    """ Lattice with a word every half second, a new speaker part every 30 seconds """
+    lines = []
+    part_num = 0
+    t = 0.0
+    while t + 0.5 <= max(duration_sec, 0.5):
+        if t % 30 == 0:
+            part_num += 1
+            if lines:
+                lines.append("")
+            lines.append(f"# {part_num} S000{(part_num - 1) % 2}")
+        lines.append(f"1 {t:.2f} {t + 0.4:.2f} žodis{int(t * 2) % 97}")
+        t += 0.5
+    return "\n".join(lines) + "\n\n"
+
+
+def mock_eaf(duration_sec:float) -> str:
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n<ANNOTATION_DOCUMENT>'
+            f'<TIME_ORDER><TIME_SLOT TIME_SLOT_ID="ts1" TIME_VALUE="0"/><TIME_SLOT TIME_SLOT_ID="ts2" TIME_VALUE="{int(duration_sec * 1000)}"/></TIME_ORDER>'
+            '</ANNOTATION_DOCUMENT>\n')
+
+
+class MockAsrServer(ThreadingHTTPServer):
+    """ Both APIs on one port: Liepa `/transcriber/upload`, `/status.service`, `/result.service` and Gradio `/upload`, `/call/predict` """
+    daemon_threads = True
+
+    def __init__(self, address:Tuple[str,int]=("127.0.0.1", 0), config:Optional[MockConfig]=None):
+        super().__init__(address, MockRequestHandler)
+        self.config = config or MockConfig()
+        self.random = random.Random(self.config.seed)
+        self.lock = threading.Lock()
+        self.jobs:Dict[str,MockJob] = {}
+        self.gradio_files:Dict[str,float] = {}
+        self.stats = MockStats()
+        self.thread:Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockAsrServer":
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self.thread != None:
+            self.thread.join()
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = MockStats()
+
+    def add_job(self, duration_sec:float) -> str:
+        job_id = str(uuid.uuid4())
+        with self.lock:
+            self.jobs[job_id] = MockJob(duration_sec, time.monotonic(), self.random.random() < self.config.failure_rate)
+            self.stats.jobs += 1
+        return job_id
+
+    def job_state(self, job:MockJob) -> Tuple[Optional[int],float]:
+        """ (index into LIEPA_STATUSES or None when done, elapsed share of processing) """
+        processing_sec = job.duration_sec * self.config.speed_ratio
+        progress = (time.monotonic() - job.created) / processing_sec if processing_sec > 0 else 1.0
+        if progress >= 1.0:
+            return None, 1.0
+        return int(progress * len(LIEPA_STATUSES)), progress
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: MockAsrServer
+
+    def log_message(self, format, *args):
+        logging.debug("mock: " + format, *args)
+
+    def send(self, code:int, body, content_type:str="application/json", headers:Optional[dict]=None):
+        data = body.encode('utf-8') if isinstance(body, str) else body
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_body(self, keep:int=1024*1024) -> Tuple[bytes,int]:
+        """ Read the whole request body in blocks, returns its first `keep` bytes and its size """
+        head = bytearray()
+        size = 0
+        def consume(data:bytes):
+            nonlocal size
+            if len(head) < keep:
+                head.extend(data[:keep - len(head)])
+            size += len(data)
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while True:
+                chunk_size = int(self.rfile.readline().split(b';')[0].strip() or b'0', 16)
+                if chunk_size == 0:
+                    self.rfile.readline()
+                    break
+                consume(self.rfile.read(chunk_size))
+                self.rfile.readline()
+        else:
+            remaining = int(self.headers.get("Content-Length", 0))
+            while remaining > 0:
+                data = self.rfile.read(min(remaining, 256 * 1024))
+                if not data:
+                    break
+                consume(data)
+                remaining -= len(data)
+        return bytes(head), size
+
+    def read_upload(self) -> float:
+        started = time.monotonic()
+        head, size = self.read_body()
+        with self.server.lock:
+            self.server.stats.upload_bytes += size
+            self.server.stats.upload_sec += time.monotonic() - started
+        return wav_duration_from_bytes(head, size)
+
+    def begin(self, endpoint:str) -> bool:
+        """ Count the request, apply latency and error injection; False if the request was answered with an error """
+        server = self.server
+        with server.lock:
+            server.stats.requests[endpoint] += 1
+            inject_error = server.random.random() < server.config.http_error_rate
+            if inject_error:
+                server.stats.http_errors += 1
+        if server.config.latency_sec > 0:
+            time.sleep(server.config.latency_sec)
+        if inject_error:
+            if self.command == "POST":
+                self.read_body(keep=0)
+            retry_after = server.config.retry_after_sec
+            self.send(503, json.dumps({"error": "Injected failure"}),
+                      headers={"Retry-After": str(retry_after)} if retry_after != None else None)
+        return not inject_error
+
+    def do_POST(self):
+        path = self.path.split('?')[0]
+        if path == "/transcriber/upload":
+            if self.begin("upload"):
+                self.send(200, json.dumps({"id": self.server.add_job(self.read_upload())}))
+        elif path == "/upload":
+            if self.begin("gradio_upload"):
+                duration = self.read_upload()
+                remote_path = f"/tmp/gradio/{uuid.uuid4().hex}/audio.wav"
+                with self.server.lock:
+                    self.server.gradio_files[remote_path] = duration
+                self.send(200, json.dumps([remote_path]))
+        elif path == "/call/predict":
+            if self.begin("gradio_predict"):
+                head, _ = self.read_body()
+                try:
+                    remote_path = json.loads(head)["data"][0]["path"]
+                except (ValueError, KeyError, IndexError, TypeError):
+                    return self.send(422, json.dumps({"error": "Bad request"}))
+                with self.server.lock:
+                    duration = self.server.gradio_files.get(remote_path)
+                if duration == None:
+                    return self.send(404, json.dumps({"error": f"File {remote_path} not found"}))
+                self.send(200, json.dumps({"event_id": self.server.add_job(duration)}))
+        else:
+            self.read_body(keep=0)
+            self.send(404, json.dumps({"error": "Not found"}))
+
+    def do_GET(self):
+        match = re.match(r"^/status\.service/status/([^/]+)$", self.path)
+        if match:
+            if self.begin("status"):
+                self.status(match.group(1))
+            return
+        match = re.match(r"^/result\.service/result/([^/]+)/([^/]+)$", self.path)
+        if match:
+            if self.begin("result"):
+                self.result(match.group(1), match.group(2))
+            return
+        match = re.match(r"^/call/predict/([^/]+)$", self.path)
+        if match:
+            if self.begin("gradio_stream"):
+                self.stream(match.group(1))
+            return
+        self.send(404, json.dumps({"error": "Not found"}))
+
+    def status(self, job_id:str):
+        job = self.server.jobs.get(job_id)
+        if job == None:
+            return self.send(404, json.dumps({"error": "Not found"}))
+        stage, progress = self.server.job_state(job)
+        if job.fails and progress >= 0.5:
+            return self.send(200, json.dumps({"status": LIEPA_STATUSES[min(len(LIEPA_STATUSES) - 1, len(LIEPA_STATUSES) // 2)],
+                                              "error": "Injected processing failure"}))
+        self.send(200, json.dumps({"status": "COMPLETED" if stage == None else LIEPA_STATUSES[stage], "error": ""}))
+
+    def result(self, job_id:str, result_name:str):
+        job = self.server.jobs.get(job_id)
+        if job == None or job.fails or self.server.job_state(job)[0] != None:
+            return self.send(404, "Result not found", "text/plain")
+        if result_name == "result.eaf":
+            body, content_type = mock_eaf(job.duration_sec), "application/xml"
+        else:
+            body, content_type = mock_lattice(job.duration_sec), "text/plain; charset=utf-8"
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            with self.server.lock:
+                self.server.stats.compressed_results += 1
+            return self.send(200, gzip.compress(body.encode('utf-8')), content_type, {"Content-Encoding": "gzip"})
+        self.send(200, body, content_type)
+
+    def stream(self, job_id:str):
+        """ Gradio SSE result stream: heartbeats while processing, then `complete` or `error` """
+        job = self.server.jobs.get(job_id)
+        if job == None:
+            return self.send(404, json.dumps({"error": "Not found"}))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.close_connection = True
+        processing_sec = job.duration_sec * self.server.config.speed_ratio
+        try:
+            while True:
+                stage, progress = self.server.job_state(job)
+                if job.fails and progress >= 0.5:
+                    self.wfile.write(b'event: error\ndata: "Injected processing failure"\n\n')
+                    return
+                if stage == None:
+                    break
+                self.wfile.write(b"event: heartbeat\ndata: null\n\n")
+                self.wfile.flush()
+                time.sleep(min(self.server.config.sse_interval_sec, max(0.01, (1 - progress) * processing_sec)))
+            breakdown = [[name, round(processing_sec / len(LIEPA_STATUSES), 3)] for name in LIEPA_STATUSES]
+            payload = json.dumps([mock_lattice(job.duration_sec), {"data": breakdown}], ensure_ascii=False)
+            self.wfile.write(f"event: complete\ndata: {payload}\n\n".encode('utf-8'))
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description='Mock Liepa / Gradio Whisper transcription server')
+    argparser.add_argument('--host', default="127.0.0.1")
+    argparser.add_argument('--port', type=int, default=8765)
+    argparser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    argparser.add_argument('--speed_ratio', type=float, default=0.1, help='processing time per second of audio')
+    argparser.add_argument('--failure_rate', type=float, default=0.0, help='share of jobs failing during processing')
+    argparser.add_argument('--http_error_rate', type=float, default=0.0, help='share of requests answered with 503')
+    argparser.add_argument('--retry_after', type=int, help='Retry-After seconds of the 503 responses')
+    argparser.add_argument('--seed', type=int)
+    args = argparser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    config = MockConfig(latency_sec=args.latency, speed_ratio=args.speed_ratio, failure_rate=args.failure_rate,
+                        http_error_rate=args.http_error_rate, retry_after_sec=args.retry_after, seed=args.seed)
+    server = MockAsrServer((args.host, args.port), config)
+    logging.info(f"Mock server listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
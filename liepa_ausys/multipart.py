@@ -0,0 +1,47 @@
+import os
+import uuid
+from typing import BinaryIO, Iterator, Optional
+
+
+class MultipartFileBody():
+    """
+    multipart/form-data body with a single file field, streamed from an open binary file.
+
+    Only the small preamble and the closing boundary are kept in memory, the file itself
+    is read in blocks while the body is sent, so memory per upload does not depend on the
+    file size. `Content-Length` is computed from the file size up front.
+    """
+
+    def __init__(self, file:BinaryIO, file_name:str, field_name:str="files", content_type:str="audio/mpeg",
+                 boundary:Optional[str]=None, block_size:int=64*1024):
+        self.file = file
+        self.block_size = block_size
+        self.boundary = boundary or f"----LiepaAusysBoundary{uuid.uuid4().hex}"
+        self.preamble = b'\r\n'.join([
+            b'--' + self.boundary.encode(),
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{file_name}"'.encode(),
+            f'Content-Type: {content_type}'.encode(),
+            b'',
+            b'',
+        ])
+        self.epilogue = b'\r\n--' + self.boundary.encode() + b'--\r\n'
+        self.file_size = os.fstat(file.fileno()).st_size - file.tell()
+
+    @property
+    def content_length(self) -> int:
+        return len(self.preamble) + self.file_size + len(self.epilogue)
+
+    def headers(self) -> dict:
+        return {
+            'Content-Type': f'multipart/form-data; boundary={self.boundary}',
+            'Content-Length': str(self.content_length)
+        }
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield self.preamble
+        while True:
+            block = self.file.read(self.block_size)
+            if not block:
+                break
+            yield block
+        yield self.epilogue
@@ -0,0 +1,105 @@
+import asyncio
+import bisect
+import json
+import logging
+import os
+import random
+import time
+from typing import Dict, List, Optional
+
+from .atomic_file import atomic_open
+
+
+class PollScheduler():
+    """
+    Decides when in-flight jobs should ask the server for their status.
+
+    The first poll of a job is placed where the job is expected to finish, using the
+    audio duration and the real-time ratio (processing time / audio length) observed in
+    earlier runs. A job already completed at its first poll only shows that the estimate was
+    too high, so the estimate is then cut hard instead of averaged. After that the delay grows exponentially with jitter up to `max_delay`.
+    Each poll gets the first free slot at or after its target time, slots of all jobs are
+    at least 1 / `max_polls_per_sec` apart, so many jobs finishing their sleep at the same
+    moment do not hit the server in bursts, while a long job's distant poll does not hold
+    back the polls of short ones.
+    """
+
+    def __init__(self, min_delay:float=1.0, max_delay:float=60.0, backoff:float=2.0, jitter:float=0.2,
+                 max_polls_per_sec:float=20.0, default_rtf:float=0.1, history_path:Optional[str]=None, model:str=""):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.jitter = jitter
+        self.poll_interval = 1.0 / max_polls_per_sec if max_polls_per_sec > 0 else 0.0
+        self.default_rtf = default_rtf
+        self.history_path = history_path
+        self.model = model
+        self.history:Dict[str,dict] = {}
+        # reserved poll times, sorted
+        self.slots:List[float] = []
+        self.load_history()
+
+    def load_history(self):
+        if self.history_path == None or not os.path.exists(self.history_path):
+            return
+        try:
+            with open(self.history_path, 'r') as f:
+                self.history = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Real-time ratio history {self.history_path} ignored: {e}")
+
+    def save_history(self):
+        if self.history_path == None:
+            return
+        with atomic_open(self.history_path, 'w') as f:
+            json.dump(self.history, f)
+
+    @property
+    def rtf(self) -> float:
+        return self.history.get(self.model, {}).get("rtf", self.default_rtf)
+
+    def observe(self, audio_duration:float, processing_sec:float, weight:float=0.2, upper_bound:bool=False):
+        """
+        Update exponentially weighted real-time ratio with a completed job. With `upper_bound`
+        the job was done by the first poll, it could have finished any time before it.
+        """
+        if audio_duration <= 0:
+            return
+        rtf = processing_sec / audio_duration
+        entry = self.history.get(self.model)
+        if entry == None:
+            self.history[self.model] = {"rtf": rtf * 0.5 if upper_bound else rtf, "samples": 1}
+            return
+        if upper_bound:
+            # an average would shrink a too high estimate by a few percent per job only
+            entry["rtf"] = min(entry["rtf"], rtf) * 0.5
+        else:
+            entry["rtf"] = (1 - weight) * entry["rtf"] + weight * rtf
+        entry["samples"] += 1
+
+    def first_delay(self, audio_duration:float) -> float:
+        """ Delay before the first poll: a bit before the job is expected to finish """
+        return max(self.min_delay, 0.9 * audio_duration * self.rtf)
+
+    def next_delay(self, attempt:int) -> float:
+        """ Delay before poll number `attempt` (1 based) after the first one """
+        delay = min(self.max_delay, self.min_delay * self.backoff ** (attempt - 1))
+        return max(self.min_delay, delay * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def reserve(self, delay:float, now:Optional[float]=None) -> float:
+        """ Reserve a poll slot not earlier than `delay` from now, returns seconds to wait """
+        if now == None:
+            now = time.monotonic()
+        interval = self.poll_interval
+        # slots in the past are no longer in the way of anything
+        del self.slots[:bisect.bisect_left(self.slots, now - interval)]
+        slot = now + delay
+        i = bisect.bisect_right(self.slots, slot - interval)
+        while i < len(self.slots) and self.slots[i] < slot + interval:
+            slot = max(slot, self.slots[i] + interval)
+            i += 1
+        self.slots.insert(i, slot)
+        return slot - now
+
+    async def wait(self, delay:float):
+        await asyncio.sleep(self.reserve(delay))
@@ -0,0 +1,147 @@
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from .atomic_file import atomic_open
+
+# temporary files older than this were left by a crashed writer
+STALE_TMP_SEC = 3600
+# an eviction frees this share of `max_bytes`, so the next puts don't walk the whole store again
+EVICT_TO = 0.9
+
+
+def safe_name(name:str) -> str:
+    """ Model and backend names as single path components """
+    return re.sub(r'[^\w.-]', '_', name)
+
+
+class ResultStore():
+    """
+    Transcription results keyed by (audio content hash, backend, model, artifact), stored as
+    `<root>/<sha256[:2]>/<sha256>/<backend>/<model>/<artifact>`. The root can be shared by
+    runners in other directories or on other machines: results are written to a temporary
+    file and renamed into place, so a reader sees either the whole result or none. A read
+    touches the file's mtime, and when the store grows over `max_bytes` the least recently
+    used results are removed until it is down to `EVICT_TO` of it. Safe to use from several
+    threads.
+    """
+
+    def __init__(self, root:str, max_bytes:int=0):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.size:Optional[int] = None
+        self.hits = 0
+        self.stored = 0
+        self.lock = threading.Lock()
+
+    def path(self, sha256:str, backend:str, model:str, artifact:str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256, safe_name(backend), safe_name(model), safe_name(artifact))
+
+    def get(self, sha256:str, backend:str, model:str, artifact:str) -> Optional[str]:
+        path = self.path(sha256, backend, model, artifact)
+        try:
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            # never stored or just evicted by another runner
+            return None
+        return text
+
+    def contains(self, sha256:str, backend:str, model:str, artifact:str) -> bool:
+        return os.path.exists(self.path(sha256, backend, model, artifact))
+
+    def copy_to(self, sha256:str, backend:str, model:str, artifact:str, out_path:str) -> bool:
+        """ Copy a stored result to `out_path` atomically, False if it is not in the store """
+        path = self.path(sha256, backend, model, artifact)
+        try:
+            with open(path, 'rb') as f_in, atomic_open(out_path, 'wb') as f_out:
+                shutil.copyfileobj(f_in, f_out)
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def put(self, sha256:str, backend:str, model:str, artifact:str, text:str):
+        self.store(sha256, backend, model, artifact, lambda f: f.write(text.encode("utf-8")))
+
+    def put_file(self, sha256:str, backend:str, model:str, artifact:str, file_path:str):
+        def copy(f_out):
+            with open(file_path, 'rb') as f_in:
+                shutil.copyfileobj(f_in, f_out)
+        self.store(sha256, backend, model, artifact, copy)
+
+    def store(self, sha256:str, backend:str, model:str, artifact:str, write):
+        path = self.path(sha256, backend, model, artifact)
+        for attempt in range(3):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                with atomic_open(path, 'wb') as f:
+                    write(f)
+                break
+            except FileNotFoundError:
+                # the empty directory was just removed by an eviction in another runner
+                if attempt == 2:
+                    raise
+        size = os.path.getsize(path)
+        with self.lock:
+            self.stored += 1
+            if self.size != None:
+                self.size += size
+                if self.max_bytes > 0 and self.size > self.max_bytes:
+                    self.evict_unlocked()
+
+    def scan(self) -> List[Tuple[float,int,str]]:
+        """ (mtime, size, path) of every stored result, temporary files of crashed writers are removed """
+        entries = []
+        now = time.time()
+        for dir_path, _, file_names in os.walk(self.root):
+            for file_name in file_names:
+                path = os.path.join(dir_path, file_name)
+                try:
+                    stat = os.stat(path)
+                    if file_name.endswith(".tmp"):
+                        if now - stat.st_mtime > STALE_TMP_SEC:
+                            os.remove(path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self) -> int:
+        """ Remove least recently used results if the store is over `max_bytes`, returns the number removed """
+        with self.lock:
+            return self.evict_unlocked()
+
+    def evict_unlocked(self) -> int:
+        entries = self.scan()
+        self.size = sum(size for _, size, _ in entries)
+        if self.max_bytes <= 0 or self.size <= self.max_bytes:
+            return 0
+        removed = 0
+        for _, size, path in sorted(entries):
+            if self.size <= self.max_bytes * EVICT_TO:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.size -= size
+            removed += 1
+            self.remove_empty_dirs(os.path.dirname(path))
+        logging.info(f"Result store {self.root}: {removed} least recently used results removed")
+        return removed
+
+    def remove_empty_dirs(self, dir_path:str):
+        while os.path.abspath(dir_path) != os.path.abspath(self.root):
+            try:
+                os.rmdir(dir_path)
+            except OSError:
+                # not empty or already removed
+                return
+            dir_path = os.path.dirname(dir_path)
@@ -0,0 +1,185 @@
+import asyncio
+import email.utils
+import logging
+import random
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+import aiohttp
+
+T = TypeVar("T")
+
+# overload, gateway and timeout responses; other 4xx mean the request itself is wrong
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+# responses which refuse the request before it is processed
+RESUBMITTABLE_STATUS_CODES = {429, 503}
+
+
+class ServiceError(Exception):
+    """Non OK response of a transcription service"""
+
+    def __init__(self, message:str, status_code:Optional[int]=None, retry_after:Optional[float]=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value:Optional[str], now:Optional[float]=None) -> Optional[float]:
+    """ Seconds to wait from a `Retry-After` header given either as seconds or as an HTTP date """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at - (now if now != None else time.time()))
+
+
+def is_retryable(error:BaseException) -> bool:
+    """ Transient errors: lost connections, timeouts and overload responses. Anything else is fatal for the file """
+    if isinstance(error, ServiceError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError, ConnectionError))
+
+
+def is_not_accepted(error:BaseException) -> bool:
+    """
+    Errors which show that the server did not take the request: the connection could not
+    be made or the server refused it as overloaded. A submission is only resent after these,
+    after a timeout or a lost connection the job may already exist on the server.
+    """
+    if isinstance(error, ServiceError):
+        return error.status_code in RESUBMITTABLE_STATUS_CODES
+    return isinstance(error, (aiohttp.ClientConnectorError, ConnectionRefusedError))
+
+
+class RetryPolicy():
+    """ Exponential backoff with jitter; a `Retry-After` of the server is honoured up to `max_delay` """
+
+    def __init__(self, attempts:int=5, base_delay:float=1.0, max_delay:float=60.0, jitter:float=0.2):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def delay(self, attempt:int, retry_after:Optional[float]=None) -> float:
+        """ Delay after failed attempt number `attempt` (1 based) """
+        if retry_after != None:
+            return min(self.max_delay, retry_after)
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+class CircuitBreaker():
+    """
+    Counts consecutive transient failures of a server. After `failure_threshold` of them
+    the circuit opens and new submissions wait: first `cooldown_sec`, doubled up to
+    `max_cooldown_sec` while the server stays unhealthy. When the cooldown is over a
+    single probe call is let through, its success closes the circuit.
+    """
+
+    def __init__(self, failure_threshold:int=5, cooldown_sec:float=30.0, max_cooldown_sec:float=600.0):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown_sec = cooldown_sec
+        self.cooldown_sec = cooldown_sec
+        self.max_cooldown_sec = max_cooldown_sec
+        self.failures = 0
+        self.open_until = 0.0
+        self.probing = False
+        self.opened_count = 0
+
+    @property
+    def is_open(self) -> bool:
+        return self.failure_threshold > 0 and self.failures >= self.failure_threshold
+
+    async def wait(self) -> bool:
+        """ Wait while the circuit is open, True if the caller is let through as the probe """
+        while self.is_open:
+            now = time.monotonic()
+            if now < self.open_until:
+                await asyncio.sleep(self.open_until - now)
+            elif not self.probing:
+                self.probing = True
+                return True
+            else:
+                # the outcome of the probe decides
+                await asyncio.sleep(min(1.0, self.base_cooldown_sec))
+        return False
+
+    def record_success(self):
+        if self.is_open:
+            logging.info("Server is healthy again, resuming submissions")
+        self.failures = 0
+        self.cooldown_sec = self.base_cooldown_sec
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        now = time.monotonic()
+        if self.is_open and now >= self.open_until:
+            self.open_until = now + self.cooldown_sec
+            self.opened_count += 1
+            logging.warning(f"{self.failures} failed requests in a row, submissions paused for {self.cooldown_sec:.0f} s")
+            self.cooldown_sec = min(self.max_cooldown_sec, self.cooldown_sec * 2)
+
+    def release(self):
+        """ The probe ended with an error which says nothing about server health """
+        self.probing = False
+
+
+class Retrier():
+    """
+    Retry layer shared by all endpoint calls of a backend: transient errors are retried
+    with backoff, fatal ones are raised at once. Submissions are not idempotent, they are
+    retried only when the server surely did not accept them. Every outcome feeds the circuit breaker,
+    calls marked as submissions wait while it is open.
+    """
+
+    def __init__(self, policy:Optional[RetryPolicy]=None, breaker:Optional[CircuitBreaker]=None):
+        self.policy = policy if policy != None else RetryPolicy()
+        self.breaker = breaker if breaker != None else CircuitBreaker()
+        self.retries:Dict[str,int] = {}
+
+    @classmethod
+    def from_env(cls, env_dict:Dict[str,str]) -> "Retrier":
+        policy = RetryPolicy(attempts=int(env_dict.get("liepa_ausys_retry_attempts", 5)),
+                             base_delay=float(env_dict.get("liepa_ausys_retry_base_sec", 1.0)),
+                             max_delay=float(env_dict.get("liepa_ausys_retry_max_sec", 60.0)))
+        breaker = CircuitBreaker(failure_threshold=int(env_dict.get("liepa_ausys_breaker_failures", 5)),
+                                 cooldown_sec=float(env_dict.get("liepa_ausys_breaker_cooldown_sec", 30.0)))
+        return cls(policy, breaker)
+
+    async def call(self, what:str, fn:Callable[..., Awaitable[T]], *args, submission:bool=False, **kwargs) -> T:
+        attempt = 0
+        while True:
+            attempt += 1
+            probe = await self.breaker.wait() if submission else False
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                if not is_retryable(e):
+                    if probe:
+                        self.breaker.release()
+                    raise
+                self.breaker.record_failure()
+                if submission and not is_not_accepted(e):
+                    logging.error(f"Error. {what} failed ({type(e).__name__}: {e}), not resent as the server may have accepted it")
+                    raise
+                if attempt >= self.policy.attempts:
+                    logging.error(f"Error. {what} failed {attempt} times: {e}")
+                    raise
+                delay = self.policy.delay(attempt, getattr(e, "retry_after", None))
+                self.retries[what] = self.retries.get(what, 0) + 1
+                logging.warning(f"{what} failed ({type(e).__name__}: {e}), retry {attempt}/{self.policy.attempts - 1} in {delay:.1f} s")
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                if probe:
+                    self.breaker.release()
+                raise
+            self.breaker.record_success()
+            return result
@@ -0,0 +1,179 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+class FileMetrics():
+    """
+    Stage timings of one file on the monotonic clock. `stage(name)` times a client step
+    (probe, upload, download, ...), `status(name)` marks a server status seen by a poll or
+    a stream event: the time until the next different status is assigned to it.
+    """
+
+    def __init__(self, path:str, audio_sec:float, backend:str="", model:str=""):
+        self.path = path
+        self.audio_sec = audio_sec
+        self.backend = backend
+        self.model = model
+        self.started = time.monotonic()
+        self.stages:Dict[str,float] = {}
+        self.statuses:Dict[str,float] = {}
+        self.transitions:List[list] = []
+        self.server_stages:Dict[str,float] = {}
+        self.status_polls = 0
+        self.reattached = False
+        self.outcome:Optional[str] = None
+        self.current_status:Optional[str] = None
+        self.status_since = 0.0
+
+    def add(self, stage:str, seconds:float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name:str):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(name, time.monotonic() - started)
+
+    def status(self, status:str, poll:bool=True):
+        now = time.monotonic()
+        if poll:
+            self.status_polls += 1
+        if status == self.current_status:
+            return
+        self.end_status(now)
+        self.transitions.append([status, round(now - self.started, 3)])
+        self.current_status = status
+        self.status_since = now
+
+    def end_status(self, now:Optional[float]=None):
+        if self.current_status != None:
+            now = now if now != None else time.monotonic()
+            self.statuses[self.current_status] = self.statuses.get(self.current_status, 0.0) + now - self.status_since
+            self.current_status = None
+
+    @property
+    def rtf(self) -> Optional[float]:
+        """ Server processing time per second of audio, unknown for jobs re-attached from an earlier run """
+        processing = self.stages.get("processing")
+        if processing == None or self.reattached or not self.audio_sec:
+            return None
+        return processing / self.audio_sec
+
+    def record(self, outcome:Optional[str]=None, error:Optional[str]=None) -> dict:
+        self.end_status()
+        wall_sec = time.monotonic() - self.started
+        rtf = self.rtf
+        record = {
+            "time": round(time.time(), 3),
+            "file": self.path,
+            "backend": self.backend,
+            "model": self.model,
+            "outcome": outcome or self.outcome or "completed",
+            "audio_sec": round(self.audio_sec, 3),
+            "wall_sec": round(wall_sec, 3),
+            "rtf": round(rtf, 4) if rtf != None else None,
+            "total_rtf": round(wall_sec / self.audio_sec, 4) if self.audio_sec else None,
+            "stages": {name: round(sec, 3) for name, sec in self.stages.items()},
+            "statuses": {name: round(sec, 3) for name, sec in self.statuses.items()},
+            "transitions": self.transitions,
+            "status_polls": self.status_polls,
+        }
+        if self.server_stages:
+            record["server_stages"] = self.server_stages
+        if self.reattached:
+            record["reattached"] = True
+        if error != None:
+            record["error"] = error
+        return record
+
+
+def escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_value(value:float) -> str:
+    return f"{float(value):.6f}".rstrip('0').rstrip('.')
+
+
+def prometheus_labels(labels:Dict[str,str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in labels.items()) + "}"
+
+
+class MetricsWriter():
+    """
+    Appends one JSON line per file to `jsonl_path` as soon as the file is done and, on
+    `close`, writes run totals as a Prometheus textfile (node_exporter textfile collector)
+    to `prometheus_path`. Safe to use from several threads.
+    """
+
+    def __init__(self, jsonl_path:Optional[str]=None, prometheus_path:Optional[str]=None):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.lock = threading.Lock()
+        self.file = open(jsonl_path, 'a', encoding='utf-8') if jsonl_path != None else None
+        self.outcomes:Dict[tuple,int] = {}
+        self.stage_sec:Dict[tuple,float] = {}
+        self.status_sec:Dict[tuple,float] = {}
+        self.audio_sec:Dict[str,float] = {}
+        self.rtfs:Dict[str,List[float]] = {}
+        self.run_started = time.monotonic()
+
+    def write(self, record:dict):
+        backend = record.get("backend", "")
+        with self.lock:
+            if self.file != None:
+                self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self.file.flush()
+            key = (backend, record["outcome"])
+            self.outcomes[key] = self.outcomes.get(key, 0) + 1
+            if record["outcome"] != "completed":
+                return
+            self.audio_sec[backend] = self.audio_sec.get(backend, 0.0) + record["audio_sec"]
+            for stage, sec in record["stages"].items():
+                self.stage_sec[(backend, stage)] = self.stage_sec.get((backend, stage), 0.0) + sec
+            for status, sec in record["statuses"].items():
+                self.status_sec[(backend, status)] = self.status_sec.get((backend, status), 0.0) + sec
+            if record["rtf"] != None:
+                self.rtfs.setdefault(backend, []).append(record["rtf"])
+
+    def prometheus_text(self) -> str:
+        lines = []
+        def metric(name:str, help_text:str, samples:List[tuple]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in samples:
+                lines.append(f"{name}{prometheus_labels(labels)} {format_value(value)}")
+        metric("liepa_ausys_files", "Files handled in the last run by outcome",
+               [({"backend": b, "outcome": o}, n) for (b, o), n in sorted(self.outcomes.items())])
+        metric("liepa_ausys_audio_seconds", "Audio transcribed in the last run",
+               [({"backend": b}, sec) for b, sec in sorted(self.audio_sec.items())])
+        metric("liepa_ausys_stage_seconds", "Client time per stage summed over files of the last run",
+               [({"backend": b, "stage": s}, sec) for (b, s), sec in sorted(self.stage_sec.items())])
+        metric("liepa_ausys_status_seconds", "Time in each server status summed over files of the last run",
+               [({"backend": b, "status": s}, sec) for (b, s), sec in sorted(self.status_sec.items())])
+        metric("liepa_ausys_rtf_mean", "Mean real-time factor (processing seconds per audio second) of the last run",
+               [({"backend": b}, sum(v) / len(v)) for b, v in sorted(self.rtfs.items()) if v])
+        metric("liepa_ausys_rtf_max", "Largest real-time factor of the last run",
+               [({"backend": b}, max(v)) for b, v in sorted(self.rtfs.items()) if v])
+        metric("liepa_ausys_run_seconds", "Wall time of the last run", [({}, time.monotonic() - self.run_started)])
+        metric("liepa_ausys_last_run_timestamp_seconds", "End of the last run", [({}, time.time())])
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        with self.lock:
+            if self.file != None:
+                self.file.close()
+                self.file = None
+            if self.prometheus_path != None:
+                tmp_path = f"{self.prometheus_path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(self.prometheus_text())
+                os.replace(tmp_path, self.prometheus_path)
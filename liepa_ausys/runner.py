@@ -0,0 +1,660 @@
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .atomic_file import write_text_atomic
+from .backends import BACKENDS, Backend
+from .file_scanner import ScannedFile, outputs_are_fresh, scan_audio_files, split_pattern
+from .job_manifest import JobManifest, ManifestEntry
+from .lattice import save_latb_sidecar
+from .result_store import ResultStore, safe_name
+from .run_metrics import FileMetrics, MetricsWriter
+from .wav_chunker import WavChunk, can_split, split_wav, stitch_lattices
+from .wav_probe import get_audio_duration
+from .wav_resample import TARGET_SAMPLE_RATE, needs_transcoding, np, transcode_wav
+from .work_claims import ClaimTable, default_worker_id
+
+
+def parse_env_file(file_path:str):
+    env_dict = {}
+    with open(file_path, 'r') as file:
+        for line in file:
+            line = line.strip()
+            if line and '=' in line:
+                key, value = line.split('=', 1)
+                env_dict[key.strip()] = value.strip()
+    return env_dict
+
+
+@dataclass
+class ProcessingCtx():
+    directory: str = ""
+    wav_pattern:str = "*.wav"
+    backends:List[str] = field(default_factory=lambda: ["liepa"])
+    ext_eaf:Optional[bool] = None
+    jobs:int = 1
+    connections:int = 16
+    manifest_path:Optional[str] = None
+    chunk_sec:float = 0
+    force:bool = False
+    metrics_path:Optional[str] = None
+    prometheus_path:Optional[str] = None
+    resample:bool = False
+    resample_workers:int = 0
+    result_store:Optional[str] = None
+    result_store_max_bytes:int = 0
+    distributed:bool = False
+    claims_dir:Optional[str] = None
+    worker_id:str = ""
+    lease_sec:float = 300.0
+
+
+JobKey = Tuple[str,str]
+
+
+class JobProgress():
+    """Aggregated progress of all in-flight jobs, rendered as a single status line"""
+
+    def __init__(self, total:int):
+        self.total = total
+        self.completed = 0
+        self.failed = 0
+        self.statuses:Dict[JobKey,str] = {}
+
+    def set_status(self, key:JobKey, status:str):
+        self.statuses[key] = status
+        self.render()
+
+    def finish(self, key:JobKey, ok:bool):
+        self.statuses.pop(key, None)
+        if ok:
+            self.completed += 1
+        else:
+            self.failed += 1
+        self.render()
+
+    def render(self):
+        per_status:Dict[str,int] = {}
+        for status in self.statuses.values():
+            per_status[status] = per_status.get(status, 0) + 1
+        breakdown = " ".join(f"{status}:{count}" for status, count in sorted(per_status.items()))
+        print(f" done: {self.completed}/{self.total} failed: {self.failed} in-flight: {len(self.statuses)} {breakdown}" + 10*" ", end='\r')
+
+
+def result_path(wav_path:str, result_ext:str) -> str:
+    return re.sub('wav$', result_ext, wav_path)
+
+
+def write_transription_result(wav_path:str, result_ext:str, transcription_text:str) -> str:
+    output_file_path = result_path(wav_path, result_ext)
+    logging.info(f"Wring result to {output_file_path}")
+    write_text_atomic(output_file_path, transcription_text)
+    if result_ext.endswith('lat'):
+        save_latb_sidecar(output_file_path)
+    return output_file_path
+
+
+def backend_manifest_path(manifest_path:str, backend_name:str) -> str:
+    """ Liepa keeps the manifest name of earlier runs, other backends get `<name>.<backend>.sqlite` """
+    if backend_name == "liepa":
+        return manifest_path
+    root, ext = os.path.splitext(manifest_path)
+    return f"{root}.{backend_name}{ext}"
+
+
+class TranscriptionRunner():
+    """
+    Transcribes scanned files on one or more backends from one event loop. Each backend
+    keeps up to `ctx.jobs` files in flight and has its own manifest. With several backends
+    results are written as `<name>.<backend>.lat`, so the engines can be compared side by side.
+    """
+
+    def __init__(self, ctx:ProcessingCtx, backends:Sequence[Backend]):
+        self.ctx = ctx
+        self.backends = list(backends)
+        self.progress = JobProgress(0)
+        self.worker_id = ctx.worker_id or default_worker_id()
+        self.claims = None
+        if ctx.distributed:
+            self.claims = ClaimTable(ctx.claims_dir or os.path.join(ctx.directory, ".liepa_ausys_claims"), self.worker_id, ctx.lease_sec)
+        # files claimed and transcribed by this node at once
+        self.claim_slots = asyncio.Semaphore(ctx.jobs)
+        self.started = time.time()
+        manifest_path = ctx.manifest_path or self.node_path(".liepa_ausys_manifest.sqlite")
+        self.manifests = {backend.name: JobManifest(backend_manifest_path(manifest_path, backend.name)) for backend in self.backends}
+        self.in_flight = {backend.name: asyncio.Semaphore(ctx.jobs) for backend in self.backends}
+        # server jobs of chunks, a long recording must not flood the server with hundreds of them
+        self.chunk_slots = {backend.name: asyncio.Semaphore(ctx.jobs) for backend in self.backends}
+        self.metrics_writer:Optional[MetricsWriter] = None
+        self.failures:List[Tuple[str,str,str]] = []
+        self.transcode_pool:Optional[ProcessPoolExecutor] = None
+        self.transcode_dir:Optional[tempfile.TemporaryDirectory] = None
+        self.resample_workers = ctx.resample_workers or os.cpu_count() or 1
+        # transcoded files waiting for upload or in flight on some backend
+        self.prepared = asyncio.Semaphore(ctx.jobs * len(self.backends) + self.resample_workers)
+        self.transcoded_bytes = [0, 0]
+        self.store = ResultStore(ctx.result_store, ctx.result_store_max_bytes) if ctx.result_store else None
+        # (content hash, backend) being transcribed -> set when its results are stored
+        self.store_leaders:Dict[Tuple[str,str],asyncio.Event] = {}
+        self.store_leases:Dict[JobKey,Tuple[str,str]] = {}
+
+    def node_path(self, file_name:str) -> str:
+        """ Path of a runner file in the directory; with `--distributed` each node gets its own, SQLite and appends are unsafe on NFS """
+        if self.claims != None:
+            root, ext = os.path.splitext(file_name)
+            file_name = f"{root}.{safe_name(self.worker_id)}{ext}"
+        return os.path.join(self.ctx.directory, file_name)
+
+    def outputs_done(self, audio_file:ScannedFile, output_exts:List[str]) -> bool:
+        """ Results written meanwhile by another node or, with several backends, by an earlier run """
+        if self.claims != None:
+            # with --force only results of this batch count
+            since = max(audio_file.mtime, self.started) if self.ctx.force else audio_file.mtime
+            return outputs_are_fresh(audio_file.path, since, output_exts)
+        # the scan only skips files which are up to date on every backend
+        return not self.ctx.force and len(self.backends) > 1 and outputs_are_fresh(audio_file.path, audio_file.mtime, output_exts)
+
+    def output_ext(self, backend:Backend, result_ext:str) -> str:
+        return f"{backend.name}.{result_ext}" if len(self.backends) > 1 else result_ext
+
+    def result_exts(self, backend:Backend, chunked:bool=False) -> List[str]:
+        result_exts = ['lat', 'eaf'] if self.ctx.ext_eaf == True and not chunked else ['lat']
+        return [result_ext for result_ext in result_exts if result_ext in backend.artifacts]
+
+    def output_exts(self) -> List[str]:
+        """ Result extensions of all backends, a file is skipped by the scan only if all are up to date """
+        return [self.output_ext(backend, result_ext) for backend in self.backends for result_ext in self.result_exts(backend)]
+
+    async def transcribe_chunks(self, wav_path:str, backend:Backend, key:JobKey) -> str:
+        """Split a long recording near silences, transcribe up to `ctx.jobs` chunks concurrently and stitch their lattices"""
+        with tempfile.TemporaryDirectory(prefix="liepa_ausys_") as chunk_dir:
+            chunks = await asyncio.to_thread(split_wav, wav_path, chunk_dir, self.ctx.chunk_sec)
+            if not chunks:
+                raise Exception(f"Error: {wav_path} could not be split into chunks")
+            logging.info(f"Split {wav_path} into {len(chunks)} chunks")
+            self.progress.set_status(key, f"Uploading {len(chunks)} chunks")
+
+            async def transcribe_chunk(chunk:WavChunk) -> str:
+                async with self.chunk_slots[backend.name]:
+                    try:
+                        job_id = await backend.submit(chunk.path)
+                        show_status = lambda status: self.progress.set_status(key, status)
+                        await backend.wait(job_id, chunk.duration_sec, show_status, on_progress=show_status)
+                        return await backend.fetch(job_id, 'lat')
+                    except Exception:
+                        # before the slot goes to a chunk of this file which would be uploaded in vain
+                        for task in tasks:
+                            if task is not asyncio.current_task():
+                                task.cancel()
+                        raise
+
+            tasks = [asyncio.create_task(transcribe_chunk(chunk)) for chunk in chunks]
+            try:
+                lat_texts = await asyncio.gather(*tasks)
+            except BaseException:
+                # the chunk files are removed with the directory, the other chunks must not outlive a failed one
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+        return stitch_lattices([(lat_text, chunk.offset_sec) for lat_text, chunk in zip(lat_texts, chunks)])
+
+    async def restore_from_store(self, key:JobKey, entry:ManifestEntry, backend:Backend, result_exts:List[str],
+                                 metrics:FileMetrics) -> bool:
+        """
+        Write the outputs of a recording whose content was already transcribed by the same model,
+        possibly under another name or on another machine. A duplicate of a file being
+        transcribed in this run waits for its results instead of being uploaded again.
+        """
+        store_key = (entry.sha256, backend.name)
+        outputs = [result_path(entry.path, self.output_ext(backend, result_ext)) for result_ext in result_exts]
+        while True:
+            while store_key in self.store_leaders:
+                self.progress.set_status(key, "Waiting for duplicate")
+                await self.store_leaders[store_key].wait()
+            # the store may be on a network disk, its reads must not stall the polls of other jobs
+            with metrics.stage("store"):
+                restored = await asyncio.to_thread(self.copy_from_store, entry, backend, result_exts, outputs)
+            if restored:
+                break
+            # another duplicate missed the store at the same time and is transcribing it already
+            if store_key not in self.store_leaders:
+                self.store_leaders[store_key] = asyncio.Event()
+                self.store_leases[key] = store_key
+                return False
+        with metrics.stage("store"):
+            for output_path in outputs:
+                if output_path.endswith('lat'):
+                    await asyncio.to_thread(save_latb_sidecar, output_path)
+        logging.info(f"Results of {entry.path} on {backend.name} restored from the result store")
+        self.store.hits += 1
+        entry.recognizer = backend.model
+        entry.upload_id = None
+        self.manifests[backend.name].record_status(entry, "COMPLETED")
+        self.manifests[backend.name].record_outputs(entry, outputs)
+        metrics.outcome = "cached"
+        return True
+
+    def copy_from_store(self, entry:ManifestEntry, backend:Backend, result_exts:List[str], outputs:List[str]) -> bool:
+        """ Copy all results of the recording from the store to `outputs`, False if any of them is missing """
+        # a result evicted by another runner between the check and the copy counts as a miss
+        return (all(self.store.contains(entry.sha256, backend.name, backend.model, result_ext) for result_ext in result_exts)
+                and all(self.store.copy_to(entry.sha256, backend.name, backend.model, result_ext, output_path)
+                        for result_ext, output_path in zip(result_exts, outputs)))
+
+    def release_store_lease(self, key:JobKey):
+        store_key = self.store_leases.pop(key, None)
+        if store_key != None:
+            self.store_leaders.pop(store_key).set()
+
+    async def store_result(self, entry:ManifestEntry, backend:Backend, result_ext:str, output_path:str):
+        if self.store == None:
+            return
+        try:
+            # a put over the size limit also evicts, walking the whole store
+            await asyncio.to_thread(self.store.put_file, entry.sha256, backend.name, backend.model, result_ext, output_path)
+        except OSError as e:
+            # the outputs are written, a failing store only costs a later duplicate
+            logging.warning(f"Result of {entry.path} is not stored in {self.store.root}: {e}")
+
+    def is_transcribed(self, audio_file:ScannedFile, backend:Backend) -> bool:
+        """ Cheap check without hashing: the manifest has completed outputs of the file as it is on disk now """
+        entry = self.manifests[backend.name].get(audio_file.path)
+        return (entry != None and entry.size == audio_file.size and entry.mtime == audio_file.mtime and entry.recognizer == backend.model
+                and entry.status == "COMPLETED" and entry.outputs != [] and all(os.path.exists(p) for p in entry.outputs))
+
+    def should_transcode(self, audio_file:ScannedFile) -> bool:
+        return (self.ctx.resample and audio_file.info != None and needs_transcoding(audio_file.info)
+                and not all(self.is_transcribed(audio_file, backend) for backend in self.backends))
+
+    async def transcode(self, audio_file:ScannedFile, index:int) -> str:
+        """ 16 kHz mono copy of the recording made in the worker pool, uploaded instead of the original """
+        out_dir = os.path.join(self.transcode_dir.name, str(index))
+        os.mkdir(out_dir)
+        out_path = os.path.join(out_dir, os.path.basename(audio_file.path))
+        started = time.monotonic()
+        size = await asyncio.get_running_loop().run_in_executor(self.transcode_pool, transcode_wav, audio_file.path, out_path,
+                                                                TARGET_SAMPLE_RATE, 10.0, audio_file.info)
+        self.transcoded_bytes[0] += audio_file.size
+        self.transcoded_bytes[1] += size
+        logging.info(f"Transcoded {audio_file.path}: {audio_file.size/1024/1024:.1f} MB -> {size/1024/1024:.1f} MB "
+                     f"in {time.monotonic() - started:.2f} s")
+        return out_path
+
+    async def transcription(self, audio_file:ScannedFile, backend:Backend, metrics:FileMetrics, upload_path:Optional[str]=None) -> bool:
+        """
+        Orchestration procedure to send file to server, wait for the job and save its results.
+        `upload_path` is a transcoded copy sent instead of the original recording.
+        """
+        wav_path = audio_file.path
+        upload_path = upload_path or wav_path
+        key = (backend.name, wav_path)
+        wav_length_in_sec = audio_file.duration
+        if wav_length_in_sec == 0:
+            with metrics.stage("probe"):
+                wav_length_in_sec = get_audio_duration(wav_path)
+            metrics.audio_sec = wav_length_in_sec
+        logging.info(f"Sound files: {wav_path}. Length: {wav_length_in_sec:.2f} s. Backend: {backend.name}")
+        if(wav_length_in_sec == 0):
+            logging.error("Error. File length is 0")
+            return False
+        chunked = self.ctx.chunk_sec > 0 and wav_length_in_sec >= self.ctx.chunk_sec * 1.5
+        if chunked and not await asyncio.to_thread(can_split, upload_path):
+            logging.warning(f"{wav_path} is not 16-bit PCM, it is uploaded whole instead of in chunks")
+            chunked = False
+        result_exts = self.result_exts(backend, chunked)
+        output_exts = [self.output_ext(backend, result_ext) for result_ext in result_exts]
+        output_paths = [result_path(wav_path, output_ext) for output_ext in output_exts]
+        manifest = self.manifests[backend.name]
+        # hashing a long recording must not stall status polls, event streams and lease heartbeats
+        entry = await asyncio.to_thread(manifest.current_entry, wav_path)
+        if entry.recognizer == backend.model and entry.status == "COMPLETED" and all(p in entry.outputs and os.path.exists(p) for p in output_paths):
+            logging.info(f"Skipping {wav_path}: already transcribed by {backend.name}")
+            metrics.outcome = "skipped"
+            return True
+        if self.outputs_done(audio_file, output_exts):
+            logging.info(f"Skipping {wav_path}: {backend.name} results are up to date")
+            metrics.outcome = "skipped"
+            return True
+        if self.store != None and await self.restore_from_store(key, entry, backend, result_exts, metrics):
+            return True
+
+        if chunked:
+            if self.ctx.ext_eaf == True:
+                logging.warning(f"EAF is not extracted for {wav_path}: results of chunks are stitched only into a lattice")
+            with metrics.stage("processing"):
+                lat_text = await self.transcribe_chunks(upload_path, backend, key)
+            with metrics.stage("write"):
+                output_file_path = await asyncio.to_thread(write_transription_result, wav_path, self.output_ext(backend, 'lat'), lat_text)
+            await self.store_result(entry, backend, 'lat', output_file_path)
+            entry.recognizer = backend.model
+            entry.upload_id = None
+            manifest.record_status(entry, "COMPLETED")
+            manifest.record_outputs(entry, [output_file_path])
+            return True
+
+        transcription_status = ""
+        transcription_id = ""
+        if entry.upload_id != None and entry.recognizer == backend.model:
+            transcription_status = await backend.reattach(entry.upload_id) or ""
+            if transcription_status != "":
+                transcription_id = entry.upload_id
+                logging.info(f"Re-attached to transcription id:{transcription_id} ({transcription_status})")
+        if transcription_id == "":
+            self.progress.set_status(key, "Uploading")
+            transcription_id = await backend.submit(upload_path, metrics)
+            if not transcription_id:
+                logging.error("Error. Transcription ID not found")
+                return False
+            manifest.record_upload(entry, transcription_id, backend.model)
+        # time in a status is measured between the polls (or events) which saw it change
+        metrics.reattached = transcription_status != ""
+        if transcription_status != "":
+            metrics.status(transcription_status, poll=False)
+        self.progress.set_status(key, transcription_status or "Submitted")
+
+        def on_status(status:str):
+            manifest.record_status(entry, status)
+            metrics.status(status)
+            self.progress.set_status(key, status)
+
+        with metrics.stage("processing"):
+            metrics.server_stages = await backend.wait(transcription_id, wav_length_in_sec, on_status, transcription_status,
+                                                       lambda status: self.progress.set_status(key, status))
+        metrics.end_status()
+        manifest.record_status(entry, "COMPLETED")
+
+        # all formats are downloaded at once, each streamed to its output file
+        with metrics.stage("download"):
+            output_paths = await asyncio.gather(*(self.save_transription_result(entry, backend, transcription_id, result_ext)
+                                                  for result_ext in result_exts))
+        manifest.record_outputs(entry, [output_path for output_path in output_paths if output_path != ""])
+        return True
+
+    async def save_transription_result(self, entry:ManifestEntry, backend:Backend, transcription_id:str, result_ext:str) -> str:
+        """save requested transcription format"""
+        output_file_path = result_path(entry.path, self.output_ext(backend, result_ext))
+        if await backend.download(transcription_id, result_ext, output_file_path) == 0:
+            logging.error(f"Error. Transcription '{backend.artifacts[result_ext]}' not found")
+            return ""
+        logging.info(f"Wrote result to {output_file_path}")
+        if result_ext == 'lat':
+            await asyncio.to_thread(save_latb_sidecar, output_file_path)
+        await self.store_result(entry, backend, result_ext, output_file_path)
+        return output_file_path
+
+    async def run_job(self, audio_file:ScannedFile, backend:Backend, upload_path:Optional[str]=None, transcode_sec:float=0.0):
+        wav_path = audio_file.path
+        metrics = FileMetrics(wav_path, audio_file.duration, backend.name, backend.model)
+        # headers are read by the pre-flight scan, a header found in its index costs nothing
+        metrics.add("probe", audio_file.probe_sec)
+        if upload_path != None:
+            metrics.add("transcode", transcode_sec)
+        queued_at = time.monotonic()
+        async with self.in_flight[backend.name]:
+            metrics.add("queue", time.monotonic() - queued_at)
+            error = None
+            try:
+                ok = await self.transcription(audio_file, backend, metrics, upload_path)
+            except Exception as e:
+                # errors left after the retries only skip this file, the batch goes on
+                logging.error(f"Error. Transcription of {wav_path} on {backend.name} failed: {e}")
+                ok = False
+                error = str(e) or type(e).__name__
+            # duplicates waiting for this file look into the store again, after a failure one of them uploads
+            self.release_store_lease((backend.name, wav_path))
+            if not ok:
+                self.failures.append((backend.name, wav_path, error or ""))
+            self.progress.finish((backend.name, wav_path), ok)
+            self.metrics_writer.write(metrics.record(None if ok else "failed", error))
+
+    async def run_file(self, audio_file:ScannedFile, index:int):
+        """ With `--distributed` the file is only transcribed if this node claims it, its lease is renewed by `heartbeat` """
+        if self.claims == None:
+            return await self.transcribe_file(audio_file, index)
+        async with self.claim_slots:
+            rel_path = os.path.relpath(audio_file.path, self.ctx.directory)
+            if not await asyncio.to_thread(self.claims.try_claim, rel_path):
+                logging.info(f"Skipping {audio_file.path}: claimed by another node")
+                self.progress.total -= len(self.backends)
+                return
+            try:
+                if self.outputs_done(audio_file, self.output_exts()):
+                    logging.info(f"Skipping {audio_file.path}: transcribed by another node")
+                    self.progress.total -= len(self.backends)
+                    return
+                await self.transcribe_file(audio_file, index)
+            finally:
+                await asyncio.to_thread(self.claims.release, rel_path)
+
+    async def heartbeat(self):
+        while True:
+            await asyncio.sleep(self.claims.lease_sec / 3)
+            try:
+                await asyncio.to_thread(self.claims.heartbeat)
+            except OSError as e:
+                # e.g. the file server is not reachable for a moment, the lease lasts two more heartbeats
+                logging.warning(f"Lease heartbeat failed: {e}")
+
+    async def transcribe_file(self, audio_file:ScannedFile, index:int):
+        """ Queue the file on every backend, transcoded once first if `--resample` makes the upload smaller """
+        if not self.should_transcode(audio_file):
+            await asyncio.gather(*(self.run_job(audio_file, backend) for backend in self.backends))
+            return
+        async with self.prepared:
+            started = time.monotonic()
+            try:
+                upload_path = await self.transcode(audio_file, index)
+            except Exception as e:
+                logging.warning(f"Transcoding of {audio_file.path} failed, uploading the original: {e}")
+                await asyncio.gather(*(self.run_job(audio_file, backend) for backend in self.backends))
+                return
+            transcode_sec = time.monotonic() - started
+            try:
+                await asyncio.gather(*(self.run_job(audio_file, backend, upload_path, transcode_sec) for backend in self.backends))
+            finally:
+                os.remove(upload_path)
+
+    async def run(self, audio_files:List[ScannedFile]):
+        """ Every file is queued on every backend, the engines work through the corpus at the same time """
+        logging.debug("------------------- transcribe_wav_files -------------------")
+        self.progress.total = len(audio_files) * len(self.backends)
+        self.metrics_writer = MetricsWriter(self.ctx.metrics_path or self.node_path("liepa_ausys_metrics.jsonl"),
+                                            self.ctx.prometheus_path)
+        if self.ctx.resample:
+            if np == None:
+                logging.warning("numpy is not installed, files are uploaded without resampling")
+            else:
+                self.transcode_pool = ProcessPoolExecutor(max_workers=self.resample_workers)
+                self.transcode_dir = tempfile.TemporaryDirectory(prefix="liepa_ausys_")
+        if self.store != None:
+            # the size is known before the first result is added
+            await asyncio.to_thread(self.store.evict)
+        heartbeat = None
+        if self.claims != None:
+            logging.info(f"Distributed mode: worker {self.worker_id}, claims in {self.claims.claims_dir}")
+            heartbeat = asyncio.create_task(self.heartbeat())
+            # nodes start at different files of the list to meet fewer claims taken by others
+            start = int(hashlib.sha1(self.worker_id.encode('utf-8')).hexdigest(), 16) % max(1, len(audio_files))
+            audio_files = audio_files[start:] + audio_files[:start]
+        try:
+            for backend in self.backends:
+                await backend.open()
+            await self.run_files(audio_files)
+        finally:
+            if heartbeat != None:
+                heartbeat.cancel()
+                await asyncio.to_thread(self.claims.release_all)
+                if self.claims.reclaimed > 0:
+                    logging.info(f"{self.claims.reclaimed} expired leases of other nodes reclaimed")
+            if self.transcode_pool != None:
+                self.transcode_pool.shutdown()
+                self.transcode_dir.cleanup()
+            for backend in self.backends:
+                await backend.close()
+                backend.save_history()
+            for manifest in self.manifests.values():
+                manifest.close()
+            self.metrics_writer.close()
+        print()
+        if self.store != None:
+            logging.info(f"Result store: {self.store.hits} results restored, {self.store.stored} stored")
+        if self.transcoded_bytes[0] > 0:
+            logging.info(f"Transcoded uploads: {self.transcoded_bytes[0]/1024/1024:.1f} MB -> {self.transcoded_bytes[1]/1024/1024:.1f} MB")
+        for backend in self.backends:
+            if backend.retrier.retries:
+                logging.info(f"{backend.name} retries: {backend.retrier.retries}")
+        logging.info(f"Transcribed {self.progress.completed} of {self.progress.total} files. Failed: {self.progress.failed}")
+        self.report_failures()
+
+    async def run_files(self, audio_files:List[ScannedFile]):
+        """
+        A fixed pool of workers takes the files from a queue: enough to keep every backend's
+        `ctx.jobs` slots and the transcoding look-ahead busy, so tasks and metrics don't grow with
+        the size of the corpus.
+        """
+        queue:asyncio.Queue = asyncio.Queue()
+        for index, audio_file in enumerate(audio_files):
+            queue.put_nowait((index, audio_file))
+
+        async def worker():
+            while not queue.empty():
+                index, audio_file = queue.get_nowait()
+                await self.run_file(audio_file, index)
+
+        workers = self.ctx.jobs * len(self.backends) + (self.resample_workers if self.transcode_pool != None else 0)
+        await asyncio.gather(*(worker() for _ in range(min(workers, len(audio_files)))))
+
+    def report_failures(self):
+        """ Failed files of the last run, one `backend<TAB>path<TAB>error` line each; a rerun picks them up again """
+        failed_path = self.node_path("liepa_ausys_failed.tsv")
+        if not self.failures:
+            if os.path.exists(failed_path):
+                os.remove(failed_path)
+            return
+        with open(failed_path, 'w', encoding='utf-8') as f:
+            for backend_name, wav_path, error in sorted(self.failures):
+                f.write(f"{backend_name}\t{wav_path}\t{error}\n")
+        logging.warning(f"{len(self.failures)} files failed, listed in {failed_path}:")
+        for backend_name, wav_path, error in sorted(self.failures):
+            logging.warning(f"\t{backend_name}: {wav_path}: {error}")
+
+
+def transcribe_wav_files_in_directory(ctx:ProcessingCtx, backends:Sequence[Backend]):
+    """ Scan `liepa_ausys_wav_path` and transcribe audio files which have no up to date results """
+    logging.debug("------------------- transcribe_wav_files_in_directory -------------------")
+    if not os.path.isdir(ctx.directory):
+        logging.error(f"Error: Directory '{ctx.directory}' not found.")
+        return
+    try:
+        runner = TranscriptionRunner(ctx, backends)
+        audio_files = scan_audio_files(ctx.wav_pattern, runner.output_exts(), index_path=os.path.join(ctx.directory, ".liepa_ausys_index.json"),
+                                       skip_fresh=not ctx.force)
+        asyncio.run(runner.run(audio_files))
+    except PermissionError:
+        logging.error(f"Error: Permission denied for accessing '{ctx.directory}'.")
+
+
+def build_argparser(description:str, default_backend:str) -> argparse.ArgumentParser:
+    argparser = argparse.ArgumentParser(description=description)
+    # Optional positional argument
+    argparser.add_argument('-u', '--url', type=str, nargs='?',
+                        help='An optional url where server is (only with a single backend)')
+    argparser.add_argument('-e', '--env', type=str, nargs='?', default="liepa_ausys.env",
+                        help='An optional file path of env variables')
+    argparser.add_argument('-b', '--backend', type=str, default=default_backend,
+                        help=f'Comma separated backends ({",".join(BACKENDS)}), each file is transcribed on all of them')
+    argparser.add_argument('--ext_eaf', action=argparse.BooleanOptionalAction, help='An optional param if EAF format should be extracted')
+    argparser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='How many files are uploaded and tracked on each backend at the same time')
+    argparser.add_argument('--manifest', type=str,
+                        help='Job manifest file used to resume interrupted runs (default: .liepa_ausys_manifest.sqlite in the wav directory)')
+    argparser.add_argument('--chunk_sec', type=float, default=0,
+                        help='Split recordings longer than 1.5x this many seconds near silences and transcribe the chunks in parallel')
+    argparser.add_argument('--force', action='store_true',
+                        help='Transcribe files even if their results are newer than the audio')
+    argparser.add_argument('--connections', type=int, default=16,
+                        help='Size of the keep-alive HTTP connection pool of each backend')
+    argparser.add_argument('--resample', action='store_true',
+                        help='Upload a 16 kHz mono 16-bit copy of recordings with a higher rate, more channels or wider samples (needs numpy)')
+    argparser.add_argument('--resample_workers', type=int, default=0,
+                        help='Processes transcoding recordings ahead of the uploads (default: number of CPUs)')
+    argparser.add_argument('--result_store', type=str,
+                        help='Directory of results shared between runs, directories and machines, keyed by audio content '
+                             '(default: liepa_ausys_result_store of the env file)')
+    argparser.add_argument('--result_store_max_gb', type=float, default=10.0,
+                        help='Size of the result store, least recently used results are removed over it (0 = unbounded)')
+    argparser.add_argument('--distributed', action='store_true',
+                        help='Share the directory with clients on other nodes: each file is claimed by one of them')
+    argparser.add_argument('--claims_dir', type=str,
+                        help='Shared directory of the claims (default: .liepa_ausys_claims in the audio directory)')
+    argparser.add_argument('--worker_id', type=str, default="",
+                        help='Name of this node in the claims and in its own manifest, metrics and report files (default: host name)')
+    argparser.add_argument('--lease_sec', type=float, default=300.0,
+                        help='A claim not renewed for this long belongs to a dead node and is taken over')
+    argparser.add_argument('--metrics', type=str,
+                        help='JSON lines file with stage timings of every file (default: liepa_ausys_metrics.jsonl in the wav directory)')
+    argparser.add_argument('--prometheus', type=str,
+                        help='Write run totals to this Prometheus textfile (node_exporter textfile collector)')
+    return argparser
+
+
+def main(description:str, default_backend:str):
+    args = build_argparser(description, default_backend).parse_args()
+    env_dict = parse_env_file(args.env)
+    backend_names = [name.strip() for name in args.backend.split(",") if name.strip()]
+    param_error = False
+    if env_dict.get("liepa_ausys_wav_path", "") == "":
+        logging.info("liepa_ausys_wav_path is not set in liepa_ausys.env")
+        param_error = True
+    for name in backend_names:
+        if name not in BACKENDS:
+            logging.info(f"Unknown backend {name}, use one of: {', '.join(BACKENDS)}")
+            param_error = True
+            continue
+        if args.url != None and len(backend_names) == 1:
+            continue
+        for key in BACKENDS[name].required_env:
+            if env_dict.get(key, "") == "":
+                logging.info(f"{key} is not set in liepa_ausys.env")
+                param_error = True
+    if args.url != None and len(backend_names) > 1:
+        logging.info("--url can be used only with a single backend")
+        param_error = True
+    if param_error:
+        logging.error("Error occured. Exiting...")
+        return
+
+    ctx = ProcessingCtx()
+    ctx.wav_pattern = env_dict["liepa_ausys_wav_path"]
+    ctx.directory = split_pattern(ctx.wav_pattern)[0]
+    ctx.backends = backend_names
+    ctx.ext_eaf = args.ext_eaf
+    ctx.jobs = max(1, args.jobs)
+    ctx.connections = max(1, args.connections)
+    ctx.manifest_path = args.manifest
+    ctx.chunk_sec = args.chunk_sec
+    ctx.force = args.force
+    ctx.metrics_path = args.metrics
+    ctx.prometheus_path = args.prometheus
+    ctx.resample = args.resample
+    ctx.resample_workers = max(0, args.resample_workers)
+    ctx.result_store = args.result_store or env_dict.get("liepa_ausys_result_store") or None
+    ctx.result_store_max_bytes = int(max(0.0, args.result_store_max_gb) * 1024 ** 3)
+    ctx.distributed = args.distributed
+    ctx.claims_dir = args.claims_dir
+    ctx.worker_id = args.worker_id
+    ctx.lease_sec = max(1.0, args.lease_sec)
+    backends = [BACKENDS[name].from_env(env_dict, ctx.directory, ctx.connections, ctx.jobs, args.url) for name in backend_names]
+    for backend in backends:
+        logging.info(f"{backend.name}: {backend.url} model: {backend.model}")
+    logging.info(f"Directory: {ctx.directory}")
+    transcribe_wav_files_in_directory(ctx, backends)
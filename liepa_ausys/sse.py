@@ -0,0 +1,64 @@
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional, Union
+
+
+@dataclass
+class SseEvent:
+    """One server-sent event of a text/event-stream response"""
+    event: str = "message"
+    data: str = ""
+    id: Optional[str] = None
+
+
+class SseParser():
+    """
+    Incremental text/event-stream parser: lines are fed as they arrive from the socket
+    and an event is returned as soon as the blank line closing it is seen.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.event = ""
+        self.data_lines = []
+        self.id = None
+
+    def feed_line(self, line:Union[str,bytes]) -> Optional[SseEvent]:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.rstrip('\r\n')
+        if line == "":
+            if not self.data_lines and self.event == "":
+                return None
+            sse_event = SseEvent(event=self.event or "message", data="\n".join(self.data_lines), id=self.id)
+            self.reset()
+            return sse_event
+        if line.startswith(':'):
+            return None
+        name, _, value = line.partition(':')
+        if value.startswith(' '):
+            value = value[1:]
+        if name == "event":
+            self.event = value
+        elif name == "data":
+            self.data_lines.append(value)
+        elif name == "id":
+            self.id = value
+        return None
+
+    def close(self) -> Optional[SseEvent]:
+        """ Event left unterminated when the stream closed """
+        return self.feed_line("")
+
+
+def iter_sse_events(lines:Iterable[Union[str,bytes]]) -> Iterator[SseEvent]:
+    """ Yield events while iterating over lines of an event stream (e.g. an HTTP response) """
+    parser = SseParser()
+    for line in lines:
+        sse_event = parser.feed_line(line)
+        if sse_event != None:
+            yield sse_event
+    sse_event = parser.close()
+    if sse_event != None:
+        yield sse_event
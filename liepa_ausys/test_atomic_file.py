@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+
+from liepa_ausys.atomic_file import atomic_open, write_text_atomic
+
+
+class TestAtomicFile(unittest.TestCase):
+    def test_replaced_when_complete(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "a.lat")
+            self.assertEqual(len("# 1 S0000\nžodis\n".encode("utf-8")), write_text_atomic(path, "# 1 S0000\nžodis\n"))
+
+            with atomic_open(path, 'wb') as f:
+                f.write(b"partial")
+                # the previous content stays visible until the block ends
+                with open(path, encoding="utf-8") as reader:
+                    self.assertEqual("# 1 S0000\nžodis\n", reader.read())
+
+            with open(path, 'rb') as reader:
+                self.assertEqual(b"partial", reader.read())
+            self.assertEqual(["a.lat"], os.listdir(tmp_dir))
+
+    def test_error_keeps_previous_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "a.eaf")
+            write_text_atomic(path, "old")
+
+            with self.assertRaises(ConnectionError):
+                with atomic_open(path, 'w') as f:
+                    f.write("new, cut")
+                    raise ConnectionError("download interrupted")
+
+            with open(path) as reader:
+                self.assertEqual("old", reader.read())
+            self.assertEqual(["a.eaf"], os.listdir(tmp_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
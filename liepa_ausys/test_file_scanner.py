@@ -0,0 +1,57 @@
+import os
+import tempfile
+import time
+import unittest
+import wave
+
+from liepa_ausys.file_scanner import FileIndex, scan_audio_files, split_pattern
+
+
+def write_wav(path:str, seconds:int=1):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(8000)
+        w.writeframes(b'\x00\x00' * 8000 * seconds)
+
+
+class TestFileScanner(unittest.TestCase):
+    def test_split_pattern(self):
+        self.assertEqual(("wav", ["*.wav"]), split_pattern("wav/*.wav"))
+        self.assertEqual(("/data/archive", ["**", "*.wav"]), split_pattern("/data/archive/**/*.wav"))
+        self.assertEqual((".", ["*.wav"]), split_pattern("*.wav"))
+        self.assertEqual(("wav", ["*.wav"]), split_pattern("wav/"))
+
+    def test_scan(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            write_wav(os.path.join(tmp_dir, "a.wav"), 2)
+            write_wav(os.path.join(tmp_dir, "done.wav"))
+            write_wav(os.path.join(tmp_dir, "x", "y", "b.wav"))
+            with open(os.path.join(tmp_dir, "notes.txt"), "w") as f:
+                f.write("-")
+            with open(os.path.join(tmp_dir, "broken.wav"), "w") as f:
+                f.write("-")
+            done_lat = os.path.join(tmp_dir, "done.lat")
+            with open(done_lat, "w") as f:
+                f.write("# 1 S0000\n")
+            future = time.time() + 10
+            os.utime(done_lat, (future, future))
+            index_path = os.path.join(tmp_dir, "index.json")
+
+            flat = scan_audio_files(os.path.join(tmp_dir, "*.wav"), index_path=index_path)
+            nested = scan_audio_files(os.path.join(tmp_dir, "**", "*.wav"), index_path=index_path)
+
+            self.assertEqual([os.path.join(tmp_dir, "a.wav")], [f.path for f in flat])
+            self.assertEqual(2.0, flat[0].duration)
+            self.assertEqual(["a.wav", "b.wav"], [os.path.basename(f.path) for f in nested])
+            self.assertGreater(flat[0].probe_sec, 0.0)
+            # a.wav was probed by the first scan, its header comes from the index
+            self.assertEqual(0.0, nested[0].probe_sec)
+            cached, info = FileIndex(index_path).get(flat[0].path, flat[0].size, flat[0].mtime)
+            self.assertTrue(cached)
+            self.assertEqual(flat[0].info, info)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+
+from liepa_ausys.job_manifest import JobManifest, file_sha256
+
+
+class TestJobManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.wav_path = os.path.join(self.tmp_dir.name, "a.wav")
+        self.write_wav(b"RIFF....WAVEdata")
+        self.manifest_path = os.path.join(self.tmp_dir.name, ".m.sqlite")
+
+    def write_wav(self, content:bytes, mtime:float=1000.0):
+        with open(self.wav_path, 'wb') as f:
+            f.write(content)
+        os.utime(self.wav_path, (mtime, mtime))
+
+    def test_resume_after_interrupted_run(self):
+        manifest = JobManifest(self.manifest_path)
+        entry = manifest.current_entry(self.wav_path)
+        self.assertEqual(file_sha256(self.wav_path), entry.sha256)
+        self.assertIsNone(manifest.get(self.wav_path))
+        manifest.record_upload(entry, "job-1", "ben")
+        manifest.record_status(entry, "Diarization")
+        # the run dies here
+        manifest.close()
+
+        manifest = JobManifest(self.manifest_path)
+        entry = manifest.current_entry(self.wav_path)
+        manifest.close()
+
+        self.assertEqual(("job-1", "ben", "Diarization", []), (entry.upload_id, entry.recognizer, entry.status, entry.outputs))
+
+    def test_touched_file_keeps_entry_changed_file_does_not(self):
+        manifest = JobManifest(self.manifest_path)
+        entry = manifest.current_entry(self.wav_path)
+        manifest.record_upload(entry, "job-1", "ben")
+        manifest.record_status(entry, "COMPLETED")
+        manifest.record_outputs(entry, ["a.lat"])
+
+        # same content, e.g. copied back from a backup
+        self.write_wav(b"RIFF....WAVEdata", mtime=2000.0)
+        touched = manifest.current_entry(self.wav_path)
+        self.assertEqual(("COMPLETED", ["a.lat"], 2000.0), (touched.status, touched.outputs, touched.mtime))
+        self.assertEqual(2000.0, manifest.get(self.wav_path).mtime)
+
+        self.write_wav(b"RIFF....WAVEother", mtime=3000.0)
+        changed = manifest.current_entry(self.wav_path)
+        manifest.close()
+        self.assertEqual((None, None, []), (changed.upload_id, changed.status, changed.outputs))
+        self.assertNotEqual(entry.sha256, changed.sha256)
+
+
+if __name__ == '__main__':
+    unittest.main()
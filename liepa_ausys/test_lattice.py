@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+
+from liepa_ausys.lattice import (LatFormatError, LatticeColumns, PartData, WordData, iter_lat_parts, iter_lat_words,
+                                 open_fresh_latb, parse_lat_lines, read_lat_words, write_latb)
+
+LATTICE = """# 1 S0000
+1 0.00 0.50 Labas
+1 0.50 0.90 rytas_visiems .
+2 0.50 0.90 rytą
+
+# 2 S0001
+1 1.20 1.40 <eps>
+1 1.40 2.00 ačiū
+"""
+
+
+class TestLattice(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.lat_path = os.path.join(self.tmp_dir.name, "test.lat")
+        with open(self.lat_path, 'w', encoding='utf-8') as f:
+            f.write(LATTICE)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_parts(self):
+        parts = list(iter_lat_parts(self.lat_path))
+
+        self.assertEqual(["S0000", "S0001"], [p.speaker_id for p in parts])
+        self.assertEqual([1, 2], [p.part_num for p in parts])
+        self.assertEqual(WordData(1, 0.5, 0.9, "rytas_visiems", "."), parts[0].words[1])
+        self.assertEqual(3, len(parts[0].words))
+
+    def test_main_words(self):
+        words = [(part.part_num, word.words) for part, word in iter_lat_words(self.lat_path, main_only=True)]
+
+        self.assertEqual([(1, "Labas"), (1, "rytas_visiems"), (2, "<eps>"), (2, "ačiū")], words)
+        self.assertEqual(["labas", "rytas", "visiems", "ačiū"], read_lat_words(self.lat_path))
+
+    def test_lazy(self):
+        def lines():
+            yield "# 1 S0000\n"
+            yield "1 0.00 0.50 labas\n"
+            raise AssertionError("parser read past the first word")
+
+        items = parse_lat_lines(lines())
+
+        self.assertEqual(PartData("S0000", 1), next(items))
+        self.assertEqual(WordData(1, 0.0, 0.5, "labas"), next(items))
+
+    def test_slots(self):
+        self.assertFalse(hasattr(WordData(1, 0.0, 0.5, "labas"), '__dict__'))
+
+    def test_wrong_line(self):
+        with self.assertRaises(LatFormatError) as e:
+            list(parse_lat_lines(["# 1 S0000\n", "1 0.00 labas\n"], "x.lat"))
+
+        self.assertIn("x.lat:2", str(e.exception))
+
+
+class TestBinaryLattice(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.lat_path = os.path.join(self.tmp_dir.name, "test.lat")
+        with open(self.lat_path, 'w', encoding='utf-8') as f:
+            f.write(LATTICE)
+        self.text_parts = list(iter_lat_parts(self.lat_path))
+        self.text_words = read_lat_words(self.lat_path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_round_trip(self):
+        latb_path = write_latb(self.lat_path)
+
+        self.assertEqual(self.lat_path + "b", latb_path)
+        with LatticeColumns(latb_path) as columns:
+            self.assertEqual([0.0, 0.5, 0.5, 1.2, 1.4], list(columns.word_from))
+            self.assertEqual(self.text_parts, list(columns.iter_parts()))
+            self.assertEqual(self.text_words, columns.main_words())
+
+    def test_fresh_sidecar_is_read(self):
+        write_latb(self.lat_path)
+        with LatticeColumns(self.lat_path + "b") as columns:
+            self.assertIsInstance(columns.word_main, memoryview)
+        with open(self.lat_path, 'w', encoding='utf-8') as f:
+            f.write("garbage\n")
+        os.utime(self.lat_path, ns=(0, 0))
+
+        self.assertEqual(self.text_parts, list(iter_lat_parts(self.lat_path)))
+        self.assertEqual(self.text_words, read_lat_words(self.lat_path))
+
+    def test_stale_sidecar_is_ignored(self):
+        write_latb(self.lat_path)
+        os.utime(self.lat_path + "b", ns=(0, 0))
+
+        self.assertIsNone(open_fresh_latb(self.lat_path))
+
+    def test_corrupt_sidecar_is_ignored(self):
+        with open(self.lat_path + "b", 'wb') as f:
+            f.write(b'LATB\x01\x00')
+
+        with self.assertLogs(level='WARNING'):
+            self.assertIsNone(open_fresh_latb(self.lat_path))
+        self.assertEqual(self.text_words, read_lat_words(self.lat_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
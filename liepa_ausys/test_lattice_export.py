@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+
+from liepa_ausys.lattice_export import export_lattice, export_lattices, format_timestamp
+
+LATTICE = """# 1 S0000
+1 0.00 0.50 Labas
+1 0.50 0.90 rytas_visiems .
+2 0.50 0.90 rytą
+1 3.00 3.40 kaip
+
+# 2 S0001
+1 3661.20 3661.40 <eps>
+1 3661.40 3662.00 ačiū
+"""
+
+
+class TestLatticeExport(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.lat_path = os.path.join(self.tmp_dir.name, "test.lat")
+        with open(self.lat_path, 'w', encoding='utf-8') as f:
+            f.write(LATTICE)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def read(self, name:str) -> str:
+        with open(os.path.join(self.tmp_dir.name, name), encoding='utf-8') as f:
+            return f.read()
+
+    def test_timestamp(self):
+        self.assertEqual("01:01:01,200", format_timestamp(3661.2, ','))
+        self.assertEqual("00:00:00.500", format_timestamp(0.4999, '.'))
+
+    def test_all_formats(self):
+        paths = export_lattice(self.lat_path, ["audacity", "srt", "vtt", "tsv"], speakers=True)
+
+        self.assertEqual(["test.audacity.txt", "test.srt", "test.vtt", "test.tsv"], [os.path.basename(p) for p in paths])
+        self.assertEqual("0.0\t0.5\tS0000: Labas\n0.5\t0.9\tS0000: rytas_visiems\n3.0\t3.4\tS0000: kaip\n"
+                         "3661.2\t3661.4\tS0001: <eps>\n3661.4\t3662.0\tS0001: ačiū\n", self.read("test.audacity.txt"))
+        self.assertEqual("1\n00:00:00,000 --> 00:00:00,900\nS0000: Labas rytas visiems.\n\n"
+                         "2\n00:00:03,000 --> 00:00:03,400\nS0000: kaip\n\n"
+                         "3\n01:01:01,400 --> 01:01:02,000\nS0001: ačiū\n\n", self.read("test.srt"))
+        self.assertTrue(self.read("test.vtt").startswith("WEBVTT\n\n00:00:00.000 --> 00:00:00.900\nS0000: Labas rytas visiems.\n\n"))
+        tsv = self.read("test.tsv").splitlines()
+        self.assertEqual(7, len(tsv))
+        self.assertEqual("1\tS0000\t1\t0.5\t0.9\trytas_visiems\t.", tsv[2])
+        self.assertEqual([], [name for name in os.listdir(self.tmp_dir.name) if name.endswith(".tmp")])
+
+    def test_failed_open_removes_opened_files(self):
+        # a directory in place of the second temp file can't be opened
+        blocked = os.path.join(self.tmp_dir.name, f"test.srt.{os.getpid()}.tmp")
+        os.mkdir(blocked)
+
+        with self.assertRaises(OSError):
+            export_lattice(self.lat_path, ["audacity", "srt"])
+
+        self.assertEqual([os.path.basename(blocked)], [name for name in os.listdir(self.tmp_dir.name) if name.endswith(".tmp")])
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir.name, "test.audacity.txt")))
+
+    def test_directory_batch(self):
+        sub_dir = os.path.join(self.tmp_dir.name, "sub")
+        os.mkdir(sub_dir)
+        with open(os.path.join(sub_dir, "other.lat"), 'w', encoding='utf-8') as f:
+            f.write(LATTICE)
+        with open(os.path.join(sub_dir, "broken.lat"), 'w', encoding='utf-8') as f:
+            f.write("# 1\n")
+
+        with self.assertLogs(level='ERROR'):
+            results = export_lattices([self.tmp_dir.name], ["srt"], workers=1)
+
+        self.assertEqual(3, len(results))
+        self.assertIsNone(results[os.path.join(sub_dir, "broken.lat")])
+        self.assertTrue(os.path.exists(os.path.join(sub_dir, "other.srt")))
+        self.assertFalse(os.path.exists(os.path.join(sub_dir, "broken.srt")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import json
+import struct
+import tempfile
+import unittest
+import urllib.error
+import urllib.request
+
+from liepa_ausys.mock_server import MockAsrServer, MockConfig, wav_duration_from_bytes
+from liepa_ausys.multipart import MultipartFileBody
+from liepa_ausys.sse import iter_sse_events
+
+
+def wav_bytes(duration_sec:float, sample_rate:int=16000) -> bytes:
+    data_size = int(duration_sec * sample_rate) * 2
+    return struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + data_size, b'WAVE', b'fmt ', 16, 1, 1,
+                       sample_rate, sample_rate * 2, 2, 16, b'data', data_size) + b'\x00' * data_size
+
+
+class TestMockServer(unittest.TestCase):
+    def start(self, **config) -> MockAsrServer:
+        server = MockAsrServer(config=MockConfig(seed=1, **config)).start()
+        self.addCleanup(server.stop)
+        return server
+
+    def request(self, url:str, data:bytes=None, headers:dict={}):
+        with urllib.request.urlopen(urllib.request.Request(url, data=data, headers=headers)) as response:
+            return response.read()
+
+    def upload(self, url:str, duration_sec:float, field_name:str) -> bytes:
+        body = wav_bytes(duration_sec)
+        boundary = "testboundary"
+        data = (f'--{boundary}\r\nContent-Disposition: form-data; name="{field_name}"; filename="a.wav"\r\n'
+                f'Content-Type: audio/wav\r\n\r\n').encode() + body + f'\r\n--{boundary}--\r\n'.encode()
+        return self.request(url, data, {'Content-Type': f'multipart/form-data; boundary={boundary}'})
+
+    def test_wav_duration(self):
+        self.assertEqual(2.0, wav_duration_from_bytes(b'--x\r\n\r\n' + wav_bytes(2.0)[:1000], len(wav_bytes(2.0)) + 7))
+
+    def test_liepa_flow(self):
+        server = self.start(speed_ratio=0)
+
+        job_id = json.loads(self.upload(f"{server.url}/transcriber/upload", 3.0, "file"))["id"]
+        status = json.loads(self.request(f"{server.url}/status.service/status/{job_id}"))
+        lat = self.request(f"{server.url}/result.service/result/{job_id}/lat.restored.txt").decode('utf-8')
+
+        self.assertEqual({"status": "COMPLETED", "error": ""}, status)
+        self.assertTrue(lat.startswith("# 1 S0000\n1 0.00 0.40 "))
+        self.assertEqual(6, len([line for line in lat.splitlines() if line.startswith("1 ")]))
+        self.assertEqual(1, server.stats.jobs)
+        self.assertEqual(3, server.stats.total_requests)
+        self.assertGreater(server.stats.upload_bytes, 96000)
+
+    def test_processing_statuses(self):
+        server = self.start(speed_ratio=100)
+        job_id = json.loads(self.upload(f"{server.url}/transcriber/upload", 1.0, "file"))["id"]
+
+        self.assertEqual("Upload", json.loads(self.request(f"{server.url}/status.service/status/{job_id}"))["status"])
+        with self.assertRaises(urllib.error.HTTPError) as e:
+            self.request(f"{server.url}/result.service/result/{job_id}/lat.restored.txt")
+        self.assertEqual(404, e.exception.code)
+
+    def test_gradio_flow(self):
+        server = self.start(speed_ratio=0.01, sse_interval_sec=0.01)
+        # MultipartFileBody sizes the body with fstat, it needs a real file
+        wav_file = tempfile.TemporaryFile()
+        self.addCleanup(wav_file.close)
+        wav_file.write(wav_bytes(2.0))
+        wav_file.seek(0)
+        body = MultipartFileBody(wav_file, "a.wav")
+        remote_path = json.loads(self.request(f"{server.url}/upload", b"".join(body), body.headers()))[0]
+        payload = json.dumps({"data": [{"path": remote_path, "meta": {"_type": "gradio.FileData"}}, "model", False]}).encode()
+        event_id = json.loads(self.request(f"{server.url}/call/predict", payload, {'Content-Type': 'application/json'}))["event_id"]
+
+        with urllib.request.urlopen(f"{server.url}/call/predict/{event_id}") as response:
+            events = list(iter_sse_events(response))
+
+        self.assertEqual("complete", events[-1].event)
+        lat_text, breakdown = json.loads(events[-1].data)
+        self.assertEqual(4, len([line for line in lat_text.splitlines() if line.startswith("1 ")]))
+        self.assertEqual(["Upload", "Diarization", "Transcription", "ResultMake"], [item[0] for item in breakdown["data"]])
+
+    def test_failure_injection(self):
+        server = self.start(speed_ratio=0, failure_rate=1.0)
+        job_id = json.loads(self.upload(f"{server.url}/transcriber/upload", 1.0, "file"))["id"]
+
+        self.assertNotEqual("", json.loads(self.request(f"{server.url}/status.service/status/{job_id}"))["error"])
+
+    def test_http_error_injection(self):
+        server = self.start(http_error_rate=1.0)
+
+        with self.assertRaises(urllib.error.HTTPError) as e:
+            self.upload(f"{server.url}/transcriber/upload", 1.0, "file")
+        self.assertEqual(503, e.exception.code)
+        self.assertEqual(1, server.stats.http_errors)
+
+
+if __name__ == '__main__':
+    unittest.main()
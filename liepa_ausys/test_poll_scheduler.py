@@ -0,0 +1,62 @@
+import unittest
+
+from liepa_ausys.poll_scheduler import PollScheduler
+
+
+class TestPollScheduler(unittest.TestCase):
+    def test_first_delay_follows_duration(self):
+        scheduler = PollScheduler(min_delay=1, default_rtf=0.5)
+
+        self.assertEqual(1, scheduler.first_delay(1))
+        self.assertAlmostEqual(0.9 * 3600, scheduler.first_delay(7200))
+
+    def test_observe_updates_rtf(self):
+        scheduler = PollScheduler(default_rtf=0.5, model="ben")
+        scheduler.observe(100, 20)
+        self.assertAlmostEqual(0.2, scheduler.rtf)
+        scheduler.observe(100, 70, weight=0.5)
+        self.assertAlmostEqual(0.45, scheduler.rtf)
+
+    def test_completed_at_first_poll_cuts_rtf(self):
+        scheduler = PollScheduler(min_delay=0.1, default_rtf=0.5, model="ben")
+        scheduler.observe(100, 40, upper_bound=True)
+        self.assertAlmostEqual(0.2, scheduler.rtf)
+
+        # a server with a real RTF of 0.05: each first poll finds the job completed until the estimate gets below it
+        jobs = 0
+        while scheduler.first_delay(100) >= 5:
+            scheduler.observe(100, scheduler.first_delay(100), upper_bound=True)
+            jobs += 1
+        self.assertEqual(2, jobs)
+        scheduler.observe(100, 5)
+        self.assertGreater(scheduler.rtf, 0.03)
+
+    def test_backoff_is_capped(self):
+        scheduler = PollScheduler(min_delay=1, max_delay=30, backoff=2, jitter=0)
+
+        self.assertEqual([1, 2, 4, 8, 16, 30, 30], [scheduler.next_delay(i) for i in range(1, 8)])
+
+    def test_polls_are_spread(self):
+        scheduler = PollScheduler(max_polls_per_sec=10)
+
+        waits = [scheduler.reserve(5, now=100) for _ in range(3)]
+        self.assertEqual([5, 5.1, 5.2], [round(wait, 6) for wait in waits])
+        self.assertEqual(10, scheduler.reserve(10, now=100))
+
+    def test_long_delay_does_not_hold_back_short_ones(self):
+        scheduler = PollScheduler(max_polls_per_sec=20)
+
+        self.assertEqual(3600, scheduler.reserve(3600, now=0))
+        self.assertEqual(1, scheduler.reserve(1, now=0))
+        # a slot between two taken ones, then one next to the distant poll
+        self.assertEqual(3, scheduler.reserve(3, now=0))
+        self.assertEqual([1.05, 3600.05, 2.05], [round(scheduler.reserve(delay, now=0), 6) for delay in (1, 3600, 2.05)])
+        self.assertEqual(2.1, round(scheduler.reserve(2.02, now=0), 6))
+        self.assertEqual(1.1, round(scheduler.reserve(1.05, now=0), 6))
+        # past slots are forgotten
+        self.assertEqual(0, scheduler.reserve(0, now=10))
+        self.assertEqual([10, 3600, 3600.05], scheduler.slots)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from liepa_ausys.result_store import STALE_TMP_SEC, ResultStore
+
+
+class TestResultStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.root = self.tmp_dir.name
+
+    def test_put_and_get(self):
+        store = ResultStore(self.root)
+        self.assertIsNone(store.get("ab12", "liepa", "ben", "lat"))
+
+        store.put("ab12", "liepa", "ben", "lat", "# 1 S0000\nąžuolas\n")
+
+        self.assertEqual("# 1 S0000\nąžuolas\n", store.get("ab12", "liepa", "ben", "lat"))
+        self.assertIsNone(store.get("ab12", "liepa", "other", "lat"))
+        self.assertIsNone(store.get("ab12", "whisper", "ben", "lat"))
+        self.assertEqual(os.path.join(self.root, "ab", "ab12", "whisper", "org_model", "lat"), store.path("ab12", "whisper", "org/model", "lat"))
+        self.assertEqual(["lat"], os.listdir(os.path.join(self.root, "ab", "ab12", "liepa", "ben")))
+
+    def test_least_recently_used_are_evicted(self):
+        store = ResultStore(self.root, max_bytes=350)
+        store.evict()
+        for i, sha256 in enumerate(("aa01", "bb02", "cc03")):
+            store.put(sha256, "liepa", "ben", "lat", "x" * 100)
+            os.utime(store.path(sha256, "liepa", "ben", "lat"), (1000 + i, 1000 + i))
+        # reading makes the oldest result the most recently used
+        store.get("aa01", "liepa", "ben", "lat")
+        store.put("dd04", "liepa", "ben", "lat", "x" * 100)
+
+        self.assertIsNotNone(store.get("aa01", "liepa", "ben", "lat"))
+        self.assertIsNone(store.get("bb02", "liepa", "ben", "lat"))
+        self.assertIsNotNone(store.get("cc03", "liepa", "ben", "lat"))
+        self.assertFalse(os.path.exists(os.path.join(self.root, "bb")))
+        self.assertEqual(300, store.size)
+
+    def test_eviction_leaves_room(self):
+        store = ResultStore(self.root, max_bytes=10000)
+        store.evict()
+        with mock.patch.object(store, "scan", wraps=store.scan) as scan:
+            for i in range(150):
+                store.put(f"{i:04}", "liepa", "ben", "lat", "x" * 100)
+
+        # the 101st put goes over and the store is trimmed to 9000 bytes, the next 10 results fit
+        self.assertEqual(5, scan.call_count)
+        self.assertEqual(9500, store.size)
+
+    def test_stale_temporary_files_are_removed(self):
+        store = ResultStore(self.root)
+        store.put("aa01", "liepa", "ben", "lat", "x")
+        directory = os.path.dirname(store.path("aa01", "liepa", "ben", "lat"))
+        for name, age in ((".old.tmp", STALE_TMP_SEC + 10), (".new.tmp", 0)):
+            with open(os.path.join(directory, name), 'w') as f:
+                f.write("partial")
+            os.utime(os.path.join(directory, name), (time.time() - age, time.time() - age))
+
+        self.assertEqual(1, len(store.scan()))
+        self.assertEqual([".new.tmp", "lat"], sorted(os.listdir(directory)))
+
+
+if __name__ == '__main__':
+    unittest.main()
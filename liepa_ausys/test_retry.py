@@ -0,0 +1,132 @@
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+
+import aiohttp
+
+from liepa_ausys.backends import WhisperBackend
+from liepa_ausys.retry import CircuitBreaker, Retrier, RetryPolicy, ServiceError, is_not_accepted, is_retryable, parse_retry_after
+
+
+class FlakyCall():
+    def __init__(self, errors:list):
+        self.errors = errors
+        self.calls = 0
+
+    async def __call__(self, value:str, *args) -> str:
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return value
+
+
+class TestRetry(unittest.TestCase):
+    def test_retry_after(self):
+        self.assertEqual(5.0, parse_retry_after("5"))
+        self.assertEqual(30.0, parse_retry_after("Wed, 21 Oct 2015 07:28:30 GMT", now=1445412480.0))
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertIsNone(parse_retry_after(None))
+
+    def test_classification(self):
+        self.assertTrue(is_retryable(ServiceError("x", 503)))
+        self.assertTrue(is_retryable(ServiceError("x", 429)))
+        self.assertTrue(is_retryable(aiohttp.ServerDisconnectedError()))
+        self.assertTrue(is_retryable(asyncio.TimeoutError()))
+        self.assertFalse(is_retryable(ServiceError("x", 404)))
+        self.assertFalse(is_retryable(ServiceError("processing failed")))
+        self.assertFalse(is_retryable(ValueError("x")))
+
+    def test_policy_delay(self):
+        policy = RetryPolicy(base_delay=1, max_delay=10, jitter=0)
+        self.assertEqual([1, 2, 4, 8, 10], [policy.delay(attempt) for attempt in range(1, 6)])
+        self.assertEqual(3, policy.delay(1, retry_after=3))
+        self.assertEqual(10, policy.delay(1, retry_after=120))
+
+    def test_retries_transient_errors(self):
+        retrier = Retrier(RetryPolicy(attempts=3, base_delay=0.001))
+        call = FlakyCall([ServiceError("x", 502), aiohttp.ServerDisconnectedError()])
+
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual("ok", asyncio.run(retrier.call("status", call, "ok")))
+        self.assertEqual(3, call.calls)
+        self.assertEqual({"status": 2}, retrier.retries)
+
+    def test_fatal_and_exhausted(self):
+        retrier = Retrier(RetryPolicy(attempts=2, base_delay=0.001))
+        fatal = FlakyCall([ServiceError("x", 404)])
+        with self.assertRaises(ServiceError):
+            asyncio.run(retrier.call("result", fatal, "ok"))
+        self.assertEqual(1, fatal.calls)
+
+        exhausted = FlakyCall([ServiceError("x", 503)] * 3)
+        with self.assertLogs(level='ERROR'), self.assertRaises(ServiceError):
+            asyncio.run(retrier.call("result", exhausted, "ok"))
+        self.assertEqual(2, exhausted.calls)
+
+    def test_submission_resent_only_when_not_accepted(self):
+        refused = aiohttp.ClientConnectorError(SimpleNamespace(host="localhost", port=80, ssl=None), ConnectionRefusedError(111, "refused"))
+        self.assertTrue(is_not_accepted(refused))
+        self.assertTrue(is_not_accepted(ServiceError("x", 503, retry_after=1)))
+        self.assertFalse(is_not_accepted(ServiceError("x", 502)))
+        self.assertFalse(is_not_accepted(aiohttp.ServerDisconnectedError()))
+        self.assertFalse(is_not_accepted(asyncio.TimeoutError()))
+
+        retrier = Retrier(RetryPolicy(attempts=4, base_delay=0.001))
+        call = FlakyCall([refused, ServiceError("x", 429), ServiceError("x", 503)])
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual("ok", asyncio.run(retrier.call("upload", call, "ok", submission=True)))
+        self.assertEqual(4, call.calls)
+
+        for error in (aiohttp.ServerDisconnectedError(), asyncio.TimeoutError(), ServiceError("x", 504)):
+            call = FlakyCall([error])
+            with self.assertLogs(level='ERROR'), self.assertRaises(type(error)):
+                asyncio.run(retrier.call("upload", call, "ok", submission=True))
+            self.assertEqual(1, call.calls)
+        # the same errors are retried for calls which don't create anything
+        call = FlakyCall([aiohttp.ServerDisconnectedError(), asyncio.TimeoutError()])
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual("ok", asyncio.run(retrier.call("status", call, "ok")))
+
+    def test_whisper_predict_is_the_submission(self):
+        backend = WhisperBackend("http://localhost", retrier=Retrier(RetryPolicy(attempts=3, base_delay=0.001)))
+        backend.client.upload = FlakyCall([asyncio.TimeoutError()])
+        backend.client.predict = FlakyCall([asyncio.TimeoutError()])
+
+        with self.assertLogs(level='WARNING'), self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(backend.submit("a.wav"))
+        # the upload is repeated, the job might already be queued after the timeout of predict
+        self.assertEqual((2, 1), (backend.client.upload.calls, backend.client.predict.calls))
+
+    def test_circuit_breaker(self):
+        breaker = CircuitBreaker(failure_threshold=2, cooldown_sec=0.05)
+        breaker.record_failure()
+        self.assertFalse(breaker.is_open)
+        with self.assertLogs(level='WARNING'):
+            breaker.record_failure()
+        self.assertTrue(breaker.is_open)
+
+        async def probe_and_follower() -> list:
+            order = []
+            async def submit(name:str):
+                is_probe = await breaker.wait()
+                order.append((name, is_probe, time.monotonic() - started))
+                if is_probe:
+                    await asyncio.sleep(0.02)
+                    breaker.record_success()
+            started = time.monotonic()
+            await asyncio.gather(submit("a"), submit("b"))
+            return order
+
+        order = asyncio.run(probe_and_follower())
+
+        self.assertFalse(breaker.is_open)
+        # one submission probes the server after the cooldown, the other waits for its outcome
+        self.assertEqual([True, False], [is_probe for _, is_probe, _ in order])
+        self.assertGreaterEqual(order[0][2], 0.04)
+        self.assertGreaterEqual(order[1][2], order[0][2] + 0.02)
+        self.assertEqual(0.05, breaker.cooldown_sec)
+
+
+if __name__ == '__main__':
+    unittest.main()
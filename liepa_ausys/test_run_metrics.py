@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from liepa_ausys.run_metrics import FileMetrics, MetricsWriter
+
+
+class FakeClock():
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRunMetrics(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(time, "monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_status_transitions(self):
+        metrics = FileMetrics("a.wav", 100.0, "liepa", "ben")
+        with metrics.stage("upload"):
+            self.clock.now += 2
+        with metrics.stage("processing"):
+            for status, seconds in [("Diarization", 3), ("Diarization", 4), ("Transcription", 10), ("COMPLETED", 0)]:
+                metrics.status(status)
+                self.clock.now += seconds
+
+        record = metrics.record()
+
+        self.assertEqual({"upload": 2.0, "processing": 17.0}, record["stages"])
+        self.assertEqual({"Diarization": 7.0, "Transcription": 10.0, "COMPLETED": 0.0}, record["statuses"])
+        self.assertEqual([["Diarization", 2.0], ["Transcription", 9.0], ["COMPLETED", 19.0]], record["transitions"])
+        self.assertEqual(4, record["status_polls"])
+        self.assertEqual(0.17, record["rtf"])
+        self.assertEqual(0.19, record["total_rtf"])
+        self.assertEqual("completed", record["outcome"])
+
+    def test_reattached_job_has_no_rtf(self):
+        metrics = FileMetrics("a.wav", 100.0)
+        metrics.reattached = True
+        metrics.add("processing", 5)
+
+        self.assertIsNone(metrics.record()["rtf"])
+
+    def test_writer(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            jsonl_path = os.path.join(tmp_dir, "metrics.jsonl")
+            prometheus_path = os.path.join(tmp_dir, "liepa.prom")
+            writer = MetricsWriter(jsonl_path, prometheus_path)
+            for path, rtf in [("a.wav", 0.2), ("b.wav", 0.4)]:
+                metrics = FileMetrics(path, 10.0, "liepa")
+                metrics.add("processing", rtf * 10)
+                writer.write(metrics.record())
+            writer.write(FileMetrics("c.wav", 10.0, "liepa").record("failed", "Error from server!"))
+            writer.close()
+
+            with open(jsonl_path) as f:
+                records = [json.loads(line) for line in f]
+            with open(prometheus_path) as f:
+                prometheus = f.read()
+
+        self.assertEqual(["a.wav", "b.wav", "c.wav"], [r["file"] for r in records])
+        self.assertEqual("Error from server!", records[2]["error"])
+        self.assertIn('liepa_ausys_files{backend="liepa",outcome="completed"} 2\n', prometheus)
+        self.assertIn('liepa_ausys_files{backend="liepa",outcome="failed"} 1\n', prometheus)
+        self.assertIn('liepa_ausys_rtf_mean{backend="liepa"} 0.3\n', prometheus)
+        self.assertIn('liepa_ausys_rtf_max{backend="liepa"} 0.4\n', prometheus)
+        self.assertIn('liepa_ausys_audio_seconds{backend="liepa"} 20\n', prometheus)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,313 @@
+import asyncio
+import json
+import os
+import struct
+import tempfile
+import threading
+import unittest
+import wave
+from unittest import mock
+
+from liepa_ausys.backends import LiepaBackend, WhisperBackend
+from liepa_ausys.gradio_client import iter_lines
+from liepa_ausys.job_manifest import JobManifest
+from liepa_ausys.mock_server import MockAsrServer, MockConfig
+from liepa_ausys.runner import ProcessingCtx, TranscriptionRunner, backend_manifest_path, transcribe_wav_files_in_directory
+from liepa_ausys.test_mock_server import wav_bytes
+from liepa_ausys.test_wav_chunker import write_tone_with_pauses
+
+
+class FakeContent():
+    def __init__(self, blocks:list):
+        self.blocks = blocks
+
+    async def iter_any(self):
+        for block in self.blocks:
+            yield block
+
+
+class TestRunner(unittest.TestCase):
+    def setUp(self):
+        self.server = MockAsrServer(config=MockConfig(seed=1, speed_ratio=0.01, sse_interval_sec=0.01)).start()
+        self.addCleanup(self.server.stop)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.directory = self.tmp_dir.name
+        for name in ("a.wav", "b.wav"):
+            with open(os.path.join(self.directory, name), 'wb') as f:
+                f.write(wav_bytes(2.0))
+        self.env = {"liepa_ausys_url": self.server.url, "whisper_url": self.server.url, "liepa_ausys_processing_poll_sec": "0.02"}
+
+    def run_backends(self, names:list, **ctx_args) -> list:
+        ctx_args.setdefault("jobs", 2)
+        ctx = ProcessingCtx(directory=self.directory, wav_pattern=os.path.join(self.directory, "*.wav"), backends=names, **ctx_args)
+        backend_classes = {"liepa": LiepaBackend, "whisper": WhisperBackend}
+        backends = [backend_classes[name].from_env(self.env, self.directory, jobs=ctx.jobs) for name in names]
+        transcribe_wav_files_in_directory(ctx, backends)
+        with open(os.path.join(self.directory, "liepa_ausys_metrics.jsonl"), encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_both_backends(self):
+        records = self.run_backends(["liepa", "whisper"], ext_eaf=True)
+
+        names = set(os.listdir(self.directory))
+        for name in ("a.liepa.lat", "a.liepa.latb", "a.liepa.eaf", "a.whisper.lat", "b.whisper.latb"):
+            self.assertIn(name, names)
+        self.assertNotIn("a.whisper.eaf", names)
+        self.assertNotIn("a.lat", names)
+        self.assertEqual([("liepa", "completed")] * 2 + [("whisper", "completed")] * 2,
+                         sorted((r["backend"], r["outcome"]) for r in records))
+        self.assertTrue(all("server_stages" in r for r in records if r["backend"] == "whisper"))
+        self.assertTrue(all("probe" in r["stages"] for r in records))
+        self.assertTrue(os.path.exists(os.path.join(self.directory, ".liepa_ausys_manifest.whisper.sqlite")))
+        # liepa results of both files in both formats were downloaded gzip compressed
+        self.assertEqual(4, self.server.stats.compressed_results)
+        with open(os.path.join(self.directory, "a.liepa.eaf"), encoding='utf-8') as f:
+            self.assertTrue(f.read().startswith('<?xml version="1.0"'))
+        self.assertEqual([], [name for name in names if name.endswith(".tmp")])
+
+    def test_files_are_taken_by_a_fixed_pool(self):
+        for i in range(4):
+            with open(os.path.join(self.directory, f"c{i}.wav"), 'wb') as f:
+                f.write(wav_bytes(1.0))
+        run_file = TranscriptionRunner.run_file
+        active = []
+        peak = []
+
+        async def counting_run_file(runner, audio_file, index):
+            active.append(index)
+            peak.append(len(active))
+            try:
+                await run_file(runner, audio_file, index)
+            finally:
+                active.remove(index)
+
+        with mock.patch.object(TranscriptionRunner, "run_file", counting_run_file):
+            records = self.run_backends(["liepa"])
+
+        self.assertEqual(6 * ["completed"], [r["outcome"] for r in records])
+        # --jobs 2 on one backend
+        self.assertEqual(2, max(peak))
+
+    def test_rerun_skips_finished_backend(self):
+        self.run_backends(["whisper"])
+        self.assertTrue(os.path.exists(os.path.join(self.directory, "a.lat")))
+        os.rename(os.path.join(self.directory, "a.lat"), os.path.join(self.directory, "a.whisper.lat"))
+        os.rename(os.path.join(self.directory, "b.lat"), os.path.join(self.directory, "b.whisper.lat"))
+        jobs_before = self.server.stats.jobs
+
+        records = self.run_backends(["liepa", "whisper"])[2:]
+
+        self.assertEqual(2, self.server.stats.jobs - jobs_before)
+        self.assertEqual(["completed", "completed", "skipped", "skipped"], sorted(r["outcome"] for r in records))
+
+    def test_failed_stream(self):
+        self.server.config.failure_rate = 1.0
+        with self.assertLogs(level='ERROR'):
+            records = self.run_backends(["whisper"])
+
+        self.assertEqual(["failed", "failed"], [r["outcome"] for r in records])
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "a.lat")))
+
+    def test_transient_errors_are_retried(self):
+        self.server.config.http_error_rate = 0.3
+        self.env.update({"liepa_ausys_retry_base_sec": "0.01", "liepa_ausys_retry_attempts": "20", "liepa_ausys_breaker_cooldown_sec": "0.05"})
+        with self.assertLogs(level='WARNING'):
+            records = self.run_backends(["liepa", "whisper"])
+
+        self.assertGreater(self.server.stats.http_errors, 0)
+        self.assertEqual(["completed"] * 4, [r["outcome"] for r in records])
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "liepa_ausys_failed.tsv")))
+
+    def test_failed_files_are_reported(self):
+        self.server.config.failure_rate = 1.0
+        with self.assertLogs(level='ERROR'):
+            self.run_backends(["liepa"])
+
+        with open(os.path.join(self.directory, "liepa_ausys_failed.tsv"), encoding='utf-8') as f:
+            lines = [line.rstrip("\n").split("\t") for line in f]
+        self.assertEqual([["liepa", os.path.join(self.directory, "a.wav"), "Error from server!"],
+                          ["liepa", os.path.join(self.directory, "b.wav"), "Error from server!"]], lines)
+
+    def test_resample_before_upload(self):
+        stereo_44k = wav_bytes(2.0, sample_rate=44100 * 2)
+        with open(os.path.join(self.directory, "a.wav"), 'wb') as f:
+            # the same bytes read as 44.1 kHz stereo
+            f.write(stereo_44k[:22] + struct.pack('<HIIH', 2, 44100, 44100 * 4, 4) + stereo_44k[34:])
+
+        records = self.run_backends(["liepa", "whisper"], resample=True, resample_workers=1)
+
+        # a.wav shrinks to 64 kB on both backends, b.wav is already 16 kHz mono and is sent as it is
+        self.assertLess(self.server.stats.upload_bytes, 4 * 70000)
+        self.assertEqual(["completed"] * 4, [r["outcome"] for r in records])
+        self.assertEqual(2, sum("transcode" in r["stages"] for r in records))
+        self.assertTrue(os.path.exists(os.path.join(self.directory, "a.whisper.lat")))
+
+    def test_duplicates_come_from_result_store(self):
+        store_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(store_dir.cleanup)
+        # a.wav and b.wav have the same content
+        records = self.run_backends(["liepa"], ext_eaf=True, result_store=store_dir.name)
+
+        self.assertEqual(1, self.server.stats.jobs)
+        self.assertEqual(["cached", "completed"], sorted(r["outcome"] for r in records))
+        with open(os.path.join(self.directory, "a.lat"), encoding='utf-8') as a, open(os.path.join(self.directory, "b.lat"), encoding='utf-8') as b:
+            self.assertEqual(a.read(), b.read())
+        self.assertTrue(os.path.exists(os.path.join(self.directory, "b.eaf")))
+
+        # the same recording under a new name, e.g. received again in another batch
+        with open(os.path.join(self.directory, "c.wav"), 'wb') as f:
+            f.write(wav_bytes(2.0))
+        records = self.run_backends(["liepa"], result_store=store_dir.name)[2:]
+
+        self.assertEqual(1, self.server.stats.jobs)
+        self.assertEqual(["cached"], [r["outcome"] for r in records])
+        self.assertTrue(os.path.exists(os.path.join(self.directory, "c.latb")))
+
+    def test_distributed_nodes_share_the_directory(self):
+        for name in ("c.wav", "d.wav", "e.wav", "f.wav"):
+            with open(os.path.join(self.directory, name), 'wb') as f:
+                f.write(wav_bytes(2.0))
+
+        def node(worker_id:str):
+            ctx = ProcessingCtx(directory=self.directory, wav_pattern=os.path.join(self.directory, "*.wav"), backends=["liepa"], jobs=2,
+                                distributed=True, worker_id=worker_id)
+            transcribe_wav_files_in_directory(ctx, [LiepaBackend.from_env(self.env, self.directory, jobs=ctx.jobs)])
+
+        nodes = [threading.Thread(target=node, args=(worker_id,)) for worker_id in ("node1", "node2")]
+        for thread in nodes:
+            thread.start()
+        for thread in nodes:
+            thread.join()
+
+        # every file was transcribed once, by one of the nodes
+        self.assertEqual(6, self.server.stats.jobs)
+        completed = []
+        for worker_id in ("node1", "node2"):
+            self.assertTrue(os.path.exists(os.path.join(self.directory, f".liepa_ausys_manifest.{worker_id}.sqlite")))
+            metrics_path = os.path.join(self.directory, f"liepa_ausys_metrics.{worker_id}.jsonl")
+            if os.path.exists(metrics_path):
+                with open(metrics_path, encoding='utf-8') as f:
+                    completed += [json.loads(line)["file"] for line in f]
+        self.assertEqual(sorted(os.path.join(self.directory, f"{name}.wav") for name in "abcdef"), sorted(completed))
+        self.assertTrue(all(os.path.exists(os.path.join(self.directory, f"{name}.lat")) for name in "abcdef"))
+        self.assertEqual([], os.listdir(os.path.join(self.directory, ".liepa_ausys_claims")))
+
+    def fast_first_polls(self):
+        # the mock server processes 30 s in 0.3 s, the first poll need not wait for a slow server
+        with open(os.path.join(self.directory, ".liepa_ausys_rtf.json"), 'w') as f:
+            json.dump({"ben": {"rtf": 0.01, "samples": 1}}, f)
+
+    def test_chunked(self):
+        self.fast_first_polls()
+        os.remove(os.path.join(self.directory, "b.wav"))
+        write_tone_with_pauses(os.path.join(self.directory, "a.wav"), [8.0, 21.0], 30)
+
+        records = self.run_backends(["liepa"], chunk_sec=10)
+
+        self.assertEqual(3, self.server.stats.jobs)
+        self.assertEqual(["completed"], [r["outcome"] for r in records])
+        with open(os.path.join(self.directory, "a.lat"), encoding='utf-8') as f:
+            self.assertEqual(["# 1", "# 2", "# 3"], [line[:3] for line in f if line.startswith("# ")])
+
+    def test_chunks_keep_to_the_job_limit(self):
+        self.fast_first_polls()
+        os.remove(os.path.join(self.directory, "b.wav"))
+        write_tone_with_pauses(os.path.join(self.directory, "a.wav"), [8.0, 21.0], 30)
+
+        self.run_backends(["liepa"], chunk_sec=10, jobs=1)
+
+        jobs = sorted((job.created, job.created + job.duration_sec * self.server.config.speed_ratio) for job in self.server.jobs.values())
+        self.assertEqual(3, len(jobs))
+        # a chunk is submitted only after the previous one is done
+        self.assertTrue(all(end <= next_start for (_, end), (next_start, _) in zip(jobs, jobs[1:])))
+
+    def test_failed_chunk_stops_the_others(self):
+        self.fast_first_polls()
+        self.server.config.failure_rate = 1.0
+        os.remove(os.path.join(self.directory, "b.wav"))
+        write_tone_with_pauses(os.path.join(self.directory, "a.wav"), [8.0, 21.0], 30)
+
+        with self.assertLogs(level='ERROR'):
+            records = self.run_backends(["liepa"], chunk_sec=10, jobs=1)
+
+        self.assertEqual(["failed"], [r["outcome"] for r in records])
+        # chunks waiting for a slot are cancelled, not uploaded
+        self.assertEqual(1, self.server.stats.jobs)
+
+    def test_chunked_falls_back_for_24_bit(self):
+        self.fast_first_polls()
+        os.remove(os.path.join(self.directory, "b.wav"))
+        with wave.open(os.path.join(self.directory, "a.wav"), 'wb') as w:
+            w.setnchannels(1)
+            w.setsampwidth(3)
+            w.setframerate(8000)
+            w.writeframes(b'\x00' * 3 * 8000 * 30)
+
+        with self.assertLogs(level='WARNING'):
+            records = self.run_backends(["liepa"], chunk_sec=10)
+
+        # uploaded whole instead of an empty lattice of zero chunks
+        self.assertEqual(1, self.server.stats.jobs)
+        self.assertEqual(["completed"], [r["outcome"] for r in records])
+        with open(os.path.join(self.directory, "a.lat"), encoding='utf-8') as f:
+            self.assertNotEqual("\n", f.read())
+
+    def test_reattach_to_submitted_job(self):
+        manifest = JobManifest(os.path.join(self.directory, ".liepa_ausys_manifest.sqlite"))
+        entry = manifest.current_entry(os.path.join(self.directory, "a.wav"))
+        # submitted by a run which was interrupted while the server processed it
+        manifest.record_upload(entry, self.server.add_job(2.0), "ben")
+        manifest.close()
+
+        records = self.run_backends(["liepa"])
+
+        # only b.wav is uploaded
+        self.assertEqual(2, self.server.stats.jobs)
+        self.assertEqual(1, self.server.stats.requests["upload"])
+        self.assertEqual([(True, "completed"), (False, "completed")],
+                         [(r.get("reattached", False), r["outcome"]) for r in sorted(records, key=lambda r: r["file"])])
+        self.assertTrue(os.path.exists(os.path.join(self.directory, "a.lat")))
+
+    def test_completed_entries_are_skipped(self):
+        self.run_backends(["liepa"])
+        # newer than its results, so the scan does not skip it; the manifest knows the content was transcribed
+        later = os.stat(os.path.join(self.directory, "a.lat")).st_mtime + 10
+        os.utime(os.path.join(self.directory, "a.wav"), (later, later))
+
+        records = self.run_backends(["liepa"])[2:]
+
+        self.assertEqual(2, self.server.stats.jobs)
+        self.assertEqual(["skipped"], [r["outcome"] for r in records])
+
+    def test_heartbeats_are_progress(self):
+        async def transcribe() -> tuple:
+            statuses, progress = [], []
+            async with WhisperBackend.from_env(self.env, self.directory) as backend:
+                job_id = await backend.submit(os.path.join(self.directory, "a.wav"))
+                await backend.wait(job_id, 2.0, statuses.append, on_progress=progress.append)
+            return statuses, progress
+
+        self.server.config.speed_ratio = 0.05
+        statuses, progress = asyncio.run(transcribe())
+
+        self.assertEqual(["complete"], statuses)
+        self.assertGreater(len(progress), 1)
+        self.assertEqual({"Processing"}, set(progress))
+
+    def test_manifest_path(self):
+        self.assertEqual("/w/.m.sqlite", backend_manifest_path("/w/.m.sqlite", "liepa"))
+        self.assertEqual("/w/.m.whisper.sqlite", backend_manifest_path("/w/.m.sqlite", "whisper"))
+
+    def test_long_lines(self):
+        async def collect(blocks:list) -> list:
+            return [line async for line in iter_lines(FakeContent(blocks))]
+
+        long_data = b"x" * 200000
+        lines = asyncio.run(collect([b"event: complete\nda", b"ta: " + long_data[:100000], long_data[100000:] + b"\n\n", b"tail"]))
+
+        self.assertEqual([b"event: complete\n", b"data: " + long_data + b"\n", b"\n", b"tail"], lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+
+from liepa_ausys.sse import iter_sse_events
+
+
+class TestSse(unittest.TestCase):
+    def test_gradio_stream(self):
+        lines = [b"event: heartbeat\n", b"data: null\n", b"\n",
+                 b"event: generating\n", b"data: [1]\n", b"\n",
+                 b": comment\n",
+                 b"event: complete\n", b"data: [\"a\",\n", b"data: \"b\"]\n", b"\n"]
+
+        events = list(iter_sse_events(lines))
+
+        self.assertEqual(["heartbeat", "generating", "complete"], [e.event for e in events])
+        self.assertEqual("null", events[0].data)
+        self.assertEqual('["a",\n"b"]', events[2].data)
+
+    def test_events_are_yielded_before_stream_ends(self):
+        def stream():
+            yield "data: first\n"
+            yield "\n"
+            raise AssertionError("stream read past the first event")
+
+        self.assertEqual("first", next(iter_sse_events(stream())).data)
+
+    def test_unterminated_event(self):
+        events = list(iter_sse_events(["event: complete\n", "data: x"]))
+
+        self.assertEqual("complete", events[0].event)
+        self.assertEqual("x", events[0].data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import math
+import os
+import struct
+import tempfile
+import unittest
+import wave
+
+from liepa_ausys import wav_chunker
+
+
+def write_tone_with_pauses(path:str, pauses_at_sec:list, duration_sec:float, sample_rate:int=8000):
+    """ 440 Hz tone interrupted by 0.5 s of silence starting at each of `pauses_at_sec` """
+    frames = bytearray()
+    for i in range(int(duration_sec * sample_rate)):
+        t = i / sample_rate
+        silent = any(p <= t < p + 0.5 for p in pauses_at_sec)
+        frames += struct.pack('<h', 0 if silent else int(8000 * math.sin(2 * math.pi * 440 * t)))
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(bytes(frames))
+
+
+class TestWavChunker(unittest.TestCase):
+    def test_split_at_silence(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            wav_path = os.path.join(tmp_dir, "long.wav")
+            write_tone_with_pauses(wav_path, [8.0, 21.0], 30)
+
+            chunks = wav_chunker.split_wav(wav_path, tmp_dir, chunk_sec=10, search_sec=3)
+
+            self.assertEqual(3, len(chunks))
+            self.assertTrue(8.0 <= chunks[1].offset_sec <= 8.5, chunks[1].offset_sec)
+            self.assertTrue(21.0 <= chunks[2].offset_sec <= 21.5, chunks[2].offset_sec)
+            total = 0
+            for chunk in chunks:
+                with wave.open(chunk.path, 'rb') as w:
+                    total += w.getnframes()
+                    self.assertAlmostEqual(chunk.duration_sec, w.getnframes() / w.getframerate())
+            self.assertEqual(30 * 8000, total)
+
+    def test_short_file_is_not_split(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            wav_path = os.path.join(tmp_dir, "short.wav")
+            write_tone_with_pauses(wav_path, [], 12)
+
+            self.assertEqual([], wav_chunker.split_wav(wav_path, tmp_dir, chunk_sec=10))
+
+    def test_stitch_lattices(self):
+        first = "# 1 S0000\n1 0 0.12 <eps>\n1 0.12 0.33 Kad\n\n# 2 S0001\n1 1 1.5 statybininkai ,\n"
+        second = "# 1 S0000\n1 0.2 0.7 pasistengs .\n"
+
+        stitched = wav_chunker.stitch_lattices([(first, 0.0), (second, 600.5)])
+
+        self.assertEqual("# 1 S0000\n1 0 0.12 <eps>\n1 0.12 0.33 Kad\n\n# 2 S0001\n1 1 1.5 statybininkai ,\n\n"
+                         "# 3 S0000\n1 600.7 601.2 pasistengs .\n", stitched)
+
+
+if __name__ == '__main__':
+    unittest.main()
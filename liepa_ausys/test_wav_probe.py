@@ -0,0 +1,91 @@
+import os
+import struct
+import tempfile
+import unittest
+import wave
+
+from liepa_ausys.wav_probe import WAVE_FORMAT_PCM, WavFormatError, get_audio_duration, probe_wav
+
+
+def fmt_chunk(format_tag:int, channels:int, sample_rate:int, bits:int, extensible_tag:int=None) -> bytes:
+    block_align = channels * bits // 8
+    body = struct.pack('<HHIIHH', format_tag, channels, sample_rate, sample_rate * block_align, block_align, bits)
+    if extensible_tag != None:
+        guid = struct.pack('<H', extensible_tag) + b'\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71'
+        body += struct.pack('<HHI', 22, bits, 3) + guid
+    return b'fmt ' + struct.pack('<I', len(body)) + body
+
+
+def chunk(chunk_id:bytes, body:bytes) -> bytes:
+    return chunk_id + struct.pack('<I', len(body)) + body + (b'\x00' if len(body) & 1 else b'')
+
+
+class TestWavProbe(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, content:bytes) -> str:
+        path = os.path.join(self.tmp_dir.name, "test.wav")
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def test_plain_pcm(self):
+        path = os.path.join(self.tmp_dir.name, "plain.wav")
+        with wave.open(path, 'wb') as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(16000)
+            w.writeframes(b'\x00\x00' * 16000 * 3)
+
+        info = probe_wav(path)
+
+        self.assertEqual((16000, 1, 16, WAVE_FORMAT_PCM, 44), (info.sample_rate, info.channels, info.bits_per_sample, info.format_tag, info.data_offset))
+        self.assertEqual(3.0, info.duration)
+        self.assertEqual(3.0, get_audio_duration(path))
+
+    def test_list_chunk_stereo_24bit(self):
+        data = b'\x00' * (6 * 48000)
+        body = b'WAVE' + chunk(b'LIST', b'INFOISFT\x05\x00\x00\x00abcd\x00') + fmt_chunk(1, 2, 48000, 24) + chunk(b'data', data)
+        path = self.write(b'RIFF' + struct.pack('<I', len(body)) + body)
+
+        info = probe_wav(path)
+
+        self.assertEqual((2, 24, 6, 48000), (info.channels, info.bits_per_sample, info.block_align, info.frames))
+        self.assertEqual(1.0, info.duration)
+
+    def test_extensible(self):
+        body = b'WAVE' + fmt_chunk(0xFFFE, 2, 44100, 16, extensible_tag=1) + chunk(b'fact', struct.pack('<I', 44100)) + chunk(b'data', b'\x00' * 4 * 22050)
+        path = self.write(b'RIFF' + struct.pack('<I', len(body)) + body)
+
+        info = probe_wav(path)
+
+        self.assertTrue(info.is_pcm)
+        self.assertEqual(0.5, info.duration)
+
+    def test_rf64(self):
+        data = b'\x00' * 2 * 8000
+        ds64 = chunk(b'ds64', struct.pack('<QQQI', 0, len(data), 8000, 0))
+        body = b'WAVE' + ds64 + fmt_chunk(1, 1, 8000, 16) + b'data' + struct.pack('<I', 0xFFFFFFFF) + data
+        path = self.write(b'RF64' + struct.pack('<I', 0xFFFFFFFF) + body)
+
+        self.assertEqual(1.0, probe_wav(path).duration)
+
+    def test_streamed_size(self):
+        body = b'WAVE' + fmt_chunk(1, 1, 8000, 16) + b'data' + struct.pack('<I', 0xFFFFFFFF) + b'\x00' * 4000
+        path = self.write(b'RIFF' + struct.pack('<I', 0xFFFFFFFF) + body)
+
+        self.assertEqual(0.25, probe_wav(path).duration)
+
+    def test_not_wav(self):
+        path = self.write(b'ID3\x03\x00' + b'\x00' * 100)
+
+        self.assertRaises(WavFormatError, probe_wav, path)
+        self.assertEqual(0.0, get_audio_duration(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+import wave
+
+from liepa_ausys.wav_probe import WAVE_FORMAT_IEEE_FLOAT, WAVE_FORMAT_PCM, WavInfo, probe_wav
+from liepa_ausys.wav_resample import PolyphaseResampler, decode_block, needs_transcoding, np, transcode_wav
+
+
+def info(sample_rate:int=16000, channels:int=1, bits:int=16, format_tag:int=WAVE_FORMAT_PCM) -> WavInfo:
+    block_align = channels * bits // 8
+    return WavInfo(sample_rate, channels, bits, format_tag, block_align, 1000, 44, 1000 * block_align)
+
+
+def tone(frequency:float, sample_rate:int, duration_sec:float) -> "np.ndarray":
+    return np.sin(2 * np.pi * frequency * np.arange(int(duration_sec * sample_rate)) / sample_rate).astype(np.float32)
+
+
+@unittest.skipIf(np == None, "numpy is not installed")
+class TestWavResample(unittest.TestCase):
+    def test_needs_transcoding(self):
+        self.assertFalse(needs_transcoding(info()))
+        self.assertFalse(needs_transcoding(info(sample_rate=8000)))
+        self.assertTrue(needs_transcoding(info(sample_rate=44100)))
+        self.assertTrue(needs_transcoding(info(channels=2)))
+        self.assertTrue(needs_transcoding(info(bits=24)))
+        self.assertFalse(needs_transcoding(info(bits=12)))
+
+    def test_decode_formats(self):
+        self.assertEqual([[0.5, -1.0]], decode_block(b'\x00\x40\x00\x80', info(channels=2)).tolist())
+        self.assertEqual([[-0.5], [0.0]], decode_block(b'\x00\x00\xc0\x00\x00\x00', info(bits=24)).tolist())
+        self.assertEqual([[0.0], [-1.0]], decode_block(b'\x80\x00', info(bits=8)).tolist())
+        self.assertEqual([[0.25]], decode_block(np.array([0.25], dtype='<f4').tobytes(), info(bits=32, format_tag=WAVE_FORMAT_IEEE_FLOAT)).tolist())
+
+    def test_tone_and_alias(self):
+        resampler = PolyphaseResampler(44100, 16000)
+        passed = np.concatenate([resampler.process(tone(1000, 44100, 1.0)), resampler.flush()])
+        resampler = PolyphaseResampler(44100, 16000)
+        stopped = np.concatenate([resampler.process(tone(10000, 44100, 1.0)), resampler.flush()])
+
+        self.assertEqual(16000, len(passed))
+        middle = slice(1000, 15000)
+        self.assertLess(np.abs(passed[middle] - tone(1000, 16000, 1.0)[middle]).max(), 1e-3)
+        # above the new Nyquist frequency, would alias to 6 kHz
+        self.assertLess(np.abs(stopped[middle]).max(), 1e-3)
+
+    def test_blocks_do_not_change_output(self):
+        samples = np.random.default_rng(1).uniform(-1, 1, 48000).astype(np.float32)
+        resampler = PolyphaseResampler(48000, 16000)
+        whole = np.concatenate([resampler.process(samples), resampler.flush()])
+        resampler = PolyphaseResampler(48000, 16000)
+        blocks = [resampler.process(samples[start:start + 777]) for start in range(0, len(samples), 777)]
+        in_blocks = np.concatenate(blocks + [resampler.flush()])
+
+        self.assertEqual(16000, len(whole))
+        self.assertLess(np.abs(whole - in_blocks).max(), 1e-5)
+
+    def test_transcode_stereo_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            in_path = os.path.join(tmp_dir, "in.wav")
+            out_path = os.path.join(tmp_dir, "out.wav")
+            left = tone(440, 44100, 2.5)
+            stereo = np.stack([left, -left], axis=1) * 0.5 + 0.25
+            with wave.open(in_path, 'wb') as w:
+                w.setnchannels(2)
+                w.setsampwidth(2)
+                w.setframerate(44100)
+                w.writeframes((stereo * 32767).astype('<i2').tobytes())
+
+            size = transcode_wav(in_path, out_path, block_sec=0.3)
+
+            out_info = probe_wav(out_path)
+            self.assertEqual((16000, 1, 16, 40000), (out_info.sample_rate, out_info.channels, out_info.bits_per_sample, out_info.frames))
+            self.assertEqual(os.path.getsize(out_path), size)
+            with wave.open(out_path, 'rb') as w:
+                mono = np.frombuffer(w.readframes(w.getnframes()), dtype='<i2') / 32768.0
+            # the opposite tones cancel out in the downmix
+            self.assertLess(np.abs(mono[1000:-1000] - 0.25).max(), 1e-3)
+
+
+if __name__ == '__main__':
+    unittest.main()
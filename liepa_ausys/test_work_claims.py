@@ -0,0 +1,57 @@
+import os
+import tempfile
+import time
+import unittest
+
+from liepa_ausys.work_claims import ClaimTable
+
+
+class TestWorkClaims(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.node_a = ClaimTable(self.tmp_dir.name, "a", lease_sec=60)
+        self.node_b = ClaimTable(self.tmp_dir.name, "b", lease_sec=60)
+
+    def expire(self, rel_path:str):
+        old = time.time() - 120
+        os.utime(self.node_a.claim_path(rel_path), (old, old))
+
+    def test_claim_is_exclusive(self):
+        self.assertTrue(self.node_a.try_claim("x/1.wav"))
+        self.assertFalse(self.node_b.try_claim("x/1.wav"))
+        self.assertTrue(self.node_b.try_claim("x/2.wav"))
+
+        self.node_a.release("x/1.wav")
+
+        self.assertTrue(self.node_b.try_claim("x/1.wav"))
+        self.assertEqual({"x/1.wav", "x/2.wav"}, set(self.node_b.held))
+
+    def test_expired_lease_is_reclaimed(self):
+        self.assertTrue(self.node_a.try_claim("1.wav"))
+        self.expire("1.wav")
+
+        with self.assertLogs(level='WARNING'):
+            self.assertTrue(self.node_b.try_claim("1.wav"))
+        self.assertEqual(1, self.node_b.reclaimed)
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual(["1.wav"], self.node_a.heartbeat())
+        # the old owner does not remove the claim of the new one
+        self.node_a.release("1.wav")
+        self.assertFalse(ClaimTable(self.tmp_dir.name, "c", lease_sec=60).try_claim("1.wav"))
+        self.assertEqual("b", self.node_b.read_claim(self.node_b.claim_path("1.wav"))["worker"])
+
+    def test_heartbeat_keeps_lease(self):
+        self.assertTrue(self.node_a.try_claim("1.wav"))
+        self.expire("1.wav")
+
+        self.assertEqual([], self.node_a.heartbeat())
+
+        self.assertFalse(self.node_b.try_claim("1.wav"))
+        self.node_a.release_all()
+        self.node_b.release_all()
+        self.assertEqual([], os.listdir(self.tmp_dir.name))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import mmap
+import os
+import struct
+from array import array
+from dataclasses import dataclass
+from typing import List, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .wav_probe import WavFormatError, WavInfo, probe_wav
+
+
+@dataclass
+class WavChunk:
+    path: str
+    offset_sec: float
+    duration_sec: float
+
+
+def window_energies(mm:mmap.mmap, layout:WavInfo, first_frame:int, window_frames:int, count:int) -> List[float]:
+    """ Mean square of 16-bit samples in `count` consecutive windows starting at `first_frame` """
+    samples_per_window = window_frames * layout.channels
+    start = layout.data_offset + first_frame * layout.block_align
+    if np != None:
+        samples = np.frombuffer(mm, dtype='<i2', count=samples_per_window * count, offset=start)
+        windows = samples.reshape(count, samples_per_window).astype(np.float64)
+        return list(np.mean(windows * windows, axis=1))
+    energies = []
+    for i in range(count):
+        window_start = start + i * samples_per_window * 2
+        samples = array('h', mm[window_start:window_start + samples_per_window * 2])
+        energies.append(sum(s * s for s in samples) / samples_per_window)
+    return energies
+
+
+def find_split_frames(mm:mmap.mmap, layout:WavInfo, chunk_sec:float, search_sec:float=10.0, window_sec:float=0.05) -> List[int]:
+    """
+    Frames where the recording should be cut: every `chunk_sec` seconds the quietest
+    `window_sec` window within +-`search_sec` of the nominal cut is chosen.
+    """
+    window_frames = max(1, int(window_sec * layout.sample_rate))
+    chunk_frames = int(chunk_sec * layout.sample_rate)
+    search_frames = int(search_sec * layout.sample_rate)
+    total_frames = layout.frames
+    split_frames = []
+    previous = 0
+    while total_frames - previous > chunk_frames * 1.5:
+        target = previous + chunk_frames
+        # never look back into the first half of the chunk, otherwise the previous pause is found again
+        first = max(previous + chunk_frames // 2, target - search_frames)
+        count = (min(total_frames, target + search_frames) - first) // window_frames
+        if count <= 0:
+            previous = target
+            split_frames.append(previous)
+            continue
+        energies = window_energies(mm, layout, first, window_frames, count)
+        quietest = min(range(count), key=energies.__getitem__)
+        previous = first + quietest * window_frames + window_frames // 2
+        split_frames.append(previous)
+    return split_frames
+
+
+def write_wav(out_path:str, layout:WavInfo, mm:mmap.mmap, first_frame:int, last_frame:int, block_size:int=1024*1024):
+    data_start = layout.data_offset + first_frame * layout.block_align
+    data_size = (last_frame - first_frame) * layout.block_align
+    with open(out_path, 'wb') as f:
+        f.write(struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + data_size, b'WAVE', b'fmt ', 16, 1,
+                            layout.channels, layout.sample_rate, layout.sample_rate * layout.block_align,
+                            layout.block_align, layout.bits_per_sample, b'data', data_size))
+        for offset in range(data_start, data_start + data_size, block_size):
+            f.write(mm[offset:min(offset + block_size, data_start + data_size)])
+
+
+def can_split(file_path:str) -> bool:
+    """ True if `split_wav` can cut the file: a readable 16-bit PCM WAV """
+    try:
+        layout = probe_wav(file_path)
+    except (OSError, WavFormatError):
+        return False
+    return layout.is_pcm and layout.bits_per_sample == 16
+
+
+def split_wav(file_path:str, out_dir:str, chunk_sec:float, search_sec:float=10.0) -> List[WavChunk]:
+    """
+    Split a 16-bit PCM WAV near silences into chunks of about `chunk_sec` seconds written
+    to `out_dir`. Returns an empty list if the file is short or not 16-bit PCM.
+    """
+    try:
+        layout = probe_wav(file_path)
+    except WavFormatError:
+        return []
+    if not layout.is_pcm or layout.bits_per_sample != 16 or layout.duration < chunk_sec * 1.5:
+        return []
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        split_frames = find_split_frames(mm, layout, chunk_sec, search_sec)
+        bounds = [0] + split_frames + [layout.frames]
+        base_name = os.path.splitext(os.path.basename(file_path))[0]
+        chunks = []
+        for i, (first_frame, last_frame) in enumerate(zip(bounds, bounds[1:])):
+            chunk_path = os.path.join(out_dir, f"{base_name}.{i:04d}.wav")
+            write_wav(chunk_path, layout, mm, first_frame, last_frame)
+            chunks.append(WavChunk(chunk_path, first_frame / layout.sample_rate, (last_frame - first_frame) / layout.sample_rate))
+    return chunks
+
+
+def format_time(seconds:float) -> str:
+    return f"{seconds:.3f}".rstrip('0').rstrip('.')
+
+
+def stitch_lattices(lattices:List[Tuple[str,float]]) -> str:
+    """
+    Join lattices of consecutive chunks into one: word times are shifted by the chunk
+    offset and parts (`# N S000x` lines) are renumbered. Speaker ids are kept as the
+    server returned them, chunks are diarized independently.
+    """
+    lines = []
+    part_num = 0
+    for lat_text, offset_sec in lattices:
+        for line in lat_text.splitlines():
+            parts = line.split()
+            if line.startswith('#') and len(parts) >= 3:
+                part_num += 1
+                if lines and lines[-1] != "":
+                    lines.append("")
+                lines.append(" ".join(["#", str(part_num)] + parts[2:]))
+            elif len(parts) >= 4:
+                parts[1] = format_time(float(parts[1]) + offset_sec)
+                parts[2] = format_time(float(parts[2]) + offset_sec)
+                lines.append(" ".join(parts))
+            elif line.strip() == "":
+                if lines and lines[-1] != "":
+                    lines.append("")
+            else:
+                lines.append(line)
+    while lines and lines[-1] == "":
+        lines.pop()
+    return "\n".join(lines) + "\n"
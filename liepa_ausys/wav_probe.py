@@ -0,0 +1,94 @@
+import logging
+import os
+import struct
+from typing import NamedTuple
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class WavFormatError(ValueError):
+    """File is not a RIFF/RF64 WAVE file this module can read"""
+
+
+class WavInfo(NamedTuple):
+    sample_rate: int
+    channels: int
+    bits_per_sample: int
+    format_tag: int
+    block_align: int
+    frames: int
+    data_offset: int
+    data_size: int
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate if self.sample_rate else 0.0
+
+    @property
+    def is_pcm(self) -> bool:
+        return self.format_tag == WAVE_FORMAT_PCM
+
+
+def probe_wav(file_path:str) -> WavInfo:
+    """
+    Read WAV header by walking the RIFF chunk list with a few small reads, the sample data
+    is never touched. Unknown chunks (LIST, fact, bext, ...) are skipped, WAVE_FORMAT_EXTENSIBLE
+    is resolved to its sub format and RF64/BW64 files take sizes from the `ds64` chunk.
+    """
+    with open(file_path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        header = f.read(12)
+        if len(header) < 12 or header[0:4] not in (b'RIFF', b'RF64', b'BW64') or header[8:12] != b'WAVE':
+            raise WavFormatError(f"{file_path} is not a WAVE file")
+        ds64_data_size = None
+        ds64_frames = None
+        fmt = None
+        fact_frames = None
+        position = 12
+        while position + 8 <= file_size:
+            chunk_id, chunk_size = struct.unpack('<4sI', f.read(8))
+            position += 8
+            if chunk_id == b'ds64':
+                _, ds64_data_size, ds64_frames = struct.unpack('<QQQ', f.read(24))
+            elif chunk_id == b'fmt ':
+                fmt = f.read(min(chunk_size, 40))
+            elif chunk_id == b'fact':
+                fact_frames, = struct.unpack('<I', f.read(4))
+            elif chunk_id == b'data':
+                if fmt == None or len(fmt) < 16:
+                    raise WavFormatError(f"{file_path}: data chunk before fmt chunk")
+                if chunk_size == 0xFFFFFFFF and ds64_data_size != None:
+                    chunk_size = ds64_data_size
+                # streamed writers leave 0 or 0xFFFFFFFF as the size, the data then lasts till the end of file
+                if chunk_size == 0 or position + chunk_size > file_size:
+                    chunk_size = file_size - position
+                return make_wav_info(fmt, position, chunk_size, fact_frames if ds64_frames == None else ds64_frames)
+            position += chunk_size + (chunk_size & 1)
+            f.seek(position)
+    raise WavFormatError(f"{file_path}: data chunk not found")
+
+
+def make_wav_info(fmt:bytes, data_offset:int, data_size:int, declared_frames) -> WavInfo:
+    format_tag, channels, sample_rate, _, block_align, bits_per_sample = struct.unpack('<HHIIHH', fmt[:16])
+    if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 40:
+        # the first two bytes of the sub format GUID are the actual format tag
+        format_tag, = struct.unpack('<H', fmt[24:26])
+    if block_align == 0:
+        block_align = channels * ((bits_per_sample + 7) // 8)
+    if format_tag in (WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT) or not declared_frames:
+        frames = data_size // block_align if block_align else 0
+    else:
+        frames = declared_frames
+    return WavInfo(sample_rate=sample_rate, channels=channels, bits_per_sample=bits_per_sample, format_tag=format_tag,
+                   block_align=block_align, frames=frames, data_offset=data_offset, data_size=data_size)
+
+
+def get_audio_duration(file_path:str) -> float:
+    """ Wav file length in seconds, 0 if the header can't be read """
+    try:
+        return probe_wav(file_path).duration
+    except (WavFormatError, struct.error) as e:
+        logging.error(f"Error. Can't read WAV header of {file_path}: {e}")
+        return 0.0
@@ -0,0 +1,161 @@
+import math
+import struct
+from typing import Optional
+
+try:
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+except ImportError:
+    np = None
+
+from .wav_probe import WAVE_FORMAT_IEEE_FLOAT, WAVE_FORMAT_PCM, WavInfo, probe_wav
+
+TARGET_SAMPLE_RATE = 16000
+
+
+def can_transcode(info:WavInfo) -> bool:
+    """ Integer PCM of 8 to 32 bits or 32/64-bit float, the only sample formats the decoder reads """
+    if info.format_tag == WAVE_FORMAT_PCM:
+        return info.bits_per_sample in (8, 16, 24, 32)
+    return info.format_tag == WAVE_FORMAT_IEEE_FLOAT and info.bits_per_sample in (32, 64)
+
+
+def output_sample_rate(info:WavInfo, target_rate:int=TARGET_SAMPLE_RATE) -> int:
+    """ Recordings are only resampled down, upsampling would make the upload larger """
+    return min(info.sample_rate, target_rate)
+
+
+def needs_transcoding(info:WavInfo, target_rate:int=TARGET_SAMPLE_RATE) -> bool:
+    """ True if a 16-bit mono file at `target_rate` (or lower) would be smaller than the original """
+    if np == None or not can_transcode(info) or info.frames == 0:
+        return False
+    return not (info.format_tag == WAVE_FORMAT_PCM and info.bits_per_sample == 16 and info.channels == 1
+                and info.sample_rate <= target_rate)
+
+
+def decode_block(data:bytes, info:WavInfo) -> "np.ndarray":
+    """ Interleaved PCM bytes to float32 samples scaled to [-1, 1), shape (frames, channels) """
+    bits = info.bits_per_sample
+    if info.format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        samples = np.frombuffer(data, dtype='<f4' if bits == 32 else '<f8').astype(np.float32)
+    elif bits == 8:
+        samples = (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif bits == 24:
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        # little endian 3 byte samples, sign extended through the top byte
+        samples = (raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2].astype(np.int8).astype(np.int32) << 16)).astype(np.float32) / 8388608.0
+    else:
+        dtype = '<i2' if bits == 16 else '<i4'
+        samples = np.frombuffer(data, dtype=dtype).astype(np.float32) / float(2 ** (bits - 1))
+    return samples.reshape(-1, info.channels)
+
+
+class PolyphaseResampler():
+    """
+    Streaming rational resampler (`target_rate / source_rate` = up / down). The Kaiser
+    windowed sinc low-pass filter is split into `up` phases, only the samples which are
+    not zero after upsampling are multiplied. Every `up`-th output uses the same phase on
+    input windows `down` samples apart, so a block is computed as `up` strided matrix-vector
+    products. Input can be fed in blocks of any size, the output does not depend on the
+    block boundaries.
+    """
+
+    def __init__(self, source_rate:int, target_rate:int, zero_crossings:int=16, rolloff:float=0.94, kaiser_beta:float=8.0):
+        divisor = math.gcd(source_rate, target_rate)
+        self.up = target_rate // divisor
+        self.down = source_rate // divisor
+        cutoff = rolloff / max(self.up, self.down)
+        half_width = zero_crossings * max(self.up, self.down)
+        n = np.arange(-half_width, half_width + 1)
+        h = cutoff * np.sinc(cutoff * n) * np.kaiser(len(n), kaiser_beta)
+        # zero stuffing leaves 1/up of the energy, the filter restores the level
+        h *= self.up / h.sum()
+        self.taps = -(-len(h) // self.up)
+        h = np.concatenate([h, np.zeros(self.taps * self.up - len(h))])
+        # phases[p, k] = h[p + k * up], reversed to run over input windows in time order
+        self.phases = h.reshape(self.taps, self.up).T[:, ::-1].astype(np.float32).copy()
+        self.delay = half_width
+        self.history = np.zeros(self.taps, dtype=np.float32)
+        self.history_start = -self.taps
+        self.in_count = 0
+        self.out_count = 0
+
+    def output_length(self, input_length:int) -> int:
+        return -(-input_length * self.up // self.down)
+
+    def process(self, samples:"np.ndarray") -> "np.ndarray":
+        buffer = np.concatenate([self.history, samples.astype(np.float32)])
+        self.in_count += len(samples)
+        # output n is centred on upsampled index n * down + delay, it needs input up to (n * down + delay) // up
+        out_end = max(self.out_count, -(-(self.in_count * self.up - self.delay) // self.down))
+        output = np.empty(out_end - self.out_count, dtype=np.float32)
+        # windows[i] = buffer[i:i + taps]
+        windows = sliding_window_view(buffer, self.taps)
+        for j in range(min(self.up, len(output))):
+            position = (self.out_count + j) * self.down + self.delay
+            first = position // self.up - self.history_start - self.taps + 1
+            count = len(range(j, len(output), self.up))
+            output[j::self.up] = windows[first::self.down][:count] @ self.phases[position % self.up]
+        self.out_count = out_end
+        keep_from = (out_end * self.down + self.delay) // self.up - self.taps + 1
+        self.history = buffer[keep_from - self.history_start:]
+        self.history_start = keep_from
+        return output
+
+    def flush(self) -> "np.ndarray":
+        """ Remaining output of the filter tail, the total length is `output_length` of all input """
+        expected = self.output_length(self.in_count)
+        padding = np.zeros(self.delay // self.up + self.taps + 1, dtype=np.float32)
+        in_count = self.in_count
+        output = self.process(padding)
+        self.in_count = in_count
+        return output[:max(0, expected - (self.out_count - len(output)))]
+
+
+def wav_header(sample_rate:int, frames:int) -> bytes:
+    """ Canonical 44 byte header of 16-bit mono PCM """
+    data_size = frames * 2
+    return struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + data_size, b'WAVE', b'fmt ', 16, WAVE_FORMAT_PCM, 1,
+                       sample_rate, sample_rate * 2, 2, 16, b'data', data_size)
+
+
+def to_int16(samples:"np.ndarray") -> bytes:
+    return np.clip(np.round(samples * 32768.0), -32768, 32767).astype('<i2').tobytes()
+
+
+def transcode_wav(in_path:str, out_path:str, target_rate:int=TARGET_SAMPLE_RATE, block_sec:float=10.0,
+                  info:Optional[WavInfo]=None) -> int:
+    """
+    Stream a WAV file in blocks of `block_sec` seconds: decode, downmix to mono, resample
+    to `target_rate` and write 16-bit PCM to `out_path`. Memory use does not depend on
+    the recording length. Returns the size of the written file.
+    """
+    info = info if info != None else probe_wav(in_path)
+    sample_rate = output_sample_rate(info, target_rate)
+    resampler = PolyphaseResampler(info.sample_rate, sample_rate) if sample_rate != info.sample_rate else None
+    out_frames = resampler.output_length(info.frames) if resampler != None else info.frames
+    block_bytes = max(1, int(block_sec * info.sample_rate)) * info.block_align
+    written = 0
+    with open(in_path, 'rb') as f_in, open(out_path, 'wb') as f_out:
+        f_out.write(wav_header(sample_rate, out_frames))
+        f_in.seek(info.data_offset)
+        remaining = info.frames * info.block_align
+        while remaining > 0:
+            data = f_in.read(min(block_bytes, remaining))
+            if not data:
+                break
+            data = data[:len(data) - len(data) % info.block_align]
+            remaining -= len(data)
+            mono = decode_block(data, info).mean(axis=1)
+            output = resampler.process(mono) if resampler != None else mono
+            f_out.write(to_int16(output))
+            written += len(output)
+        if resampler != None:
+            tail = resampler.flush()
+            f_out.write(to_int16(tail))
+            written += len(tail)
+        if written != out_frames:
+            # a truncated file: fix the sizes in the header
+            f_out.seek(0)
+            f_out.write(wav_header(sample_rate, written))
+    return 44 + written * 2
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Dict, List, Optional
+
+
+def default_worker_id() -> str:
+    return socket.gethostname()
+
+
+class ClaimTable():
+    """
+    Work table of several client nodes sharing one archive (e.g. over NFS). A file is
+    claimed by creating `<claims_dir>/<sha1 of its relative path>.claim` with `O_EXCL`,
+    which only one node can do. The owner heartbeats its claims by touching them; a claim
+    whose mtime is older than `lease_sec` belongs to a dead node and is taken over by
+    renaming it away, the rename succeeds for one node only. Times are compared with
+    the clock of the file server, so the nodes' clocks do not need to agree.
+
+    Lock files are used instead of a shared SQLite table, its locking is not reliable on NFS.
+    """
+
+    def __init__(self, claims_dir:str, worker_id:Optional[str]=None, lease_sec:float=300.0):
+        self.claims_dir = claims_dir
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_sec = lease_sec
+        # tells this process apart from another one started with the same worker id
+        self.token = uuid.uuid4().hex
+        # claims of this node: relative path -> claim file
+        self.held:Dict[str,str] = {}
+        self.reclaimed = 0
+        self.clock_path = os.path.join(claims_dir, f".clock.{hashlib.sha1(self.worker_id.encode()).hexdigest()}")
+        os.makedirs(claims_dir, exist_ok=True)
+
+    def claim_path(self, rel_path:str) -> str:
+        return os.path.join(self.claims_dir, hashlib.sha1(rel_path.encode('utf-8')).hexdigest() + ".claim")
+
+    def server_time(self) -> float:
+        """ Current time of the file server: mtime of a file this node has just touched """
+        with open(self.clock_path, 'a'):
+            pass
+        os.utime(self.clock_path)
+        return os.stat(self.clock_path).st_mtime
+
+    def read_claim(self, claim_path:str) -> dict:
+        try:
+            with open(claim_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def is_mine(self, claim_path:str) -> bool:
+        return self.read_claim(claim_path).get("token") == self.token
+
+    def try_claim(self, rel_path:str) -> bool:
+        """ Take the file if no live node holds it """
+        claim_path = self.claim_path(rel_path)
+        if self.create(claim_path, rel_path):
+            return True
+        try:
+            age = self.server_time() - os.stat(claim_path).st_mtime
+        except FileNotFoundError:
+            # released meanwhile
+            return self.create(claim_path, rel_path)
+        if age <= self.lease_sec:
+            return False
+        stale_path = f"{claim_path}.{uuid.uuid4().hex}.stale"
+        try:
+            os.rename(claim_path, stale_path)
+        except FileNotFoundError:
+            # another node reclaimed it first
+            return False
+        if self.server_time() - os.stat(stale_path).st_mtime <= self.lease_sec:
+            # the owner renewed the lease just before the rename, give the claim back
+            try:
+                os.link(stale_path, claim_path)
+            except OSError:
+                pass
+            os.remove(stale_path)
+            return False
+        owner = self.read_claim(stale_path).get("worker")
+        logging.warning(f"Lease of {rel_path} held by {owner} expired {age - self.lease_sec:.0f} s ago, reclaimed")
+        os.remove(stale_path)
+        self.reclaimed += 1
+        return self.create(claim_path, rel_path)
+
+    def create(self, claim_path:str, rel_path:str) -> bool:
+        try:
+            fd = os.open(claim_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({"worker": self.worker_id, "token": self.token, "path": rel_path, "pid": os.getpid(), "claimed": time.time()}, f)
+        self.held[rel_path] = claim_path
+        return True
+
+    def heartbeat(self) -> List[str]:
+        """ Renew the leases of all held claims, returns relative paths of claims taken over by another node """
+        lost = []
+        for rel_path, claim_path in list(self.held.items()):
+            try:
+                if not self.is_mine(claim_path):
+                    raise FileNotFoundError(claim_path)
+                os.utime(claim_path)
+            except FileNotFoundError:
+                logging.warning(f"Lease of {rel_path} was lost, another node may transcribe it too")
+                self.held.pop(rel_path, None)
+                lost.append(rel_path)
+        return lost
+
+    def release(self, rel_path:str):
+        claim_path = self.held.pop(rel_path, None)
+        if claim_path != None and self.is_mine(claim_path):
+            os.remove(claim_path)
+
+    def release_all(self):
+        for rel_path in list(self.held):
+            self.release(rel_path)
+        if os.path.exists(self.clock_path):
+            os.remove(self.clock_path)